@@ -0,0 +1,20 @@
+'''
+Per-connection database tuning, applied through the connection_created
+signal (connected in UsersConfig.ready()).
+'''
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    '''
+    WAL (unless SQLITE_WAL=0) lets readers keep reading while a request
+    writes, instead of every write locking the whole database file;
+    synchronous=NORMAL is durable under WAL except for the last transactions
+    on power loss, which is fine for local/dev. The busy timeout itself comes
+    from OPTIONS["timeout"].
+    '''
+    if connection.vendor != 'sqlite' or not settings.SQLITE_WAL:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
@@ -0,0 +1,358 @@
+'''
+Per-request performance instrumentation.
+
+InstrumentationMiddleware measures every request:
+- latency, per resolved view (URL name), method and status;
+- database queries and the time spent in them, through a connection
+  execute_wrapper (ORM calls from sync_to_async threads count too);
+- serializer time: turning objects into response data, in the serializers
+  views build through SerializerTimingMixin or time_serializer();
+- response size.
+
+and reports them three ways:
+- a Server-Timing header, shown by browser dev tools;
+- one structured log record per request on the "backend.requests" logger,
+  at WARNING for requests slower than SLOW_REQUEST_SECONDS and INFO
+  otherwise (see LOGGING / REQUEST_LOG_LEVEL);
+- histograms in this process, served in the Prometheus text format by
+  metrics_view. Bucket counts are cumulative, as Prometheus expects; the
+  `*_recent` quantiles only cover the last METRICS_WINDOW_SECONDS.
+
+Every worker process keeps its own histograms. INSTRUMENTATION_ENABLED=0
+takes the middleware out of the stack entirely.
+'''
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('backend.requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    '''
+    Counters for the request being handled, reachable through _current.
+    '''
+    __slots__ = ('start', 'db_queries', 'db_time', 'serialize_time', 'serializer_depth')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializer_depth = 0
+
+
+def time_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def wrap_connections(wrapper):
+    '''
+    Add `wrapper` to this thread's database connections, once. Called from
+    request_started receivers: under ASGI those run in the thread that will
+    do the request's ORM work, so every request-handling thread is covered.
+    '''
+    for connection in connections.all():
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+def add_query_timers(**kwargs):
+    wrap_connections(time_query)
+
+
+def time_serializer(serializer):
+    '''
+    Count the time `serializer` spends in to_representation() (what its
+    `.data` runs) toward the current request's serialize time. Only this
+    instance is wrapped; nested serializers are part of its time.
+    '''
+    to_representation = serializer.to_representation
+
+    def timed(instance):
+        metrics = _current.get()
+        if metrics is None or metrics.serializer_depth:
+            return to_representation(instance)
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            metrics.serializer_depth -= 1
+            metrics.serialize_time += time.perf_counter() - start
+
+    serializer.to_representation = timed
+    return serializer
+
+
+class SerializerTimingMixin:
+    '''
+    View mixin: time the serializers get_serializer() builds (see time_serializer).
+    '''
+
+    def get_serializer(self, *args, **kwargs):
+        return time_serializer(super().get_serializer(*args, **kwargs))
+
+
+def install():
+    '''
+    Hook the query timer into the database connections of every thread that
+    handles requests. Idempotent.
+    '''
+    request_started.connect(add_query_timers, dispatch_uid='instrumentation_query_timers')
+    add_query_timers()
+
+
+class Histogram:
+    '''
+    A Prometheus histogram per label set, plus bucket counts for the last
+    `window` seconds (in `slices` steps) to estimate recent quantiles from.
+    '''
+
+    def __init__(self, name, help, buckets, window=300, slices=10):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.slice_seconds = window / slices
+        self.slices = slices
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        now = time.monotonic()
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'recent': deque()}
+            series['counts'][index] += 1
+            series['sum'] += value
+            recent = series['recent']
+            slice_start = now - now % self.slice_seconds
+            if not recent or recent[-1][0] != slice_start:
+                recent.append((slice_start, [0] * (len(self.buckets) + 1)))
+            recent[-1][1][index] += 1
+            self._expire(recent, now)
+
+    def _expire(self, recent, now):
+        while recent and recent[0][0] <= now - self.slice_seconds * self.slices:
+            recent.popleft()
+
+    def quantile(self, counts, q):
+        '''
+        Estimate a quantile from bucket counts like Prometheus'
+        histogram_quantile(): interpolate linearly inside the bucket.
+        '''
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        recent_lines = [
+            f'# HELP {self.name}_recent {self.help} Quantile estimates over the recent window.',
+            f'# TYPE {self.name}_recent gauge',
+        ]
+        now = time.monotonic()
+        with self.lock:
+            for labels, series in sorted(self.series.items()):
+                label_text = _labels(labels)
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), series['counts']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+                lines.append(f'{self.name}_sum{label_text} {_number(series["sum"])}')
+                lines.append(f'{self.name}_count{label_text} {cumulative}')
+
+                self._expire(series['recent'], now)
+                window = [sum(counts) for counts in zip(*(counts for _, counts in series['recent']))]
+                for q in QUANTILES:
+                    value = self.quantile(window, q) if window else None
+                    if value is not None:
+                        recent_lines.append(f'{self.name}_recent{_labels(labels + (("quantile", str(q)),))} {_number(value)}')
+        return lines + recent_lines
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_label_value(value)}"' for key, value in labels) + '}'
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+_window = getattr(settings, 'METRICS_WINDOW_SECONDS', 300)
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Request latency in seconds.', LATENCY_BUCKETS, _window)
+DB_QUERIES = Histogram('http_request_db_queries', 'Database queries per request.', QUERY_BUCKETS, _window)
+DB_DURATION = Histogram('http_request_db_duration_seconds', 'Database time per request in seconds.', LATENCY_BUCKETS, _window)
+SERIALIZE_DURATION = Histogram(
+    'http_request_serialize_duration_seconds', 'Serializer time per request in seconds.', LATENCY_BUCKETS, _window,
+)
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size in bytes.', SIZE_BUCKETS, _window)
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZE_DURATION, RESPONSE_SIZE)
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    return '\n'.join(lines) + '\n'
+
+
+def view_name(request):
+    # URL names rather than paths, so label values stay bounded.
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match._func_path) if match else 'unresolved'
+
+
+class InstrumentationMiddleware:
+    '''
+    Outermost middleware (see MIDDLEWARE); works under WSGI and ASGI.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, metrics)
+        return response
+
+    def record(self, request, response, metrics):
+        # For streaming responses this is the time to the first byte.
+        elapsed = time.perf_counter() - metrics.start
+        size = None if response.streaming else len(response.content)
+        view = view_name(request)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"',
+            f'serialize;dur={metrics.serialize_time * 1000:.1f}',
+            f'total;dur={elapsed * 1000:.1f}',
+        ])
+
+        labels = (('view', view), ('method', request.method))
+        REQUEST_DURATION.observe(labels + (('status', str(response.status_code)),), elapsed)
+        DB_QUERIES.observe(labels, metrics.db_queries)
+        DB_DURATION.observe(labels, metrics.db_time)
+        SERIALIZE_DURATION.observe(labels, metrics.serialize_time)
+        if size is not None:
+            RESPONSE_SIZE.observe(labels, size)
+
+        level = logging.WARNING if elapsed >= getattr(settings, 'SLOW_REQUEST_SECONDS', 1.0) else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(
+                level, '%s %s %s %.1fms', request.method, view, response.status_code, elapsed * 1000,
+                extra={'request_metrics': {
+                    'method': request.method,
+                    'path': request.path,
+                    'view': view,
+                    'status': response.status_code,
+                    'duration_ms': round(elapsed * 1000, 2),
+                    'db_queries': metrics.db_queries,
+                    'db_ms': round(metrics.db_time * 1000, 2),
+                    'serialize_ms': round(metrics.serialize_time * 1000, 2),
+                    'response_bytes': size,
+                }},
+            )
+
+
+class JSONFormatter(logging.Formatter):
+    '''
+    One JSON object per record; request metrics become top-level keys.
+    '''
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **getattr(record, 'request_metrics', {}),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def metrics_view(request):
+    '''
+    Prometheus scrape endpoint. Requires `Authorization: Bearer <METRICS_TOKEN>`;
+    without a token configured it is only served in DEBUG.
+    '''
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            raise Http404
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
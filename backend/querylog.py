@@ -0,0 +1,241 @@
+'''
+Query inspection for tests and staging: records every SQL statement of a
+request with its duration and the project code that issued it, and flags
+
+- repeated shapes: the same statement (modulo parameters and IN-list
+  length) run QUERY_INSPECTION_REPEAT_THRESHOLD or more times in one
+  request, the signature of an N+1 lookup;
+- slow statements: at least QUERY_INSPECTION_SLOW_MS.
+
+QUERY_INSPECTION selects when QueryInspectionMiddleware inspects:
+- "off" (default): the middleware is not installed;
+- "header": only requests sent with `X-Inspect-Queries: 1` (staging);
+- "always": every request (backend.test_runner turns this on for tests).
+
+Inspected responses get X-Query-Count / X-Query-Repeated / X-Query-Slow
+headers, findings are logged on "backend.queries", and each endpoint's
+worst case is collected in ENDPOINTS for a per-endpoint JSON report.
+
+Tests can inspect a block directly:
+
+    with inspect_queries() as inspector:
+        client.get(url)
+    assert not inspector.report()['repeated']
+'''
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+
+from .instrumentation import view_name, wrap_connections
+
+logger = logging.getLogger('backend.queries')
+
+HEADER = 'X-Inspect-Queries'
+DEFAULT_REPEAT_THRESHOLD = 3
+DEFAULT_SLOW_MS = 100
+
+# Every active inspector records; inspect_queries() blocks can nest.
+_inspectors = ContextVar('query_inspectors', default=())
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# Transaction control repeats legitimately (one savepoint per atomic block).
+_IGNORED = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK', 'BEGIN', 'COMMIT')
+# Frames in here (instrumentation, this module) are never a query's origin.
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def query_shape(sql):
+    '''
+    The statement with parameter lists collapsed and literals replaced, so
+    the same lookup for different rows compares equal.
+    '''
+    return _LITERALS.sub('?', _IN_LIST.sub('(...)', sql))
+
+
+def query_origin():
+    '''
+    "path:line in function" of the innermost project frame that led to the
+    query, skipping Django, DRF and this module.
+    '''
+    base = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and 'site-packages' not in filename and not filename.startswith(_BACKEND_DIR):
+            return f'{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryRecord(NamedTuple):
+    sql: str
+    shape: str
+    duration: float
+    origin: str
+
+
+class QueryInspector:
+    def __init__(self):
+        self.records = []
+        self.repeat_threshold = getattr(settings, 'QUERY_INSPECTION_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+        self.slow_seconds = getattr(settings, 'QUERY_INSPECTION_SLOW_MS', DEFAULT_SLOW_MS) / 1000
+
+    def add(self, sql, duration, origin):
+        self.records.append(QueryRecord(sql, query_shape(sql), duration, origin))
+
+    def report(self):
+        shapes = {}
+        for record in self.records:
+            if record.sql.lstrip().upper().startswith(_IGNORED):
+                continue
+            entry = shapes.setdefault(record.shape, {'sql': record.shape, 'count': 0, 'ms': 0.0, 'origins': []})
+            entry['count'] += 1
+            entry['ms'] += record.duration * 1000
+            if record.origin and record.origin not in entry['origins']:
+                entry['origins'].append(record.origin)
+        repeated = [entry for entry in shapes.values() if entry['count'] >= self.repeat_threshold]
+        slow = [
+            {'sql': record.sql, 'ms': record.duration * 1000, 'origin': record.origin}
+            for record in self.records if record.duration >= self.slow_seconds
+        ]
+        for entry in repeated + slow:
+            entry['ms'] = round(entry['ms'], 2)
+        return {
+            'queries': len(self.records),
+            'db_ms': round(sum(record.duration for record in self.records) * 1000, 2),
+            'repeated': sorted(repeated, key=lambda entry: -entry['count']),
+            'slow': sorted(slow, key=lambda entry: -entry['ms']),
+        }
+
+
+def inspect_query(execute, sql, params, many, context):
+    inspectors = _inspectors.get()
+    if not inspectors:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration, origin = time.perf_counter() - start, query_origin()
+        for inspector in inspectors:
+            inspector.add(sql, duration, origin)
+
+
+def add_query_inspectors(**kwargs):
+    wrap_connections(inspect_query)
+
+
+@contextmanager
+def inspect_queries():
+    '''
+    Record the queries run in this context (and in sync_to_async calls made
+    from it) into a new QueryInspector.
+    '''
+    add_query_inspectors()
+    inspector = QueryInspector()
+    token = _inspectors.set(_inspectors.get() + (inspector,))
+    try:
+        yield inspector
+    finally:
+        _inspectors.reset(token)
+
+
+class EndpointReport:
+    '''
+    Worst case seen per endpoint across inspected requests.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def add(self, endpoint, report):
+        with self.lock:
+            entry = self.endpoints.setdefault(endpoint, {'requests': 0, 'max_queries': 0, 'repeated': {}, 'slow': {}})
+            entry['requests'] += 1
+            entry['max_queries'] = max(entry['max_queries'], report['queries'])
+            for finding in report['repeated']:
+                known = entry['repeated'].setdefault(finding['sql'], {'max_count': 0, 'origins': []})
+                known['max_count'] = max(known['max_count'], finding['count'])
+                known['origins'] += [origin for origin in finding['origins'] if origin not in known['origins']]
+            for finding in report['slow']:
+                known = entry['slow'].setdefault(query_shape(finding['sql']), {'max_ms': 0, 'origin': finding['origin']})
+                known['max_ms'] = max(known['max_ms'], finding['ms'])
+
+    def flagged(self):
+        return {name: entry for name, entry in sorted(self.endpoints.items()) if entry['repeated'] or entry['slow']}
+
+    def write(self, path):
+        with self.lock, open(path, 'w') as out:
+            json.dump(dict(sorted(self.endpoints.items())), out, indent=2)
+
+    def clear(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+ENDPOINTS = EndpointReport()
+
+
+class QueryInspectionMiddleware:
+    '''
+    Place right after InstrumentationMiddleware; works under WSGI and ASGI.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_INSPECTION', 'off')
+        if self.mode not in ('header', 'always'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        request_started.connect(add_query_inspectors, dispatch_uid='querylog_query_inspectors')
+
+    def enabled(self, request):
+        return self.mode == 'always' or request.headers.get(HEADER) == '1'
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled(request):
+            return self.get_response(request)
+        with inspect_queries() as inspector:
+            response = self.get_response(request)
+        self.record(request, response, inspector)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled(request):
+            return await self.get_response(request)
+        with inspect_queries() as inspector:
+            response = await self.get_response(request)
+        self.record(request, response, inspector)
+        return response
+
+    def record(self, request, response, inspector):
+        report = inspector.report()
+        endpoint = f'{request.method} {view_name(request)}'
+        ENDPOINTS.add(endpoint, report)
+        response['X-Query-Count'] = str(report['queries'])
+        response['X-Query-Repeated'] = str(len(report['repeated']))
+        response['X-Query-Slow'] = str(len(report['slow']))
+        if report['repeated'] or report['slow']:
+            logger.warning('%s (%s): %s', endpoint, request.path, json.dumps(report))
+        else:
+            logger.debug('%s (%s): %s queries', endpoint, request.path, report['queries'])
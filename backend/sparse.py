@@ -0,0 +1,169 @@
+'''
+Sparse fieldsets for the API's read endpoints.
+
+    GET /api/tutors/?fields=id,first_name,last_name,rating
+    GET /api/tutors/?fields=id,rating,user.email
+    GET /api/votes/?expand=answer&fields=id,vote_type,answer.score
+
+- `fields` lists the fields to return; dotted names pick fields of a nested
+  object (`user.email`), a bare nested name keeps all of its fields.
+- `expand` nests the relations a serializer lists in Meta.expandable_fields
+  (name -> (serializer class, kwargs)) in place of their ids.
+
+SparseFieldsMixin applies both to a serializer (and the serializers nested in
+it) when it is built for a GET request. SparseQuerysetMixin makes a view
+load only what the remaining fields read: `only()` the columns they map to,
+and `select_related()` only the relations they cross. A field whose columns
+can't be told from its source (a SerializerMethodField, a reverse relation)
+turns column pruning off for that request unless the serializer names them
+in Meta.field_columns (name -> column list); the output is pruned either way.
+Unknown names are rejected with 400.
+'''
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse(value):
+    '''
+    "id,user.email,user.id" -> {"id": {}, "user": {"email": {}, "id": {}}}
+    '''
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in filter(None, (name.strip() for name in path.split('.'))):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def requested(request):
+    '''
+    The (fields, expand) trees asked for, or two empty trees outside GET.
+    '''
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return {}, {}
+    params = request.query_params
+    return parse(params.get(FIELDS_PARAM, '')), parse(params.get(EXPAND_PARAM, ''))
+
+
+def _nested(field):
+    field = getattr(field, 'child', field)
+    return field if isinstance(field, serializers.BaseSerializer) else None
+
+
+def prune(serializer, fields, expand, path=''):
+    '''
+    Expand and then drop fields of `serializer` in place, recursing into nested
+    serializers. `fields` and `expand` are trees from parse().
+    '''
+    expandable = getattr(getattr(serializer, 'Meta', None), 'expandable_fields', {})
+    for name in expand:
+        if name not in expandable:
+            raise ValidationError({EXPAND_PARAM: [f'{path}{name} cannot be expanded.']})
+        serializer_class, kwargs = expandable[name]
+        serializer.fields[name] = serializer_class(**kwargs)
+
+    if fields:
+        readable = {name for name, field in serializer.fields.items() if not field.write_only}
+        unknown = sorted(set(fields) - readable)
+        if unknown:
+            raise ValidationError({FIELDS_PARAM: [f'Unknown field {path}{name}.' for name in unknown]})
+        for name in list(serializer.fields):
+            if name not in fields:
+                del serializer.fields[name]
+
+    for name, field in serializer.fields.items():
+        nested = _nested(field)
+        if nested is not None and (fields.get(name) or expand.get(name)):
+            prune(nested, fields.get(name, {}), expand.get(name, {}), f'{path}{name}.')
+
+
+class SparseFieldsMixin:
+    '''
+    Serializer mixin: honour ?fields= and ?expand= from the request in the context.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = requested(self.context.get('request'))
+        if fields or expand:
+            prune(self, fields, expand)
+
+
+def columns(serializer, model, prefix=''):
+    '''
+    (relations, columns) that `serializer`'s readable fields need from `model`,
+    as select_related() and only() arguments, or None if that can't be told.
+    '''
+    overrides = getattr(getattr(serializer, 'Meta', None), 'field_columns', {})
+    relations, names = set(), set()
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in overrides:
+            names.update(prefix + column for column in overrides[name])
+            continue
+        if field.source == '*':
+            return None
+        current, path = model, prefix
+        for attr in field.source_attrs[:-1]:
+            relation = _forward_relation(current, attr)
+            if relation is None:
+                return None
+            path += attr
+            relations.add(path)
+            current, path = relation.related_model, path + '__'
+        try:
+            target = current._meta.get_field(field.source_attrs[-1])
+        except FieldDoesNotExist:
+            return None
+        nested = _nested(field)
+        if nested is None:
+            if target.many_to_many or target.one_to_many or (target.is_relation and not target.concrete):
+                return None
+            names.add(path + field.source_attrs[-1])
+            continue
+        if nested is not field or not target.concrete or not target.is_relation:
+            return None  # Nested lists come from reverse relations / prefetches.
+        relations.add(path + target.name)
+        inner = columns(nested, target.related_model, f'{path}{target.name}__')
+        if inner is None:
+            return None
+        relations |= inner[0]
+        names |= inner[1]
+    return relations, names | relations
+
+
+def _forward_relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.concrete and (field.many_to_one or field.one_to_one) else None
+
+
+class SparseQuerysetMixin:
+    '''
+    View mixin: with ?fields= or ?expand=, select only the columns and joins
+    the pruned serializer reads.
+    '''
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = requested(self.request)
+        if not (fields or expand):
+            return queryset
+        serializer = self.get_serializer()
+        needed = columns(getattr(serializer, 'child', serializer), queryset.model)
+        if needed is None:
+            return queryset
+        relations, names = needed
+        # Keyset paginators read their ordering values off the last row.
+        names |= {name.lstrip('-') for name in getattr(self.paginator, 'ordering', ())}
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*names)
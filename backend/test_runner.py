@@ -0,0 +1,66 @@
+'''
+Test runner that inspects the queries of every request the tests make
+(backend.querylog) and reports, per endpoint, repeated query shapes (N+1
+lookups) and slow statements once the suite has run.
+
+Set QUERY_REPORT_PATH to also write the full per-endpoint report as JSON,
+e.g. for CI to archive and diff. With --parallel only the main process's
+requests are reported.
+'''
+import logging
+import sys
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django_heroku import HerokuDiscoverRunner
+
+from . import querylog
+
+
+class QueryInspectionMixin:
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._saved_query_inspection = getattr(settings, 'QUERY_INSPECTION', 'off')
+        settings.QUERY_INSPECTION = 'always'
+        # Summarized below instead of logged per request.
+        self._queries_logger_level = logging.getLogger('backend.queries').level
+        logging.getLogger('backend.queries').setLevel(logging.ERROR)
+        querylog.ENDPOINTS.clear()
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_INSPECTION = self._saved_query_inspection
+        logging.getLogger('backend.queries').setLevel(self._queries_logger_level)
+        super().teardown_test_environment(**kwargs)
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        self.report_queries()
+        return result
+
+    def report_queries(self):
+        path = getattr(settings, 'QUERY_REPORT_PATH', '')
+        if path:
+            querylog.ENDPOINTS.write(path)
+        flagged = querylog.ENDPOINTS.flagged()
+        if not flagged or self.verbosity < 1:
+            return
+        lines = ['', f'Query inspection flagged {len(flagged)} endpoint(s):']
+        for endpoint, entry in flagged.items():
+            for shape, finding in entry['repeated'].items():
+                lines.append(f"  {endpoint}: {finding['max_count']}x {shape[:120]}")
+                lines += [f'      from {origin}' for origin in finding['origins'][:3]]
+            for shape, finding in entry['slow'].items():
+                lines.append(f"  {endpoint}: slow ({finding['max_ms']}ms) {shape[:120]}")
+                if finding['origin']:
+                    lines.append(f"      from {finding['origin']}")
+        sys.stderr.write('\n'.join(lines) + '\n')
+
+
+class QueryInspectionRunner(QueryInspectionMixin, DiscoverRunner):
+    pass
+
+
+class HerokuQueryInspectionRunner(QueryInspectionMixin, HerokuDiscoverRunner):
+    '''
+    For Heroku CI, which provides the test database (see django_heroku).
+    '''
@@ -14,16 +14,25 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
+from backend.instrumentation import metrics_view
+from users.views import serve_media
 urlpatterns = [
     # path("admin/", admin.site.urls),
     path("api/", include("users.urls"), name="users"),
     path("api/", include ("forum.urls"), name ="forum"),
     # path('api/payments/', include('payments.urls')),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.INSTRUMENTATION_ENABLED:
+    urlpatterns += [
+        path("metrics", metrics_view, name="metrics"),
+    ]
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
+    ]
     
\ No newline at end of file
@@ -0,0 +1,159 @@
+'''
+Deterministic benchmark data: seed() fills the database with students,
+tutors, questions, answers, comments and votes drawn from a seeded RNG, so
+the same sizes and seed give the same data on every run and every commit.
+
+Rows are written with bulk_create, which skips model signals, so the
+derived state those signals maintain (vote counters, question rankings,
+the search index, the sync change log, the tutor cache) is rebuilt in bulk
+at the end.
+'''
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from forum import search
+from forum.models import Answer, Comment, ForumChange, Question, QuestionRanking, Vote, VoteType
+from users import cache as tutor_cache
+from users.models import Course, Student, Tutor, TutorCourse, User
+
+PASSWORD = 'benchmark-password-123'
+ADMIN_EMAIL = 'admin@bench.example.com'
+DEFAULT_SIZES = {
+    'students': 200,
+    'tutors': 50,
+    'questions': 300,
+    # Averages per question / per answer; actual counts vary around them.
+    'answers': 3,
+    'comments': 2,
+    'votes': 4,
+}
+WORDS = (
+    'graph tree heap sort merge index cache query join transaction network socket thread lock '
+    'matrix vector gradient model tensor recursion pointer compiler parser token schema'
+).split()
+BATCH_SIZE = 500
+
+
+def student_email(i):
+    return f'student{i}@bench.example.com'
+
+
+def tutor_email(i):
+    return f'tutor{i}@bench.example.com'
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def spread(rng, objects, field, start, end):
+    '''
+    Give `objects` random, increasing times between start and end (bulk_create
+    stamps auto_now_add fields with the current time).
+    '''
+    if not objects:
+        return
+    span = (end - start).total_seconds()
+    offsets = sorted(rng.uniform(0, span) for _ in objects)
+    for obj, offset in zip(objects, offsets):
+        setattr(obj, field, start + timedelta(seconds=offset))
+    type(objects[0]).objects.bulk_update(objects, [field], batch_size=BATCH_SIZE)
+
+
+@transaction.atomic
+def seed(sizes=None, seed=0, days=30):
+    '''
+    Create the benchmark data set and return the number of rows per model.
+    `sizes` overrides entries of DEFAULT_SIZES.
+    '''
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(PASSWORD)  # Hashed once; every benchmark user shares it.
+
+    User.objects.create_superuser(email=ADMIN_EMAIL, password=PASSWORD)
+    students = User.objects.bulk_create(
+        [User(email=student_email(i), password=password, is_student=True) for i in range(sizes['students'])],
+        batch_size=BATCH_SIZE,
+    )
+    tutor_users = User.objects.bulk_create(
+        [User(email=tutor_email(i), password=password, is_tutor=True) for i in range(sizes['tutors'])],
+        batch_size=BATCH_SIZE,
+    )
+    Student.objects.bulk_create([Student(user=user) for user in students], batch_size=BATCH_SIZE)
+
+    tutors = []
+    for i, user in enumerate(tutor_users):
+        courses = rng.sample(Course.values, rng.randint(1, 3))
+        total = rng.randint(0, 40)
+        rating_sum = sum(rng.randint(2, 5) for _ in range(total))
+        tutors.append(Tutor(
+            user=user, first_name=f'Tutor{i}', last_name=rng.choice(WORDS).capitalize(), year=rng.randint(1, 4),
+            courses=','.join(courses), bio=sentence(rng, 12), total_ratings=total, rating_sum=rating_sum,
+            rating=rating_sum / total if total else 0.0,
+        ))
+    tutors = Tutor.objects.bulk_create(tutors, batch_size=BATCH_SIZE)
+    TutorCourse.objects.bulk_create(
+        [TutorCourse(tutor=tutor, course=course) for tutor in tutors for course in tutor.get_courses()],
+        batch_size=BATCH_SIZE,
+    )
+
+    members = students + tutor_users
+    questions = Question.objects.bulk_create(
+        [
+            Question(user=rng.choice(students), title=sentence(rng, 6) + '?', content=sentence(rng, 40))
+            for _ in range(sizes['questions'])
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    spread(rng, questions, 'timestamp', now - timedelta(days=days), now)
+
+    answers = []
+    for question in questions:
+        for _ in range(rng.randint(0, 2 * sizes['answers'])):
+            answers.append(Answer(question=question, user=rng.choice(members), content=sentence(rng, 30)))
+    answers = Answer.objects.bulk_create(answers, batch_size=BATCH_SIZE)
+    spread(rng, answers, 'timestamp', now - timedelta(days=days), now)
+
+    comments, votes = [], []
+    for answer in answers:
+        for _ in range(rng.randint(0, 2 * sizes['comments'])):
+            comments.append(Comment(answer=answer, user=rng.choice(members), content=sentence(rng, 10)))
+        voters = rng.sample(members, min(len(members), rng.randint(0, 2 * sizes['votes'])))
+        for voter in voters:
+            vote_type = VoteType.UPVOTE if rng.random() < 0.75 else VoteType.DOWNVOTE
+            votes.append(Vote(answer=answer, user=voter, vote_type=vote_type))
+    Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+    Vote.objects.bulk_create(votes, batch_size=BATCH_SIZE)
+
+    Answer.rebuild_vote_counts()
+    QuestionRanking.rebuild()
+    search.rebuild()
+    # Dated before the run, so the sync feed's settle window doesn't hold them back.
+    logged = now - timedelta(minutes=1)
+    ForumChange.objects.bulk_create(
+        [
+            ForumChange(kind=kind, object_id=obj.pk, changed_at=logged)
+            for kind, objects in (
+                (ForumChange.Kind.QUESTION, questions),
+                (ForumChange.Kind.ANSWER, answers),
+                (ForumChange.Kind.COMMENT, comments),
+            )
+            for obj in objects
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    tutor_cache.invalidate()
+    return {
+        'users': len(members) + 1,
+        'students': len(students),
+        'tutors': len(tutors),
+        'questions': len(questions),
+        'answers': len(answers),
+        'comments': len(comments),
+        'votes': len(votes),
+    }
@@ -0,0 +1,171 @@
+'''
+HTTP load generator used by `manage.py loadtest`.
+
+run_load() keeps `concurrency` requests in flight against a server for
+`duration` seconds and reports throughput and latency percentiles.
+spawn_server() starts a throwaway gunicorn on a free local port with extra
+environment variables, so two configurations (e.g. DB_CONN_MAX_AGE=0 vs
+600, or SERVER_MODE=wsgi vs asgi) can be measured back to back on the same
+machine.
+'''
+import asyncio
+import itertools
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import httpx
+from django.conf import settings
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def latency_summary(latencies):
+    '''
+    p50/p95/p99/mean in milliseconds of a non-empty list of seconds.
+    '''
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+def summarize(latencies, errors, elapsed):
+    result = {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+    if latencies:
+        result.update(latency_summary(latencies))
+    return result
+
+
+async def slow_client(base_url, path, seconds):
+    '''
+    Send one GET for `path` a header line at a time over `seconds`, like a
+    client on a bad mobile link, then read the response. A sync worker is
+    blocked for the whole time; an async server only parks a coroutine.
+    '''
+    url = httpx.URL(base_url)
+    reader, writer = await asyncio.open_connection(url.host, url.port)
+    try:
+        lines = [f'GET {path} HTTP/1.1', f'Host: {url.host}'] + [f'X-Padding-{i}: x' for i in range(max(int(seconds), 1))]
+        for line in lines:
+            writer.write(f'{line}\r\n'.encode())
+            await writer.drain()
+            await asyncio.sleep(seconds / len(lines))
+        writer.write(b'Connection: close\r\n\r\n')
+        await writer.drain()
+        await reader.read()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_load(base_url, paths, concurrency=10, duration=10.0, headers=None, timeout=10.0, transport=None,
+                   slow_clients=0, slow_seconds=5.0):
+    '''
+    Request `paths` round-robin from `concurrency` workers until `duration`
+    runs out. Non-2xx/3xx responses and transport errors count as errors and
+    are left out of the latency figures. `slow_clients` connections trickle
+    their requests in alongside (see slow_client) for the whole run.
+    '''
+    latencies = []
+    errors = 0
+    next_path = itertools.cycle(paths).__next__
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, limits=limits, transport=transport) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(next_path())
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.status_code >= 400:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+
+        async def keep_slow_client_open():
+            while time.perf_counter() < deadline:
+                await slow_client(base_url, paths[0], min(slow_seconds, max(deadline - time.perf_counter(), 0.1)))
+
+        slow = [asyncio.create_task(keep_slow_client_open()) for _ in range(slow_clients)]
+        began = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - began
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+    return summarize(latencies, errors, elapsed)
+
+
+def load(*args, **kwargs):
+    return asyncio.run(run_load(*args, **kwargs))
+
+
+def obtain_token(base_url, email, password):
+    response = httpx.post(f'{base_url}/api/login/', data={'email': email, 'password': password}, timeout=30.0)
+    response.raise_for_status()
+    return response.json()['access']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(url, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode} before accepting requests.')
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {url} did not start within {timeout:.0f}s.')
+
+
+@contextmanager
+def spawn_server(env=None, workers=2, extra_args=()):
+    '''
+    Run gunicorn for this project with `env` added to the environment and
+    yield its base URL. gunicorn.conf.py applies, so SERVER_MODE=asgi in
+    `env` starts uvicorn workers.
+    '''
+    port = free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), *extra_args,
+    ]
+    process = subprocess.Popen(
+        command, cwd=settings.BASE_DIR, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_for_server(url, process)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
@@ -0,0 +1,92 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.loadtest import load, obtain_token, spawn_server
+
+DEFAULT_PATHS = ['/api/tutors/', '/api/questions/']
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure requests/sec and latency against a running server (--url), or '
+        'against throwaway gunicorn servers started once per --compare variant, e.g. '
+        '--compare DB_CONN_MAX_AGE=0 --compare DB_CONN_MAX_AGE=600, or '
+        '--compare SERVER_MODE=wsgi --compare SERVER_MODE=asgi --ramp 8,64,256.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server.')
+        parser.add_argument(
+            '--compare', action='append', default=[], metavar='VAR=VALUE[,VAR=VALUE]',
+            help='Start a server with these environment variables and measure it. Repeat for each variant.',
+        )
+        parser.add_argument('--path', action='append', dest='paths', help='Path to request (repeatable).')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument(
+            '--ramp', default='',
+            help='Comma-separated concurrency levels to measure in turn (overrides --concurrency), '
+                 'to find where throughput stops growing and latency/errors take off.',
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Connections that trickle a request in over --slow-seconds during the run, e.g. to '
+                 'compare how SERVER_MODE=wsgi and asgi cope with slow mobile clients or long polls.',
+        )
+        parser.add_argument('--slow-seconds', type=float, default=5.0)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to measure, per variant and level.')
+        parser.add_argument('--warmup', type=float, default=2.0, help='Seconds of unmeasured load first.')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Per-request timeout; slower requests count as errors.')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for spawned servers.')
+        parser.add_argument('--token', help='Bearer token sent with every request.')
+        parser.add_argument('--login', metavar='EMAIL:PASSWORD', help='Log in to each server first and use its access token.')
+        parser.add_argument('--json', help='Also write the results to this file.')
+
+    def handle(self, *args, **options):
+        if bool(options['url']) == bool(options['compare']):
+            raise CommandError('Pass either --url or at least one --compare.')
+        paths = options['paths'] or DEFAULT_PATHS
+        levels = [int(level) for level in options['ramp'].split(',') if level] or [options['concurrency']]
+
+        results = []
+        if options['url']:
+            results += self.measure(options['url'], 'server', paths, levels, options)
+        for variant in options['compare']:
+            env = self.parse_env(variant)
+            with spawn_server(env, workers=options['workers']) as url:
+                results += self.measure(url, variant, paths, levels, options)
+
+        if options['json']:
+            with open(options['json'], 'w') as out:
+                json.dump({'paths': paths, 'results': results}, out, indent=2)
+
+    def parse_env(self, variant):
+        try:
+            return dict(item.split('=', 1) for item in variant.split(','))
+        except ValueError:
+            raise CommandError(f'Bad --compare value {variant!r}; expected VAR=VALUE[,VAR=VALUE].')
+
+    def get_headers(self, url, options):
+        token = options['token']
+        if options['login']:
+            email, _, password = options['login'].partition(':')
+            token = obtain_token(url, email, password)
+        return {'Authorization': f'Bearer {token}'} if token else None
+
+    def measure(self, url, label, paths, levels, options):
+        headers = self.get_headers(url, options)
+        results = []
+        for concurrency in levels:
+            run = {
+                'concurrency': concurrency, 'headers': headers, 'timeout': options['timeout'],
+                'slow_clients': options['slow_clients'], 'slow_seconds': options['slow_seconds'],
+            }
+            if options['warmup']:
+                load(url, paths, duration=options['warmup'], **run)
+            result = {'label': label, 'concurrency': concurrency, 'slow_clients': options['slow_clients'], **load(url, paths, duration=options['duration'], **run)}
+            line = f"{label} x{concurrency}: {result['rps']} req/s, {result['errors']} error(s)"
+            if 'p50_ms' in result:
+                line += f", p50 {result['p50_ms']}ms p95 {result['p95_ms']}ms p99 {result['p99_ms']}ms"
+            self.stdout.write(line)
+            results.append(result)
+        return results
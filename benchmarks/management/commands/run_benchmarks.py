@@ -0,0 +1,124 @@
+import json
+import logging
+import random
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from benchmarks import fixtures
+from benchmarks.scenarios import NOT_BENCHMARKED, SCENARIOS, BenchmarkClient, Dataset, api_url_names
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and run scripted API scenarios against the app '
+        'in-process, reporting p50/p95/p99 latency and queries per request for every '
+        'endpoint. Save runs with --json and diff them with --compare-to.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios', choices=sorted(SCENARIOS),
+            help='Scenario to run (repeatable; default: all).',
+        )
+        parser.add_argument('--iterations', type=int, default=50, help='Iterations of each scenario.')
+        for name, default in fixtures.DEFAULT_SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the data and the scenario choices.')
+        parser.add_argument('--json', help='Write the results to this file.')
+        parser.add_argument('--compare-to', help='Results file of an earlier run to print deltas against.')
+
+    def handle(self, *args, **options):
+        baseline = self.load(options['compare_to']) if options['compare_to'] else None
+        sizes = {name: options[name] for name in fixtures.DEFAULT_SIZES}
+        names = options['scenarios'] or list(SCENARIOS)
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # Failed requests show up in the error counts; skip their tracebacks.
+        request_logger = logging.getLogger('django.request')
+        level, request_logger.level = request_logger.level, logging.CRITICAL
+        try:
+            counts = fixtures.seed(sizes, seed=options['seed'])
+            results = self.run(names, options['iterations'], options['seed'])
+            vendor = connection.vendor
+        finally:
+            request_logger.setLevel(level)
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'commit': self.git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'database': vendor,
+            'sizes': sizes,
+            'rows': counts,
+            'seed': options['seed'],
+            'iterations': options['iterations'],
+            **results,
+        }
+        self.print_report(report, baseline)
+        if options['json']:
+            with open(options['json'], 'w') as out:
+                json.dump(report, out, indent=2)
+
+    def run(self, names, iterations, seed):
+        data = Dataset()
+        overall = BenchmarkClient()
+        scenarios = {}
+        for name in names:
+            bench = BenchmarkClient()
+            SCENARIOS[name](bench, data, random.Random(seed), iterations)
+            scenarios[name] = bench.results()
+            for endpoint, samples in bench.samples.items():
+                overall.samples[endpoint] += samples
+        endpoints = overall.results()
+        covered = {endpoint.split(' ', 1)[1] for endpoint in endpoints}
+        return {
+            'scenarios': scenarios,
+            'endpoints': endpoints,
+            'not_covered': [name for name in api_url_names() if name not in covered and name not in NOT_BENCHMARKED],
+        }
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_report(self, report, baseline):
+        previous = baseline['endpoints'] if baseline else {}
+        header = f'{"endpoint":<40} {"reqs":>5} {"err":>4} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>8}'
+        if baseline:
+            header += f' {"Δp95":>8} {"Δqueries":>8}'
+            self.stdout.write(f'Deltas against {baseline.get("commit") or "unknown commit"} ({baseline.get("timestamp")}).')
+        self.stdout.write(
+            f'{report["database"]} @ {report["commit"] or "unknown commit"}, rows: '
+            + ', '.join(f'{key}={value}' for key, value in report['rows'].items())
+        )
+        self.stdout.write(header)
+        for endpoint, result in report['endpoints'].items():
+            line = (
+                f'{endpoint:<40} {result["requests"]:>5} {result["errors"]:>4} {result["p50_ms"]:>8.1f} '
+                f'{result["p95_ms"]:>8.1f} {result["p99_ms"]:>8.1f} {result["queries_mean"]:>8.1f}'
+            )
+            before = previous.get(endpoint)
+            if before:
+                line += f' {result["p95_ms"] - before["p95_ms"]:>+8.1f} {result["queries_mean"] - before["queries_mean"]:>+8.1f}'
+            self.stdout.write(line)
+        if report['not_covered']:
+            self.stdout.write(self.style.WARNING('Not covered by any scenario: ' + ', '.join(report['not_covered'])))
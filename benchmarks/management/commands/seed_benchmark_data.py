@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import fixtures
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the configured database with the benchmark data set (see benchmarks.fixtures), '
+        'e.g. to load-test a staging server with `manage.py loadtest`. All users share the password '
+        f'{fixtures.PASSWORD!r}; {fixtures.ADMIN_EMAIL} is a superuser.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in fixtures.DEFAULT_SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--days', type=int, default=30, help='Spread posts over this many past days.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email=fixtures.ADMIN_EMAIL).exists():
+            raise CommandError('This database already holds benchmark data.')
+        counts = fixtures.seed(
+            {name: options[name] for name in fixtures.DEFAULT_SIZES}, seed=options['seed'], days=options['days'],
+        )
+        self.stdout.write(', '.join(f'{key}: {value}' for key, value in counts.items()))
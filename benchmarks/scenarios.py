@@ -0,0 +1,236 @@
+'''
+Scripted API scenarios for `manage.py run_benchmarks`.
+
+Each scenario drives the WSGI app in-process through django.test.Client
+(no network or server process in the way) against data from
+benchmarks.fixtures.seed(). BenchmarkClient times every request and counts
+its queries, keyed by method and URL name, so results line up endpoint by
+endpoint across runs and commits.
+
+- login_storm: logins, token refreshes and logouts;
+- thread_browsing: the question feeds, threads, search and sync, sync and async;
+- tutor_directory: tutor/student/user directories and tutor ratings;
+- answer_posting: new questions, answers, comments and votes, singly and in batches;
+- account_admin: registration, password reset, tutor promotion and edits,
+  bulk import and deletions.
+
+question-events is left out: it streams for as long as the client listens.
+'''
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from forum.models import Answer, Question
+from users.models import Course, PasswordReset, Tutor, User
+from users.serializers import MyTokenObtainPairSerializer
+
+from .fixtures import ADMIN_EMAIL, PASSWORD, WORDS, sentence
+from .loadtest import latency_summary
+
+NOT_BENCHMARKED = {'question-events': 'streams until the client disconnects'}
+
+
+class BenchmarkClient:
+    def __init__(self):
+        # Server errors are recorded against their endpoint, not raised.
+        self.client = Client(raise_request_exception=False)
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, queries, status)]
+        self.tokens = {}
+
+    def token_for(self, user):
+        # The access token a login would hand out, claims included, minted once per user.
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = str(MyTokenObtainPairSerializer.get_token(user).access_token)
+        return self.tokens[user.pk]
+
+    def forget(self, user):
+        '''
+        Drop `user`'s token after a role change revoked it.
+        '''
+        self.tokens.pop(user.pk, None)
+
+    def request(self, method, path, data=None, user=None, token=None, json=True):
+        '''
+        Send one request as `user` (or with a raw access `token`) and record it.
+        '''
+        kwargs = {}
+        if user is not None:
+            token = self.token_for(user)
+        if token is not None:
+            kwargs['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        if json and method != 'GET':
+            kwargs['content_type'] = 'application/json'
+        send = getattr(self.client, method.lower())
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = send(path, data, **kwargs) if data is not None else send(path, **kwargs)
+            elapsed = time.perf_counter() - start
+        endpoint = f'{method} {resolve(urlsplit(path).path).url_name}'
+        self.samples[endpoint].append((elapsed, len(queries), response.status_code))
+        return response
+
+    def get(self, path, data=None, **kwargs):
+        return self.request('GET', path, data, **kwargs)
+
+    def post(self, path, data=None, **kwargs):
+        return self.request('POST', path, data, **kwargs)
+
+    def results(self):
+        return {endpoint: summarize_samples(samples) for endpoint, samples in sorted(self.samples.items())}
+
+
+def summarize_samples(samples):
+    latencies = [seconds for seconds, _, _ in samples]
+    queries = [count for _, count, _ in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, status in samples if status >= 400),
+        **latency_summary(latencies),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+class Dataset:
+    '''
+    Ids from the seeded database, loaded once before timing starts.
+    '''
+    def __init__(self):
+        self.students = list(User.objects.filter(is_student=True).order_by('pk'))
+        self.tutors = list(Tutor.objects.select_related('user').order_by('pk'))
+        self.admin = User.objects.get(email=ADMIN_EMAIL)
+        self.question_ids = list(Question.objects.order_by('pk').values_list('pk', flat=True))
+        self.answer_ids = list(Answer.objects.order_by('pk').values_list('pk', flat=True))
+
+
+def path_of(url):
+    parts = urlsplit(url)
+    return f'{parts.path}?{parts.query}' if parts.query else parts.path
+
+
+def login_storm(bench, data, rng, iterations):
+    for i in range(iterations):
+        user = rng.choice(data.students + [tutor.user for tutor in data.tutors])
+        tokens = bench.post(reverse('token_obtain_pair'), {'email': user.email, 'password': PASSWORD}).json()
+        refreshed = bench.post(reverse('token_refresh'), {'refresh': tokens['refresh']}).json()
+        if i % 4 == 0:
+            bench.post(reverse('logout'), {'refresh': tokens['refresh']}, token=refreshed['access'])
+
+
+def thread_browsing(bench, data, rng, iterations):
+    for i in range(iterations):
+        user = rng.choice(data.students)
+        question_id = rng.choice(data.question_ids)
+        page = bench.get(reverse('question-list-create'), user=user).json()
+        if page['next']:
+            bench.get(path_of(page['next']), user=user)
+        for feed in ('hot', 'unanswered', 'top-week'):
+            bench.get(reverse('question-feed', args=[feed]), user=user)
+        bench.get(reverse('question-thread', args=[question_id]), user=user)
+        bench.get(reverse('forum-search'), {'q': rng.choice(WORDS)}, user=user)
+        changes = bench.get(reverse('forum-changes'), {'limit': 200}, user=user).json()
+        bench.get(reverse('forum-changes'), {'since': changes['token']}, user=user)
+        bench.get(reverse('async-question-list'), user=user)
+        bench.get(reverse('async-question-thread', args=[question_id]), user=user)
+        bench.get(reverse('async-forum-search'), {'q': rng.choice(WORDS)}, user=user)
+        if i % 5 == 0:
+            # Unpaginated lists of every row; sampled less often.
+            for name in ('answer-list-create', 'comment-list-create', 'vote-list-create'):
+                bench.get(reverse(name), user=user)
+
+
+def tutor_directory(bench, data, rng, iterations):
+    for _ in range(iterations):
+        user = rng.choice(data.students)
+        tutor = rng.choice(data.tutors)
+        bench.get(reverse('tutor-list'), {'course': rng.choice(Course.values), 'ordering': '-rating'}, user=user)
+        bench.get(reverse('tutor-list'), {'min_rating': 3}, user=user)
+        bench.get(reverse('tutor-list'), {'fields': 'id,first_name,last_name,rating'}, user=user)
+        bench.get(reverse('tutor-detail', args=[tutor.pk]), user=user)
+        bench.get(reverse('tutor-average-rating', args=[tutor.pk]), user=user)
+        bench.request('PUT', reverse('tutor-rate', args=[tutor.pk]), {'rating': rng.randint(1, 5)}, user=user)
+        bench.get(reverse('student-list'), user=user)
+        bench.get(reverse('student-detail', args=[user.student.pk]), user=user)
+        bench.get(reverse('user-list'), user=user)
+        bench.get(reverse('user-detail', args=[user.pk]), user=user)
+
+
+def answer_posting(bench, data, rng, iterations):
+    for _ in range(iterations):
+        user = rng.choice(data.students)
+        question = bench.post(
+            reverse('question-list-create'), {'title': 'Benchmark question?', 'content': 'Content'}, user=user,
+        ).json()
+        answer = bench.post(
+            reverse('answer-list-create'), {'question_id': rng.choice(data.question_ids + [question['id']]), 'content': 'Answer'},
+            user=user,
+        ).json()
+        bench.post(reverse('comment-list-create'), {'answer_id': answer['id'], 'content': 'Comment'}, user=user)
+        bench.post(
+            reverse('vote-list-create'),
+            {'answer_id': rng.choice(data.answer_ids), 'vote_type': rng.choice(['upvote', 'upvote', 'downvote'])},
+            user=user,
+        )
+        # A client flushing actions it queued while offline.
+        bench.post(reverse('vote-batch'), [
+            {'answer_id': answer_id, 'vote_type': rng.choice(['upvote', 'downvote'])}
+            for answer_id in rng.sample(data.answer_ids, min(10, len(data.answer_ids)))
+        ], user=user)
+        bench.post(reverse('comment-batch'), [
+            {'answer_id': rng.choice(data.answer_ids), 'content': sentence(rng, 8)} for _ in range(5)
+        ], user=user)
+
+
+def account_admin(bench, data, rng, iterations):
+    admin = data.admin
+    for i in range(iterations):
+        email = f'new{i}-{rng.randrange(10 ** 9)}@bench.example.com'
+        created = bench.post(reverse('user-list'), {'email': email, 'password': PASSWORD, 'is_student': True}).json()
+        user = User.objects.get(pk=created['id'])
+        bench.request('PATCH', reverse('user-detail', args=[user.pk]), {'email': email}, user=user)
+
+        bench.post(reverse('password-reset'), {'email': email})
+        token = PasswordReset.objects.filter(email=email).latest('pk').token
+        bench.post(reverse('password-reset-confirm'), {'token': token, 'new_password': PASSWORD + '!'})
+
+        bench.post(reverse('tutor-create'), {
+            'email': email, 'first_name': 'New', 'last_name': 'Tutor', 'year': 2, 'courses': ['DS', 'AI'],
+        }, user=admin)
+        bench.forget(user)
+        tutor_id = Tutor.objects.get(user=user).pk
+        bench.request('PATCH', reverse('tutor-update'), {'bio': 'Updated bio'}, user=user)
+        bench.request('PATCH', reverse('tutor-detail', args=[tutor_id]), {'bio': 'Edited bio'}, user=admin)
+        bench.request('DELETE', reverse('tutor-detail', args=[tutor_id]), user=admin)
+        bench.request('DELETE', reverse('student-detail', args=[user.student.pk]), user=admin)
+        bench.request('DELETE', reverse('user-detail', args=[user.pk]), user=admin)
+
+        bench.post(reverse('admin-user-create'), {'email': f'admin-{email}', 'password': PASSWORD})
+        rows = 'email,password,role\n' + ''.join(f'import{i}-{n}-{email},,student\n' for n in range(5))
+        bench.post(
+            reverse('user-import'), {'file': SimpleUploadedFile('users.csv', rows.encode(), 'text/csv')},
+            user=admin, json=False,
+        )
+
+
+SCENARIOS = {
+    'login_storm': login_storm,
+    'thread_browsing': thread_browsing,
+    'tutor_directory': tutor_directory,
+    'answer_posting': answer_posting,
+    'account_admin': account_admin,
+}
+
+
+def api_url_names():
+    '''
+    Every named route in users/urls.py and forum/urls.py.
+    '''
+    from forum import urls as forum_urls
+    from users import urls as users_urls
+    return sorted({pattern.name for module in (users_urls, forum_urls) for pattern in module.urlpatterns if pattern.name})
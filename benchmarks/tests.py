@@ -0,0 +1,55 @@
+import random
+
+import httpx
+from django.test import SimpleTestCase, TestCase
+
+from forum.models import QuestionRanking
+from users.models import User
+
+from . import fixtures
+from .loadtest import load
+from .scenarios import NOT_BENCHMARKED, SCENARIOS, BenchmarkClient, Dataset, api_url_names
+
+
+class LoadTestRunnerTests(SimpleTestCase):
+    def test_counts_successes_and_errors(self):
+        def respond(request):
+            return httpx.Response(500 if request.url.path == '/broken/' else 200)
+
+        result = load(
+            'http://testserver', ['/ok/', '/broken/'], concurrency=2, duration=0.2,
+            transport=httpx.MockTransport(respond),
+        )
+        self.assertGreater(result['errors'], 0)
+        # Paths are taken round-robin, so half the requests hit the broken one.
+        self.assertLessEqual(abs(result['requests'] - 2 * result['errors']), 1)
+        self.assertGreater(result['rps'], 0)
+        self.assertIn('p95_ms', result)
+
+
+class BenchmarkScenarioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = fixtures.seed({'students': 6, 'tutors': 3, 'questions': 8}, seed=1)
+
+    def test_seed_builds_derived_state(self):
+        self.assertEqual(User.objects.count(), self.counts['users'])
+        self.assertEqual(QuestionRanking.objects.count(), self.counts['questions'])
+
+    def test_scenarios_cover_every_endpoint(self):
+        bench = BenchmarkClient()
+        data = Dataset()
+        for scenario in SCENARIOS.values():
+            scenario(bench, data, random.Random(0), 1)
+
+        server_errors = sorted(
+            endpoint for endpoint, samples in bench.samples.items() if any(status >= 500 for _, _, status in samples)
+        )
+        self.assertEqual(server_errors, [])
+        results = bench.results()
+        covered = {endpoint.split(' ', 1)[1] for endpoint in results}
+        self.assertEqual(set(api_url_names()) - covered, set(NOT_BENCHMARKED))
+        for endpoint in ('GET question-thread', 'POST vote-list-create', 'GET tutor-list', 'POST token_obtain_pair'):
+            self.assertEqual(results[endpoint]['errors'], 0, endpoint)
+            self.assertGreater(results[endpoint]['queries_max'], 0, endpoint)
+            self.assertLessEqual(results[endpoint]['p50_ms'], results[endpoint]['p99_ms'])
@@ -0,0 +1,169 @@
+'''
+Async read endpoints for the forum, under /api/async/.
+
+Same data as the question feed, QuestionThreadView and ForumSearchView, but
+as native async Django views: under ASGI (SERVER_MODE=asgi) a request that
+is waiting on the database or on a slow client holds a coroutine instead of
+a worker thread. DRF views are sync-only, so AsyncReadView provides the parts
+of APIView these endpoints use: JWT authentication with IsAuthenticated,
+DRF-shaped error bodies, and JSON output through the same serializers.
+'''
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from backend.instrumentation import time_serializer
+from . import events, search
+from .models import Question
+from .pagination import QuestionCursorPagination
+from .serializers import QuestionSerializer, QuestionThreadSerializer, SearchHitSerializer
+from .views import SearchParamsMixin, thread_queryset
+
+
+class AsyncReadView(View):
+    '''
+    Base for authenticated, read-only async endpoints. Handlers receive a DRF
+    Request (query_params, user, auth) and return self.render(data).
+    '''
+    http_method_names = ['get', 'head', 'options']
+    authentication_classes = None  # DEFAULT_AUTHENTICATION_CLASSES
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.authenticators = [auth() for auth in self.authentication_classes or api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        self.request = Request(request)
+        try:
+            await self.authenticate()
+            return await super().dispatch(self.request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self):
+        for authenticator in self.authenticators:
+            if hasattr(authenticator, 'aauthenticate'):
+                result = await authenticator.aauthenticate(self.request)
+            else:
+                result = await sync_to_async(authenticator.authenticate)(self.request)
+            if result is not None:
+                self.request.user, self.request.auth = result
+                return
+        raise exceptions.NotAuthenticated()
+
+    def handle_exception(self, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(data, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            response['WWW-Authenticate'] = self.authenticators[0].authenticate_header(self.request)
+        return response
+
+    def render(self, data, status=status.HTTP_200_OK):
+        return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self}
+
+
+class AsyncQuestionListView(AsyncReadView):
+    '''
+    Newest-first question feed, keyset-paginated like QuestionListCreateView.
+    '''
+    pagination_class = QuestionCursorPagination
+
+    async def get(self, request, *args, **kwargs):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(Question.objects.select_related('user'), request, view=self)
+        data = time_serializer(QuestionSerializer(page, many=True, context=self.get_serializer_context())).data
+        return self.render({'next': paginator.get_next_link(), 'results': data})
+
+
+class AsyncQuestionThreadView(AsyncReadView):
+    '''
+    A question with its answers and comments (same three queries as QuestionThreadView).
+    '''
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            question = await thread_queryset().aget(pk=pk)
+        except Question.DoesNotExist:
+            raise exceptions.NotFound()
+        return self.render(time_serializer(QuestionThreadSerializer(question, context=self.get_serializer_context())).data)
+
+
+class AsyncForumSearchView(SearchParamsMixin, AsyncReadView):
+    '''
+    Ranked full-text search: `?q=<text>&limit=&offset=`, as ForumSearchView.
+    '''
+    async def get(self, request, *args, **kwargs):
+        text, limit, offset = self.get_search_params(request.query_params)
+        # Raw SQL (FTS5 / tsvector) has no async API; run it off the event loop.
+        hits, has_next = await sync_to_async(search.search_page)(text, limit=limit, offset=offset)
+        return self.render({
+            'next': self.get_search_next_link(request, has_next, limit, offset),
+            'results': time_serializer(SearchHitSerializer(hits, many=True)).data,
+        })
+
+
+class LiveUpdatesUnavailable(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Live updates need the ASGI server (SERVER_MODE=asgi); poll instead.'
+    default_code = 'live_updates_unavailable'
+
+
+class QuestionEventsView(AsyncReadView):
+    '''
+    Server-sent events for one question: answer.created, comment.created and
+    vote.changed (see forum.events), so clients don't have to poll the lists.
+
+    Browsers' EventSource can't send an Authorization header, so the access
+    token may also be given as `?access_token=`. A reconnecting client's
+    Last-Event-ID header (or `?last_event_id=`) replays what it missed. A
+    comment line is sent every `heartbeat` seconds to keep proxies from
+    closing the connection, and the stream ends after FORUM_EVENTS_MAX_SECONDS
+    so EventSource reconnects (and re-authenticates) periodically.
+
+    Needs the ASGI server: under WSGI an endless async stream would be
+    buffered, so the endpoint answers 503 unless FORUM_EVENTS_ENABLED.
+    '''
+    heartbeat = 15
+
+    async def dispatch(self, request, *args, **kwargs):
+        token = request.GET.get('access_token')
+        if token and 'HTTP_AUTHORIZATION' not in request.META:
+            request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request, pk, *args, **kwargs):
+        if not getattr(settings, 'FORUM_EVENTS_ENABLED', True):
+            raise LiveUpdatesUnavailable()
+        if not await Question.objects.filter(pk=pk).aexists():
+            raise exceptions.NotFound()
+        try:
+            last_event_id = int(request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id'))
+        except (TypeError, ValueError):
+            last_event_id = None
+
+        subscription = events.get_broker().subscribe(events.question_channel(pk), last_event_id=last_event_id)
+        response = StreamingHttpResponse(self.stream(subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx: don't hold events back
+        return response
+
+    async def stream(self, subscription):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + getattr(settings, 'FORUM_EVENTS_MAX_SECONDS', 300)
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.overflowed and loop.time() < deadline:
+                event = await subscription.get(timeout=min(self.heartbeat, max(deadline - loop.time(), 0)))
+                if event is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f'id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n'
+        finally:
+            subscription.close()
@@ -0,0 +1,96 @@
+'''
+Batch writes for clients that queue votes and comments (offline, or on a
+poor connection) and flush them in one round trip:
+
+    POST /api/votes/batch/     [{"answer_id": 1, "vote_type": "upvote"}, ...]
+    POST /api/comments/batch/  [{"answer_id": 1, "content": "..."}, ...]
+
+Every item is validated first, with one in_bulk lookup for all the answers
+they reference; the valid ones are then written in one transaction with
+bulk queries. Bulk writes send no model signals, so the follow-up work of
+forum.signals and the single-item views (sync change log, question
+rankings, live events) is done here in bulk too.
+
+An invalid item doesn't stop the others. The response holds one result per
+item, in request order:
+
+    {"results": [{"status": 201, "data": {...}}, {"status": 400, "errors": {...}}]}
+
+Several votes on the same answer in one batch end like sending them in
+order would: the last one counts, and each gets the resulting vote.
+'''
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import events
+from .models import Answer, Comment, ForumChange, Vote
+from .serializers import BatchCommentSerializer, BatchVoteSerializer, CommentSerializer, VoteSerializer
+
+MAX_ITEMS = 100
+
+
+def validate_items(items, serializer_class):
+    '''
+    Validate a batch. Returns the per-item results, filled in for invalid
+    items only, and (index, answer, validated_data) for the valid ones.
+    '''
+    if not isinstance(items, list):
+        raise ValidationError('Expected a list of items.')
+    if not items:
+        raise ValidationError('The batch is empty.')
+    if len(items) > MAX_ITEMS:
+        raise ValidationError(f'At most {MAX_ITEMS} items per batch.')
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'status': 400, 'errors': serializer.errors}
+
+    answers = Answer.objects.in_bulk({data['answer_id'] for _, data in valid})
+    resolved = []
+    for index, data in valid:
+        answer = answers.get(data['answer_id'])
+        if answer is None:
+            results[index] = {'status': 400, 'errors': {'answer_id': ['Answer not found.']}}
+        else:
+            resolved.append((index, answer, data))
+    return results, resolved
+
+
+def cast_votes(user, items):
+    results, resolved = validate_items(items, BatchVoteSerializer)
+    # answer -> [vote_type, indices]; later votes on an answer replace earlier ones.
+    ballots = {}
+    for index, answer, data in resolved:
+        ballot = ballots.setdefault(answer, [None, []])
+        ballot[0] = data['vote_type']
+        ballot[1].append(index)
+
+    if ballots:
+        with transaction.atomic():
+            cast = Vote.cast_many(user, [(answer, vote_type) for answer, (vote_type, _) in ballots.items()])
+            events.publish_vote_counts_many([answer.pk for answer in ballots])
+        for (vote, created), (_, indices) in zip(cast, ballots.values()):
+            data = VoteSerializer(vote).data
+            for position, index in enumerate(indices):
+                results[index] = {'status': 201 if created and not position else 200, 'data': data}
+    return results
+
+
+def create_comments(user, items):
+    results, resolved = validate_items(items, BatchCommentSerializer)
+    if resolved:
+        with transaction.atomic():
+            comments = Comment.objects.bulk_create(
+                [Comment(answer=answer, user=user, content=data['content']) for _, answer, data in resolved]
+            )
+            ForumChange.record_many(ForumChange.Kind.COMMENT, [comment.pk for comment in comments])
+            for comment in comments:
+                events.publish_comment(comment)
+        for (index, _, _), comment in zip(resolved, comments):
+            results[index] = {'status': 201, 'data': CommentSerializer(comment).data}
+    return results
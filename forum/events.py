@@ -0,0 +1,182 @@
+'''
+Live forum updates: publish/subscribe for the per-question event stream
+(/api/questions/<id>/events/, forum.async_views.QuestionEventsView).
+
+Write views publish after their transaction commits:
+- answer.created / comment.created carry the serialized row;
+- vote.changed carries the answer's new counters.
+
+Subscribers get events through a Broker, chosen by the FORUM_EVENT_BROKER
+setting. InProcessBroker fans out within one process, which is all a
+single worker (and the tests) need. With several worker processes a POST
+and a stream can land in different processes, so a broker that shares
+events between them (Redis pub/sub, Postgres LISTEN/NOTIFY, ...) has to
+implement the same two methods.
+'''
+import asyncio
+import itertools
+import threading
+from collections import OrderedDict, defaultdict, deque
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+
+from .models import Answer
+from .serializers import AnswerSerializer, CommentSerializer
+
+
+class Event(NamedTuple):
+    id: int
+    type: str
+    data: str  # JSON
+
+
+class Broker:
+    '''
+    Interface for event brokers.
+    '''
+
+    def publish(self, channel, type, data):
+        '''
+        Send an event to every current subscriber of `channel`. `data` is a
+        JSON string. May be called from any thread.
+        '''
+        raise NotImplementedError
+
+    def subscribe(self, channel, last_event_id=None):
+        '''
+        Return a subscription for `channel`, created inside the consuming event
+        loop. It must provide `await get(timeout)` (next Event, or None on
+        timeout), `overflowed` (events were dropped; the client should
+        reconnect) and `close()`. With `last_event_id`, later events still held
+        by the broker are replayed first.
+        '''
+        raise NotImplementedError
+
+
+class InProcessSubscription:
+    def __init__(self, broker, channel, queue_size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The consumer's loop is gone; it will never read again.
+            self.close()
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled reader; end its stream rather than buffer without bound.
+            self.overflowed = True
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(Broker):
+    '''
+    Fans events out to subscribers in this process. Keeps the last `backlog`
+    events of the `max_channels` most recently active channels for replay.
+    '''
+
+    def __init__(self, backlog=50, max_channels=1000, queue_size=100):
+        self.backlog = backlog
+        self.max_channels = max_channels
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.subscribers = defaultdict(set)
+        self.history = OrderedDict()
+
+    def publish(self, channel, type, data):
+        with self.lock:
+            event = Event(next(self.ids), type, data)
+            history = self.history.pop(channel, None) or deque(maxlen=self.backlog)
+            history.append(event)
+            self.history[channel] = history
+            if len(self.history) > self.max_channels:
+                self.history.popitem(last=False)
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self, channel, last_event_id=None):
+        subscription = InProcessSubscription(self, channel, self.queue_size)
+        with self.lock:
+            self.subscribers[channel].add(subscription)
+            missed = [] if last_event_id is None else [
+                event for event in self.history.get(channel, ()) if event.id > last_event_id
+            ]
+        # Anything published from now on arrives through deliver(), after these.
+        for event in missed[-self.queue_size:]:
+            subscription.queue.put_nowait(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.channel]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'FORUM_EVENT_BROKER', 'forum.events.InProcessBroker'))()
+
+
+def question_channel(question_id):
+    return f'question:{question_id}'
+
+
+def publish_on_commit(question_id, type, data):
+    payload = JSONRenderer().render(data).decode()
+    transaction.on_commit(lambda: get_broker().publish(question_channel(question_id), type, payload))
+
+
+def publish_answer(answer):
+    publish_on_commit(answer.question_id, 'answer.created', AnswerSerializer(answer).data)
+
+
+def publish_comment(comment):
+    data = {**CommentSerializer(comment).data, 'answer_id': comment.answer_id}
+    publish_on_commit(comment.answer.question_id, 'comment.created', data)
+
+
+def publish_vote_counts(answer_id):
+    '''
+    Publish the answer's counters as committed, so concurrent votes can't
+    announce stale totals.
+    '''
+    publish_vote_counts_many([answer_id])
+
+
+def publish_vote_counts_many(answer_ids):
+    '''
+    publish_vote_counts() for several answers, read back in one query.
+    '''
+    def publish():
+        broker = get_broker()
+        for counts in Answer.objects.filter(pk__in=answer_ids).values('id', 'question_id', 'upvotes', 'downvotes', 'score'):
+            question_id = counts.pop('question_id')
+            broker.publish(question_channel(question_id), 'vote.changed', JSONRenderer().render(counts).decode())
+    transaction.on_commit(publish)
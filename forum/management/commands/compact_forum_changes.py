@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from forum.models import ForumChange
+
+
+class Command(BaseCommand):
+    help = 'Drop sync change-log rows superseded by a later change to the same object.'
+
+    def handle(self, *args, **options):
+        deleted = ForumChange.compact()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} superseded change(s).'))
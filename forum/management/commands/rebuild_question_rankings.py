@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forum.models import QuestionRanking
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hot/unanswered/top-week ranking rows for every question.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Rebuild again every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=3600.0, help='Seconds between rebuilds with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            ranked = QuestionRanking.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Ranked {ranked} question(s).'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
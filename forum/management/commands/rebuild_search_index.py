@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from forum import search
+
+
+class Command(BaseCommand):
+    help = 'Re-index every question and answer in the forum search table.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the forum search index.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from forum.models import Answer
+
+
+class Command(BaseCommand):
+    help = 'Recompute Answer.upvotes/downvotes/score from the Vote rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('answer_ids', nargs='*', type=int, help='Only rebuild these answers.')
+
+    def handle(self, *args, **options):
+        queryset = Answer.objects.all()
+        if options['answer_ids']:
+            queryset = queryset.filter(pk__in=options['answer_ids'])
+        updated = Answer.rebuild_vote_counts(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt vote counters for {updated} answer(s).'))
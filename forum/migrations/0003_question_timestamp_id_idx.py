@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["-timestamp", "-id"], name="question_timestamp_id_idx"
+            ),
+        ),
+    ]
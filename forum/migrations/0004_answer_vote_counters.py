@@ -0,0 +1,82 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def drop_duplicate_votes(apps, schema_editor):
+    """Keep only the latest vote per (user, answer) before adding the constraint."""
+    Vote = apps.get_model("forum", "Vote")
+    duplicates = (
+        Vote.objects.values("user", "answer")
+        .annotate(latest=Max("id"), n=Count("id"))
+        .filter(n__gt=1)
+    )
+    for row in duplicates:
+        Vote.objects.filter(user=row["user"], answer=row["answer"]).exclude(
+            id=row["latest"]
+        ).delete()
+
+
+def fill_vote_counters(apps, schema_editor):
+    Answer = apps.get_model("forum", "Answer")
+    Vote = apps.get_model("forum", "Vote")
+
+    def count(vote_type):
+        votes = (
+            Vote.objects.filter(answer=OuterRef("pk"), vote_type=vote_type)
+            .order_by()
+            .values("answer")
+            .annotate(n=Count("pk"))
+            .values("n")
+        )
+        return Coalesce(Subquery(votes), Value(0))
+
+    Answer.objects.update(
+        upvotes=count("upvote"),
+        downvotes=count("downvote"),
+        score=count("upvote") - count("downvote"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0003_question_timestamp_id_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="answer",
+            name="downvotes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="answer",
+            name="score",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="answer",
+            name="upvotes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="vote",
+            name="vote_type",
+            field=models.CharField(
+                choices=[("upvote", "Upvote"), ("downvote", "Downvote")], max_length=10
+            ),
+        ),
+        migrations.RunPython(drop_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="vote",
+            constraint=models.UniqueConstraint(
+                fields=("user", "answer"), name="unique_vote_per_user_answer"
+            ),
+        ),
+        migrations.RunPython(fill_vote_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE forum_search USING fts5(
+        title, body, question_id UNINDEXED, answer_id UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    INSERT INTO forum_search (rowid, title, body, question_id, answer_id)
+    SELECT id * 2, title, content, id, NULL FROM forum_question
+    """,
+    """
+    INSERT INTO forum_search (rowid, title, body, question_id, answer_id)
+    SELECT id * 2 + 1, '', content, question_id, id FROM forum_answer
+    """,
+]
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE forum_search (
+        doc_id bigint PRIMARY KEY,
+        question_id bigint NOT NULL,
+        answer_id bigint NULL,
+        title text NOT NULL DEFAULT '',
+        body text NOT NULL,
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', title), 'A')
+            || setweight(to_tsvector('english', body), 'B')
+        ) STORED
+    )
+    """,
+    "CREATE INDEX forum_search_document_idx ON forum_search USING GIN (document)",
+    """
+    INSERT INTO forum_search (doc_id, title, body, question_id, answer_id)
+    SELECT id * 2, title, content, id, NULL FROM forum_question
+    """,
+    """
+    INSERT INTO forum_search (doc_id, title, body, question_id, answer_id)
+    SELECT id * 2 + 1, '', content, question_id, id FROM forum_answer
+    """,
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute("DROP TABLE IF EXISTS forum_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0004_answer_vote_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:27
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_changes(apps, schema_editor):
+    """Start updated_at at the creation time and log every existing row once,
+    so a client syncing from token 0 receives the whole forum."""
+    ForumChange = apps.get_model("forum", "ForumChange")
+    for kind, model_name in (
+        ("question", "Question"),
+        ("answer", "Answer"),
+        ("comment", "Comment"),
+    ):
+        model = apps.get_model("forum", model_name)
+        model.objects.update(updated_at=F("timestamp"))
+        ForumChange.objects.bulk_create(
+            (
+                ForumChange(kind=kind, object_id=pk, changed_at=timestamp)
+                for pk, timestamp in model.objects.order_by("id")
+                .values_list("id", "timestamp")
+                .iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0005_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="answer",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name="ForumChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("question", "Question"),
+                            ("answer", "Answer"),
+                            ("comment", "Comment"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("deleted", models.BooleanField(default=False)),
+                ("changed_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "object_id"], name="forum_change_object_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:31
+
+import django.db.models.deletion
+import math
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_rankings(apps, schema_editor):
+    """Rank the existing questions, as QuestionRanking.rebuild() does."""
+    Question = apps.get_model("forum", "Question")
+    QuestionRanking = apps.get_model("forum", "QuestionRanking")
+    rows = Question.objects.annotate(
+        answer_count=Count("answers"),
+        vote_score=Coalesce(Sum("answers__score"), 0),
+        last_answer_at=Max("answers__timestamp"),
+    ).values_list("pk", "timestamp", "answer_count", "vote_score", "last_answer_at")
+    rankings = []
+    for pk, created_at, answer_count, vote_score, last_answer_at in rows.iterator():
+        points = vote_score + 2 * answer_count
+        sign = (points > 0) - (points < 0)
+        age = (created_at.timestamp() - 1_700_000_000) / 45_000
+        rankings.append(
+            QuestionRanking(
+                question_id=pk,
+                created_at=created_at,
+                answer_count=answer_count,
+                vote_score=vote_score,
+                points=points,
+                hot_score=round(sign * math.log10(max(abs(points), 1)) + age, 7),
+                last_activity_at=max(created_at, last_answer_at or created_at),
+            )
+        )
+    QuestionRanking.objects.bulk_create(rankings, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0006_sync_change_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionRanking",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="ranking",
+                        serialize=False,
+                        to="forum.question",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("answer_count", models.IntegerField(default=0)),
+                ("vote_score", models.IntegerField(default=0)),
+                ("points", models.IntegerField(default=0)),
+                ("hot_score", models.FloatField(default=0)),
+                ("last_activity_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-hot_score", "-question"], name="ranking_hot_idx"
+                    ),
+                    models.Index(
+                        fields=["-points", "-question"], name="ranking_points_idx"
+                    ),
+                    models.Index(
+                        condition=models.Q(("answer_count", 0)),
+                        fields=["-created_at", "-question"],
+                        name="ranking_unanswered_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+WEEK_SECONDS = 7 * 24 * 3600
+
+
+def fill_weeks(apps, schema_editor):
+    """Bucket the existing rankings, as QuestionRanking.week_of() does."""
+    QuestionRanking = apps.get_model("forum", "QuestionRanking")
+    rankings = list(QuestionRanking.objects.only("pk", "created_at"))
+    for ranking in rankings:
+        ranking.week = int(ranking.created_at.timestamp() // WEEK_SECONDS)
+    QuestionRanking.objects.bulk_update(rankings, ["week"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0007_question_ranking"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="questionranking",
+            name="week",
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_weeks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="questionranking",
+            index=models.Index(
+                fields=["week", "-points", "-question"], name="ranking_week_points_idx"
+            ),
+        ),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+import math
+from collections import defaultdict
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -8,6 +14,13 @@ class Question(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset for the paginated question feed (see forum.pagination).
+            models.Index(fields=['-timestamp', '-id'], name='question_timestamp_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -17,25 +30,354 @@ class Answer(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized from Vote rows by Vote.cast(); rebuild with `manage.py rebuild_vote_counts`.
+    upvotes = models.IntegerField(default=0)
+    downvotes = models.IntegerField(default=0)
+    score = models.IntegerField(default=0)
 
     def __str__(self):
         return f"Answer to {self.question.title} by {self.user.email}"
 
+    @classmethod
+    def rebuild_vote_counts(cls, queryset=None):
+        '''
+        Recompute the vote counters from the Vote rows in a single UPDATE.
+        Returns the number of answers touched.
+        '''
+        def count(vote_type):
+            votes = (
+                Vote.objects.filter(answer=OuterRef('pk'), vote_type=vote_type)
+                .order_by().values('answer').annotate(n=Count('pk')).values('n')
+            )
+            return Coalesce(Subquery(votes), Value(0))
+
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.update(
+            upvotes=count(VoteType.UPVOTE),
+            downvotes=count(VoteType.DOWNVOTE),
+            score=count(VoteType.UPVOTE) - count(VoteType.DOWNVOTE),
+        )
+
 class Comment(models.Model):
     answer = models.ForeignKey(Answer, related_name='comments', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Comment by {self.user.email} on {self.answer.id}"
 
+class VoteType(models.TextChoices):
+    UPVOTE = 'upvote', 'Upvote'
+    DOWNVOTE = 'downvote', 'Downvote'
+
 class Vote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     answer = models.ForeignKey(Answer, related_name='votes', on_delete=models.CASCADE)
-    vote_type = models.CharField(max_length=10)  # upvote or downvote
+    vote_type = models.CharField(max_length=10, choices=VoteType.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'answer'], name='unique_vote_per_user_answer'),
+        ]
 
     def __str__(self):
         return f"{self.vote_type.capitalize()} by {self.user.email} on {self.answer.id}"
 
+    @staticmethod
+    def counter_deltas(added=None, removed=None):
+        '''
+        Map a vote being added and/or removed to increments of the Answer counters.
+        '''
+        deltas = {'upvotes': 0, 'downvotes': 0, 'score': 0}
+        for vote_type, sign in ((added, 1), (removed, -1)):
+            if vote_type == VoteType.UPVOTE:
+                deltas['upvotes'] += sign
+                deltas['score'] += sign
+            elif vote_type == VoteType.DOWNVOTE:
+                deltas['downvotes'] += sign
+                deltas['score'] -= sign
+        return {field: delta for field, delta in deltas.items() if delta}
+
+    @classmethod
+    def cast(cls, user, answer, vote_type):
+        '''
+        Record `user`'s vote on `answer`, or switch it if they already voted,
+        and move the answer's counters with F() expressions in the same
+        transaction. Returns (vote, created).
+        '''
+        with transaction.atomic():
+            vote = cls.objects.select_for_update().filter(user=user, answer=answer).first()
+            created = vote is None
+            if created:
+                try:
+                    with transaction.atomic():
+                        vote = cls.objects.create(user=user, answer=answer, vote_type=vote_type)
+                except IntegrityError:
+                    # A concurrent request inserted it first; treat this one as a change.
+                    vote = cls.objects.select_for_update().get(user=user, answer=answer)
+                    created = False
+            if created:
+                deltas = cls.counter_deltas(added=vote_type)
+            elif vote.vote_type != vote_type:
+                deltas = cls.counter_deltas(added=vote_type, removed=vote.vote_type)
+                vote.vote_type = vote_type
+                vote.save(update_fields=['vote_type'])
+            else:
+                deltas = {}
+            if deltas:
+                Answer.objects.filter(pk=answer.pk).update(
+                    updated_at=timezone.now(),
+                    **{field: F(field) + delta for field, delta in deltas.items()},
+                )
+                # update() sends no post_save, so log the new counters for sync clients here.
+                ForumChange.record(ForumChange.Kind.ANSWER, answer.pk)
+                QuestionRanking.refresh(answer.question_id)
+        return vote, created
+
+    @classmethod
+    def cast_many(cls, user, ballots):
+        '''
+        cast() for a batch of (answer, vote_type) pairs on distinct answers, in
+        one transaction: one locking read, one bulk insert, one bulk update and
+        one counter update per distinct change. Returns [(vote, created)] in
+        the order of `ballots`.
+        '''
+        with transaction.atomic():
+            existing = {
+                vote.answer_id: vote
+                for vote in cls.objects.select_for_update().filter(user=user, answer__in=[answer for answer, _ in ballots])
+            }
+            results, new, changed = [], [], []
+            deltas_by_answer = {}
+            for answer, vote_type in ballots:
+                vote = existing.get(answer.pk)
+                created = vote is None
+                if created:
+                    vote = cls(user=user, answer=answer, vote_type=vote_type)
+                    new.append(vote)
+                    deltas = cls.counter_deltas(added=vote_type)
+                else:
+                    vote.user, vote.answer = user, answer  # Saves a query each when serialized.
+                    if vote.vote_type != vote_type:
+                        deltas = cls.counter_deltas(added=vote_type, removed=vote.vote_type)
+                        vote.vote_type = vote_type
+                        changed.append(vote)
+                    else:
+                        deltas = {}
+                results.append((vote, created))
+                if deltas:
+                    deltas_by_answer[answer] = deltas
+
+            if new:
+                try:
+                    with transaction.atomic():
+                        cls.objects.bulk_create(new)
+                except IntegrityError:
+                    # A concurrent request voted on one of these answers first.
+                    # Nothing is written yet, so cast() them one by one instead.
+                    return [cls.cast(user, answer, vote_type) for answer, vote_type in ballots]
+            if changed:
+                cls.objects.bulk_update(changed, ['vote_type'])
+
+            # Most batches only hold a few distinct deltas (+1 up, +1 down, switches).
+            answers_by_deltas = defaultdict(list)
+            for answer, deltas in deltas_by_answer.items():
+                answers_by_deltas[tuple(sorted(deltas.items()))].append(answer.pk)
+            now = timezone.now()
+            for deltas, answer_ids in answers_by_deltas.items():
+                Answer.objects.filter(pk__in=answer_ids).update(
+                    updated_at=now,
+                    **{field: F(field) + delta for field, delta in deltas},
+                )
+            ForumChange.record_many(ForumChange.Kind.ANSWER, [answer.pk for answer in deltas_by_answer])
+            QuestionRanking.refresh_many({answer.question_id for answer in deltas_by_answer})
+        return results
+
+class ForumChange(models.Model):
+    '''
+    Append-only change log behind the incremental sync feed
+    (/api/forum/changes/, see forum.sync). Every save or delete of a question,
+    answer or comment appends a row; its id is the change token, so a client
+    that has seen token N only needs the rows after N. Rows superseded by a
+    later change to the same object can be dropped with
+    `manage.py compact_forum_changes`.
+    '''
+    class Kind(models.TextChoices):
+        QUESTION = 'question', 'Question'
+        ANSWER = 'answer', 'Answer'
+        COMMENT = 'comment', 'Comment'
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'object_id'], name='forum_change_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{'Deleted' if self.deleted else 'Saved'} {self.kind} {self.object_id}"
+
+    @classmethod
+    def record(cls, kind, object_id, deleted=False):
+        return cls.objects.create(kind=kind, object_id=object_id, deleted=deleted)
+
+    @classmethod
+    def record_many(cls, kind, object_ids, deleted=False):
+        '''
+        record() for objects written with bulk queries, which send no signals.
+        '''
+        return cls.objects.bulk_create([cls(kind=kind, object_id=object_id, deleted=deleted) for object_id in object_ids])
+
+    @classmethod
+    def compact(cls):
+        '''
+        Delete rows that a later row for the same object supersedes. Clients
+        only ever apply an object's latest change, so this loses nothing.
+        Returns the number of rows deleted.
+        '''
+        later = cls.objects.filter(kind=OuterRef('kind'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+        deleted, _ = cls.objects.filter(Exists(later)).delete()
+        return deleted
+
+
+
+class QuestionRanking(models.Model):
+    '''
+    Precomputed ranking inputs for the question feeds
+    (/api/questions/feeds/<feed>/), one row per question, so a feed page is
+    a single index range scan instead of an aggregate over answers and votes.
+
+    Kept current by refresh() when questions, answers or votes change
+    (forum.signals, Vote.cast); `manage.py rebuild_question_rankings`
+    recomputes every row.
+    '''
+    # Reddit-style "hot": log10 of the points plus the age bonus, so a
+    # question HOT_HALF_LIFE_SECONDS younger needs 10x fewer points to rank
+    # alike. The score never decays, so nothing needs refreshing as time passes.
+    HOT_EPOCH = 1_700_000_000
+    HOT_HALF_LIFE_SECONDS = 45_000
+    ANSWER_POINTS = 2
+    WEEK_SECONDS = 7 * 24 * 3600
+
+    question = models.OneToOneField(Question, primary_key=True, related_name='ranking', on_delete=models.CASCADE)
+    # Copy of Question.timestamp, so feeds can filter and sort without a join.
+    created_at = models.DateTimeField()
+    # Which 7-day bucket (counted from the Unix epoch) created_at falls in. A
+    # rolling week spans at most two buckets, so the top-week feed reads two
+    # short ranges of ranking_week_points_idx instead of walking the all-time
+    # points index past every older question.
+    week = models.IntegerField()
+    answer_count = models.IntegerField(default=0)
+    vote_score = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    hot_score = models.FloatField(default=0)
+    last_activity_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-hot_score', '-question'], name='ranking_hot_idx'),
+            models.Index(fields=['-points', '-question'], name='ranking_points_idx'),
+            models.Index(fields=['week', '-points', '-question'], name='ranking_week_points_idx'),
+            models.Index(
+                fields=['-created_at', '-question'], condition=Q(answer_count=0), name='ranking_unanswered_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Ranking of {self.question_id}: {self.hot_score:.3f}"
+
+    @classmethod
+    def week_of(cls, moment):
+        return int(moment.timestamp() // cls.WEEK_SECONDS)
+
+    @classmethod
+    def weeks_since(cls, moment):
+        '''
+        The `week` buckets from `moment` up to now.
+        '''
+        return list(range(cls.week_of(moment), cls.week_of(timezone.now()) + 1))
+
+    @classmethod
+    def scores(cls, created_at, answer_count, vote_score, last_answer_at=None):
+        '''
+        The stored fields for a question with these statistics.
+        '''
+        points = vote_score + cls.ANSWER_POINTS * answer_count
+        order = math.log10(max(abs(points), 1))
+        sign = (points > 0) - (points < 0)
+        age = (created_at.timestamp() - cls.HOT_EPOCH) / cls.HOT_HALF_LIFE_SECONDS
+        return {
+            'created_at': created_at,
+            'week': cls.week_of(created_at),
+            'answer_count': answer_count,
+            'vote_score': vote_score,
+            'points': points,
+            'hot_score': round(sign * order + age, 7),
+            'last_activity_at': max(created_at, last_answer_at or created_at),
+        }
+
+    @staticmethod
+    def with_statistics(questions):
+        return questions.annotate(
+            answer_count=Count('answers'),
+            vote_score=Coalesce(Sum('answers__score'), 0),
+            last_answer_at=Max('answers__timestamp'),
+        ).values_list('pk', 'timestamp', 'answer_count', 'vote_score', 'last_answer_at')
+
+    @classmethod
+    def refresh(cls, question_id):
+        '''
+        Recompute one question's row from its answers (one aggregate, one write).
+        Does nothing if the question no longer exists.
+        '''
+        row = cls.with_statistics(Question.objects.filter(pk=question_id)).first()
+        if row is None:
+            return
+        _, *statistics = row
+        fields = cls.scores(*statistics)
+        if not cls.objects.filter(question_id=question_id).update(**fields):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(question_id=question_id, **fields)
+            except IntegrityError:
+                # Created concurrently; ours is at least as fresh.
+                cls.objects.filter(question_id=question_id).update(**fields)
+
+    @classmethod
+    def refresh_many(cls, question_ids):
+        '''
+        refresh() for several questions: one aggregate and one upsert.
+        '''
+        if not question_ids:
+            return 0
+        rows = cls.with_statistics(Question.objects.filter(pk__in=question_ids).order_by('pk'))
+        return cls.upsert([cls(question_id=question_id, **cls.scores(*statistics)) for question_id, *statistics in rows])
+
+    @classmethod
+    def upsert(cls, rankings):
+        fields = ['created_at', 'week', 'answer_count', 'vote_score', 'points', 'hot_score', 'last_activity_at']
+        return len(cls.objects.bulk_create(rankings, update_conflicts=True, unique_fields=['question'], update_fields=fields))
 
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        '''
+        Recompute every row with one aggregate scan and batched upserts.
+        Returns the number of questions ranked.
+        '''
+        total = 0
+        batch = []
+        rows = cls.with_statistics(Question.objects.order_by('pk')).iterator(chunk_size=batch_size)
+        for question_id, *statistics in rows:
+            batch.append(cls(question_id=question_id, **cls.scores(*statistics)))
+            if len(batch) >= batch_size:
+                total += cls.upsert(batch)
+                batch = []
+        if batch:
+            total += cls.upsert(batch)
+        return total
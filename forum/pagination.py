@@ -0,0 +1,155 @@
+'''
+Keyset (cursor) pagination for the forum feeds.
+
+Pages are addressed by the ordering values of the last row seen instead of
+an offset, so fetching page N costs the same index range scan as page 1 and
+rows inserted mid-scroll can't shift the window (no duplicates, no skips).
+'''
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    '''
+    Forward-only keyset pagination over a unique ordering.
+    - ordering: model fields to page by; the last one must be unique (usually the pk).
+    - page_size / max_page_size: default and upper bound for `?page_size=`.
+    '''
+    ordering = ('-timestamp', '-id')
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(queryset.model, request.query_params.get(self.cursor_query_param))
+        return self.set_page(list(self.get_page_queryset(queryset, position)[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        '''
+        paginate_queryset() for async views, fetching the page with the async ORM.
+        '''
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(queryset.model, request.query_params.get(self.cursor_query_param))
+        return self.set_page([row async for row in self.get_page_queryset(queryset, position)[:self.page_size + 1]])
+
+    def set_page(self, rows):
+        # One row past the page tells us whether there is a next page.
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_page_queryset(self, queryset, position=None):
+        '''
+        Order `queryset` by the keyset and keep only the rows after `position`.
+        Doesn't evaluate anything, so async callers can iterate the result.
+        '''
+        queryset = queryset.order_by(*self.ordering)
+        if position is None:
+            return queryset
+        return queryset.filter(self.position_filter(position))
+
+    def position_filter(self, position):
+        '''
+        Build `(a, b, ...) > (va, vb, ...)` (per-field direction) as ORM lookups.
+        The leading field also gets a non-strict bound so the database can
+        range-scan the composite index before checking the tie-breakers.
+        '''
+        fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        after = Q()
+        for i, (name, descending) in enumerate(fields):
+            step = Q(**{f'{name}__{"lt" if descending else "gt"}': position[i]})
+            for j, (prev_name, _) in enumerate(fields[:i]):
+                step &= Q(**{prev_name: position[j]})
+            after |= step
+        lead, descending = fields[0]
+        return Q(**{f'{lead}__{"lte" if descending else "gte"}': position[0]}) & after
+
+    def get_position(self, obj):
+        return [getattr(obj, name.lstrip('-')) for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        # Full-precision isoformat: DjangoJSONEncoder drops microseconds, which
+        # would make neighbouring timestamps collide in the cursor.
+        payload = json.dumps(self.get_position(obj), default=_encode_position_value)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, model, cursor):
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(cursor)
+            return [
+                model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+
+class QuestionCursorPagination(KeysetPagination):
+    '''
+    Newest-first question feed, paged by (timestamp, id).
+    '''
+    ordering = ('-timestamp', '-id')
+
+
+class HotQuestionPagination(KeysetPagination):
+    '''
+    QuestionRanking feeds; each ordering matches one of its indexes.
+    '''
+    ordering = ('-hot_score', '-question_id')
+
+
+class TopQuestionPagination(KeysetPagination):
+    ordering = ('-points', '-question_id')
+
+
+class UnansweredQuestionPagination(KeysetPagination):
+    ordering = ('-created_at', '-question_id')
+
+
+def _encode_position_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
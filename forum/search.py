@@ -0,0 +1,158 @@
+'''
+Full-text index over questions and answers.
+
+Every question and answer has one document in the `forum_search` table, kept
+in step by the signal handlers in forum/signals.py. Document ids are derived
+from the row they index (questions even, answers odd), so updating or
+dropping a document is a primary-key operation.
+
+- SQLite: an FTS5 virtual table ranked with bm25().
+- PostgreSQL: a stored tsvector column with a GIN index, ranked with ts_rank_cd().
+- Anything else: unranked `icontains` over the forum tables.
+'''
+import re
+
+from django.db import connection
+
+from .models import Answer, Question
+
+SEARCH_TABLE = 'forum_search'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def question_doc_id(question_id):
+    return question_id * 2
+
+
+def answer_doc_id(answer_id):
+    return answer_id * 2 + 1
+
+
+def _index(doc_id, question_id, answer_id, title, body):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [doc_id])
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, title, body, question_id, answer_id) VALUES (%s, %s, %s, %s, %s)',
+                [doc_id, title, body, question_id, answer_id],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (doc_id, title, body, question_id, answer_id) VALUES (%s, %s, %s, %s, %s) '
+                'ON CONFLICT (doc_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body',
+                [doc_id, title, body, question_id, answer_id],
+            )
+
+
+def index_question(question):
+    _index(question_doc_id(question.pk), question.pk, None, question.title, question.content)
+
+
+def index_answer(answer):
+    _index(answer_doc_id(answer.pk), answer.question_id, answer.pk, '', answer.content)
+
+
+def unindex(doc_id):
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    key = 'rowid' if connection.vendor == 'sqlite' else 'doc_id'
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE {key} = %s', [doc_id])
+
+
+def rebuild():
+    '''
+    Drop every document and re-index all questions and answers from their tables.
+    '''
+    if connection.vendor == 'sqlite':
+        key = 'rowid'
+    elif connection.vendor == 'postgresql':
+        key = 'doc_id'
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} ({key}, title, body, question_id, answer_id) '
+            f'SELECT id * 2, title, content, id, NULL FROM {Question._meta.db_table}'
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} ({key}, title, body, question_id, answer_id) '
+            f"SELECT id * 2 + 1, '', content, question_id, id FROM {Answer._meta.db_table}"
+        )
+
+
+def _fts5_query(text):
+    '''
+    Turn free text into an FTS5 query: every word must match, and the last
+    one may be a prefix (search-as-you-type). Quoting each token keeps FTS5
+    operators in user input from being interpreted.
+    '''
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(text, limit=20, offset=0):
+    '''
+    Return up to `limit` hits for `text`, best first, as dicts with
+    question_id, answer_id (None for the question itself), rank and snippet.
+    '''
+    if connection.vendor == 'sqlite':
+        query = _fts5_query(text)
+        if query is None:
+            return []
+        sql = (
+            f"SELECT question_id, answer_id, bm25({SEARCH_TABLE}, 10.0, 1.0) AS rank, "
+            f"snippet({SEARCH_TABLE}, 1, '<b>', '</b>', '…', 16) "
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s'
+        )
+        params = [query, limit, offset]
+    elif connection.vendor == 'postgresql':
+        if not _TOKEN_RE.search(text):
+            return []
+        sql = (
+            "SELECT question_id, answer_id, ts_rank_cd(document, query) AS rank, "
+            "ts_headline('english', body, query, 'StartSel=<b>, StopSel=</b>, MaxWords=24, MinWords=8') "
+            f"FROM {SEARCH_TABLE}, websearch_to_tsquery('english', %s) query "
+            'WHERE document @@ query ORDER BY rank DESC, doc_id DESC LIMIT %s OFFSET %s'
+        )
+        params = [text, limit, offset]
+    else:
+        return _search_without_index(text, limit, offset)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    # bm25() scores better matches lower; flip it so rank always grows with relevance.
+    sign = -1 if connection.vendor == 'sqlite' else 1
+    return [
+        {'question_id': question_id, 'answer_id': answer_id, 'rank': sign * rank, 'snippet': snippet}
+        for question_id, answer_id, rank, snippet in rows
+    ]
+
+
+def search_page(text, limit=20, offset=0):
+    '''
+    search() plus each hit's question title. Returns (hits, has_next).
+    '''
+    # One extra hit tells us whether there is a next page without a COUNT(*).
+    hits = search(text, limit=limit + 1, offset=offset)
+    has_next = len(hits) > limit
+    hits = hits[:limit]
+    titles = dict(Question.objects.filter(pk__in={hit['question_id'] for hit in hits}).values_list('id', 'title'))
+    for hit in hits:
+        hit['title'] = titles.get(hit['question_id'], '')
+    return hits, has_next
+
+
+def _search_without_index(text, limit, offset):
+    questions = Question.objects.filter(title__icontains=text).values_list('id', 'content')
+    answers = Answer.objects.filter(content__icontains=text).values_list('question_id', 'id', 'content')
+    hits = [{'question_id': pk, 'answer_id': None, 'rank': 0.0, 'snippet': content[:200]} for pk, content in questions]
+    hits += [{'question_id': q, 'answer_id': pk, 'rank': 0.0, 'snippet': content[:200]} for q, pk, content in answers]
+    return hits[offset:offset + limit]
@@ -1,7 +1,13 @@
+import logging
+
 from rest_framework import serializers
-from .models import Question, Answer, Comment, Vote
 
-class QuestionSerializer(serializers.ModelSerializer):
+from backend.sparse import SparseFieldsMixin
+from .models import Question, QuestionRanking, Answer, Comment, Vote, VoteType
+
+logger = logging.getLogger(__name__)
+
+class QuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.email')
 
     class Meta:
@@ -17,7 +23,7 @@ class QuestionSerializer(serializers.ModelSerializer):
 #         fields = ['id', 'question', 'user', 'content', 'timestamp']
 
 
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     question_id = serializers.PrimaryKeyRelatedField(
         queryset=Question.objects.all(),
         source='question',
@@ -27,10 +33,11 @@ class AnswerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Answer
-        fields = ['id', 'question_id', 'user', 'content', 'timestamp']
+        fields = ['id', 'question_id', 'user', 'content', 'timestamp', 'upvotes', 'downvotes', 'score']
+        read_only_fields = ['upvotes', 'downvotes', 'score']
 
     def create(self, validated_data):
-        print("Validated data in create:", validated_data)  # Debug print
+        logger.debug('Validated answer data: %s', validated_data)
         return Answer.objects.create(**validated_data)
 
 # class CommentSerializer(serializers.ModelSerializer):
@@ -41,7 +48,7 @@ class AnswerSerializer(serializers.ModelSerializer):
 #         model = Comment
 #         fields = ['id', 'answer', 'user', 'content', 'timestamp']
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.email')
     answer_id = serializers.PrimaryKeyRelatedField(
         queryset=Answer.objects.all(),
@@ -62,7 +69,7 @@ class CommentSerializer(serializers.ModelSerializer):
 #         fields = ['id', 'answer', 'user', 'vote_type']
 
 
-class VoteSerializer(serializers.ModelSerializer):
+class VoteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.email')
     answer_id = serializers.IntegerField(write_only=True)
 
@@ -70,6 +77,7 @@ class VoteSerializer(serializers.ModelSerializer):
         model = Vote
         fields = ['id', 'answer', 'answer_id', 'user', 'vote_type']
         read_only_fields = ['answer']
+        expandable_fields = {'answer': (AnswerSerializer, {'read_only': True})}
 
     def create(self, validated_data):
         answer_id = validated_data.pop('answer_id')
@@ -77,6 +85,105 @@ class VoteSerializer(serializers.ModelSerializer):
             answer = Answer.objects.get(id=answer_id)
         except Answer.DoesNotExist:
             raise serializers.ValidationError("Answer not found.")
-        validated_data['answer'] = answer
-        return super().create(validated_data)
+        # Voting again replaces the user's earlier vote instead of adding a row.
+        vote, self.created = Vote.cast(validated_data['user'], answer, validated_data['vote_type'])
+        return vote
+
+
+class BatchVoteSerializer(serializers.Serializer):
+    '''
+    One item of a POST /api/votes/batch/ list; forum.batch resolves the answers.
+    '''
+    answer_id = serializers.IntegerField()
+    vote_type = serializers.ChoiceField(choices=VoteType.choices)
+
+
+class BatchCommentSerializer(serializers.Serializer):
+    '''
+    One item of a POST /api/comments/batch/ list.
+    '''
+    answer_id = serializers.IntegerField()
+    content = serializers.CharField()
+
+
+class ThreadAnswerSerializer(serializers.ModelSerializer):
+    '''
+    Answer as shown inside a question thread: its comments plus vote totals.
+    Expects the queryset to prefetch `comments` (see QuestionThreadView).
+    '''
+    user = serializers.ReadOnlyField(source='user.email')
+    comments = CommentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Answer
+        fields = ['id', 'user', 'content', 'timestamp', 'upvotes', 'downvotes', 'score', 'comments']
+        read_only_fields = ['upvotes', 'downvotes', 'score']
+
+
+class QuestionThreadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    '''
+    A question with its whole answer/comment tree.
+    '''
+    user = serializers.ReadOnlyField(source='user.email')
+    answers = ThreadAnswerSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Question
+        fields = ['id', 'user', 'title', 'content', 'timestamp', 'answers']
 
+
+class RankedQuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    '''
+    A question in one of the ranked feeds, with the counters it was ranked by.
+    Expects the QuestionRanking queryset to select_related('question__user').
+    '''
+    id = serializers.ReadOnlyField(source='question_id')
+    user = serializers.ReadOnlyField(source='question.user.email')
+    title = serializers.ReadOnlyField(source='question.title')
+    content = serializers.ReadOnlyField(source='question.content')
+    timestamp = serializers.DateTimeField(source='created_at', read_only=True)
+
+    class Meta:
+        model = QuestionRanking
+        fields = ['id', 'user', 'title', 'content', 'timestamp', 'answer_count', 'vote_score', 'last_activity_at']
+
+
+class SearchHitSerializer(serializers.Serializer):
+    '''
+    One ranked match from forum.search; answer_id is null when the question itself matched.
+    '''
+    question_id = serializers.IntegerField()
+    answer_id = serializers.IntegerField(allow_null=True)
+    title = serializers.CharField()
+    snippet = serializers.CharField()
+    rank = serializers.FloatField()
+
+
+class SyncQuestionSerializer(serializers.ModelSerializer):
+    '''
+    Rows of the incremental sync feed (forum.sync) carry their parent's id and
+    `updated_at`, so clients can place and reconcile them in a local copy.
+    '''
+    user = serializers.ReadOnlyField(source='user.email')
+
+    class Meta:
+        model = Question
+        fields = ['id', 'user', 'title', 'content', 'timestamp', 'updated_at']
+
+
+class SyncAnswerSerializer(serializers.ModelSerializer):
+    user = serializers.ReadOnlyField(source='user.email')
+    question_id = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Answer
+        fields = ['id', 'question_id', 'user', 'content', 'timestamp', 'updated_at', 'upvotes', 'downvotes', 'score']
+
+
+class SyncCommentSerializer(serializers.ModelSerializer):
+    user = serializers.ReadOnlyField(source='user.email')
+    answer_id = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'answer_id', 'user', 'content', 'timestamp', 'updated_at']
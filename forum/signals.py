@@ -0,0 +1,62 @@
+'''
+Model signal handlers for the forum app. Connected in ForumConfig.ready().
+'''
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search, sync
+from .models import Answer, Comment, Question, QuestionRanking
+
+
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, **kwargs):
+    search.index_question(instance)
+
+
+@receiver(post_save, sender=Answer)
+def index_answer(sender, instance, **kwargs):
+    search.index_answer(instance)
+
+
+@receiver(post_delete, sender=Question)
+def unindex_question(sender, instance, **kwargs):
+    search.unindex(search.question_doc_id(instance.pk))
+
+
+@receiver(post_delete, sender=Answer)
+def unindex_answer(sender, instance, **kwargs):
+    search.unindex(search.answer_doc_id(instance.pk))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+@receiver(post_save, sender=Comment)
+def log_saved_change(sender, instance, **kwargs):
+    sync.record_change(instance)
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Answer)
+@receiver(post_delete, sender=Comment)
+def log_deleted_change(sender, instance, **kwargs):
+    sync.record_change(instance, deleted=True)
+
+
+@receiver(post_save, sender=Question)
+def rank_question(sender, instance, created, **kwargs):
+    if created:
+        QuestionRanking.refresh(instance.pk)
+
+
+@receiver(post_save, sender=Answer)
+def rerank_on_answer(sender, instance, created, **kwargs):
+    if created:
+        QuestionRanking.refresh(instance.question_id)
+
+
+@receiver(post_delete, sender=Answer)
+def rerank_on_answer_delete(sender, instance, **kwargs):
+    # After commit: when the whole question is being deleted there's nothing to rank.
+    question_id = instance.question_id
+    transaction.on_commit(lambda: QuestionRanking.refresh(question_id))
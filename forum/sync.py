@@ -0,0 +1,81 @@
+'''
+Incremental sync for clients that keep a local copy of the forum.
+
+GET /api/forum/changes/?since=<token> returns the questions, answers and
+comments saved since `token` plus the ids of those deleted, and the token to
+send next time. Start with since=0 (or no `since`) for a full download and
+keep calling while `has_more` is true. Only the latest state of each object
+is sent, however often it changed; a row in one page may reference a parent
+that arrives in a later one.
+
+Tokens are ForumChange ids. Ids are handed out when a row is inserted, not
+when its transaction commits, so a slow transaction could commit a change
+with a smaller id than one a client has already read past. Changes younger
+than FORUM_CHANGES_SETTLE_SECONDS are therefore held back until every
+transaction that could precede them has committed.
+'''
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Answer, Comment, ForumChange, Question
+from .serializers import SyncAnswerSerializer, SyncCommentSerializer, SyncQuestionSerializer
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+DEFAULT_SETTLE_SECONDS = 2
+
+KINDS = {
+    Question: ForumChange.Kind.QUESTION,
+    Answer: ForumChange.Kind.ANSWER,
+    Comment: ForumChange.Kind.COMMENT,
+}
+
+# kind -> (response key, model, serializer)
+FEEDS = {
+    ForumChange.Kind.QUESTION: ('questions', Question, SyncQuestionSerializer),
+    ForumChange.Kind.ANSWER: ('answers', Answer, SyncAnswerSerializer),
+    ForumChange.Kind.COMMENT: ('comments', Comment, SyncCommentSerializer),
+}
+
+
+def record_change(instance, deleted=False):
+    ForumChange.record(KINDS[type(instance)], instance.pk, deleted=deleted)
+
+
+def changes_since(token, limit=DEFAULT_LIMIT):
+    '''
+    The sync payload for a client at `token`: one query for the change log
+    and one per kind of object that changed.
+    '''
+    settle = getattr(settings, 'FORUM_CHANGES_SETTLE_SECONDS', DEFAULT_SETTLE_SECONDS)
+    entries = list(
+        ForumChange.objects
+        .filter(id__gt=token, changed_at__lte=timezone.now() - timedelta(seconds=settle))
+        .order_by('id')
+        .values_list('id', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for _, kind, object_id, deleted in entries:
+        # Later entries win; re-inserting moves the key to the end to keep change order.
+        latest.pop((kind, object_id), None)
+        latest[(kind, object_id)] = deleted
+
+    payload = {
+        'token': entries[-1][0] if entries else token,
+        'has_more': has_more,
+        'deleted': {key: [] for key, _, _ in FEEDS.values()},
+    }
+    for kind, (key, model, serializer_class) in FEEDS.items():
+        saved = [object_id for (entry_kind, object_id), deleted in latest.items() if entry_kind == kind and not deleted]
+        payload['deleted'][key] = [
+            object_id for (entry_kind, object_id), deleted in latest.items() if entry_kind == kind and deleted
+        ]
+        # Rows deleted since the entry was read are skipped; their tombstone follows.
+        rows = model.objects.select_related('user').in_bulk(saved) if saved else {}
+        payload[key] = serializer_class([rows[pk] for pk in saved if pk in rows], many=True).data
+    return payload
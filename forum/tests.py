@@ -1,3 +1,623 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend import instrumentation, querylog
+
+from . import batch, events
+from .models import Question, QuestionRanking, Answer, Comment, ForumChange, Vote
+
+User = get_user_model()
+
+
+class ForumTestCase(TestCase):
+    '''
+    Base test case with an authenticated API client.
+    '''
+    def setUp(self):
+        self.user = User.objects.create_user(email='student@example.com', password='pass1234', is_student=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class QuestionFeedPaginationTests(ForumTestCase):
+    def test_pages_follow_newest_first_without_duplicates(self):
+        for i in range(5):
+            Question.objects.create(user=self.user, title=f'Q{i}', content='...')
+        url = reverse('question-list-create')
+
+        first = self.client.get(url, {'page_size': 2}).json()
+        self.assertEqual([q['title'] for q in first['results']], ['Q4', 'Q3'])
+
+        # A question posted mid-scroll must not shift the next page.
+        Question.objects.create(user=self.user, title='late', content='...')
+        second = self.client.get(first['next']).json()
+        self.assertEqual([q['title'] for q in second['results']], ['Q2', 'Q1'])
+
+        third = self.client.get(second['next']).json()
+        self.assertEqual([q['title'] for q in third['results']], ['Q0'])
+        self.assertIsNone(third['next'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('question-list-create'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ListQueryCountTests(ForumTestCase):
+    '''
+    Every forum list endpoint must load its page in a fixed number of queries,
+    however many distinct authors the rows have (no per-row `user.email` lookup).
+    '''
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            author = User.objects.create_user(email=f'author{i}@example.com', password='pass1234')
+            question = Question.objects.create(user=author, title=f'Q{i}', content='...')
+            answer = Answer.objects.create(question=question, user=author, content='...')
+            Comment.objects.create(answer=answer, user=author, content='...')
+            Vote.objects.create(answer=answer, user=author, vote_type='upvote')
+
+    def assertListQueries(self, url_name, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+
+    def test_question_list(self):
+        self.assertListQueries('question-list-create', 1)
+
+    def test_answer_list(self):
+        self.assertListQueries('answer-list-create', 1)
+
+    def test_comment_list(self):
+        self.assertListQueries('comment-list-create', 1)
+
+    def test_vote_list(self):
+        self.assertListQueries('vote-list-create', 1)
+
+
+class QuestionFeedTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.voters = [User.objects.create_user(email=f'voter{i}@example.com', password='pass1234') for i in range(3)]
+        self.quiet = Question.objects.create(user=self.user, title='quiet', content='...')
+        self.popular = Question.objects.create(user=self.user, title='popular', content='...')
+        answer = Answer.objects.create(question=self.popular, user=self.user, content='A')
+        for voter in self.voters:
+            Vote.cast(voter, answer, 'upvote')
+        self.old = Question.objects.create(user=self.user, title='old', content='...')
+        Question.objects.filter(pk=self.old.pk).update(timestamp=timezone.now() - timedelta(days=30))
+        QuestionRanking.refresh(self.old.pk)
+
+    def feed(self, name, **params):
+        response = self.client.get(reverse('question-feed', args=[name]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def titles(self, page):
+        return [question['title'] for question in page['results']]
+
+    def test_rankings_follow_answers_and_votes(self):
+        ranking = QuestionRanking.objects.get(question=self.popular)
+        self.assertEqual((ranking.answer_count, ranking.vote_score, ranking.points), (1, 3, 5))
+        self.assertEqual(self.titles(self.feed('hot')), ['popular', 'quiet', 'old'])
+        self.assertEqual(self.titles(self.feed('unanswered')), ['quiet', 'old'])
+        self.assertEqual(self.titles(self.feed('top-week')), ['popular', 'quiet'])
+
+    def test_deleting_the_answer_reranks_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.filter(question=self.popular).delete()
+        self.assertEqual(self.titles(self.feed('unanswered')), ['popular', 'quiet', 'old'])
+
+    def test_feeds_page_with_a_keyset_in_one_query(self):
+        with self.assertNumQueries(1):
+            first = self.feed('hot', page_size=2)
+        self.assertEqual(self.titles(first), ['popular', 'quiet'])
+        self.assertEqual(self.titles(self.client.get(first['next']).json()), ['old'])
+
+    def test_top_week_spans_bucket_boundaries(self):
+        for days in (6, 8):
+            question = Question.objects.create(user=self.user, title=f'{days} days', content='...')
+            Question.objects.filter(pk=question.pk).update(timestamp=timezone.now() - timedelta(days=days))
+            QuestionRanking.refresh(question.pk)
+        with self.assertNumQueries(1):
+            page = self.feed('top-week')
+        self.assertEqual(self.titles(page), ['popular', '6 days', 'quiet'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'reads an SQLite query plan')
+    def test_top_week_reads_the_week_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.feed('top-week')
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('ranking_week_points_idx', plan)
+
+    def test_unknown_feed(self):
+        self.assertEqual(self.client.get(reverse('question-feed', args=['cold'])).status_code, 404)
+
+    def test_rebuild_command_repairs_rankings(self):
+        QuestionRanking.objects.filter(question=self.popular).update(points=0, hot_score=0, answer_count=0)
+        QuestionRanking.objects.filter(question=self.quiet).delete()
+        call_command('rebuild_question_rankings', stdout=StringIO())
+        self.assertEqual(QuestionRanking.objects.count(), 3)
+        self.assertEqual(self.titles(self.feed('hot')), ['popular', 'quiet', 'old'])
+
+
+class InstrumentationTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        question = Question.objects.create(user=self.user, title='Q', content='...')
+        Answer.objects.create(question=question, user=self.user, content='A')
+
+    def test_server_timing_and_request_log(self):
+        with self.assertLogs('backend.requests', 'INFO') as logs:
+            response = self.client.get(reverse('answer-list-create'))
+        timing = response['Server-Timing']
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        record = logs.records[0].request_metrics
+        self.assertEqual((record['view'], record['status'], record['db_queries']), ('answer-list-create', 200, 1))
+        self.assertGreater(record['serialize_ms'], 0)
+        self.assertEqual(record['response_bytes'], len(response.content))
+        self.assertIn('"view": "answer-list-create"', instrumentation.JSONFormatter().format(logs.records[0]))
+
+    def test_histograms_are_exported(self):
+        self.client.get(reverse('question-list-create'))
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_db_queries_count{view="question-list-create",method="GET"}', body)
+        self.assertIn('http_request_duration_seconds_recent{view="question-list-create",method="GET",status="200",quantile="0.95"}', body)
+
+    def test_histogram_quantiles(self):
+        histogram = instrumentation.Histogram('t', 'Test.', (1, 2, 4))
+        for value in (0.5, 1.5, 1.5, 3):
+            histogram.observe((), value)
+        self.assertEqual(histogram.quantile([1, 2, 1, 0], 0.5), 1.5)
+        self.assertIn('t_bucket{le="+Inf"} 4', histogram.render())
+
+
+class QueryInspectionTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            author = User.objects.create_user(email=f'author{i}@example.com', password='pass1234')
+            question = Question.objects.create(user=author, title=f'Q{i}', content='...')
+            answer = Answer.objects.create(question=question, user=author, content='...')
+            Comment.objects.create(answer=answer, user=author, content='...')
+            Vote.objects.create(answer=answer, user=author, vote_type='upvote')
+        self.question = question
+
+    def test_repeated_lookups_are_flagged_with_their_origin(self):
+        with querylog.inspect_queries() as inspector:
+            emails = [answer.user.email for answer in Answer.objects.all()]
+        self.assertEqual(len(emails), 4)
+        [finding] = inspector.report()['repeated']
+        self.assertEqual(finding['count'], 4)
+        self.assertIn('FROM "users_user"', finding['sql'])
+        self.assertTrue(finding['origins'][0].startswith('forum/tests.py:'))
+
+    def test_forum_endpoints_have_no_repeated_queries(self):
+        urls = [
+            reverse(name) for name in (
+                'question-list-create', 'answer-list-create', 'comment-list-create', 'vote-list-create', 'forum-changes',
+            )
+        ] + [
+            reverse('question-thread', args=[self.question.pk]),
+            reverse('question-feed', args=['hot']),
+        ]
+        for url in urls:
+            with self.subTest(url), querylog.inspect_queries() as inspector:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(inspector.report()['repeated'], [])
+
+    @override_settings(QUERY_INSPECTION='header', QUERY_INSPECTION_SLOW_MS=0)
+    def test_header_enables_inspection_per_request(self):
+        # Keep this request's deliberately "slow" findings out of the suite-wide report.
+        saved = dict(querylog.ENDPOINTS.endpoints)
+        querylog.ENDPOINTS.clear()
+        self.addCleanup(querylog.ENDPOINTS.endpoints.update, saved)
+        self.addCleanup(querylog.ENDPOINTS.clear)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('question-list-create')
+        self.assertNotIn('X-Query-Count', client.get(url))
+        with self.assertLogs('backend.queries', 'WARNING'):
+            response = client.get(url, HTTP_X_INSPECT_QUERIES='1')
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertEqual(response['X-Query-Slow'], '1')
+        self.assertIn('GET question-list-create', querylog.ENDPOINTS.endpoints)
+
+
+class QuestionThreadTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.question = Question.objects.create(user=self.user, title='Q', content='...')
+        for i in range(3):
+            author = User.objects.create_user(email=f'author{i}@example.com', password='pass1234')
+            answer = Answer.objects.create(question=self.question, user=author, content=f'A{i}')
+            Comment.objects.create(answer=answer, user=self.user, content='thanks')
+            Vote.cast(author, answer, 'upvote')
+            Vote.cast(self.user, answer, 'downvote' if i == 0 else 'upvote')
+
+    def test_thread_is_loaded_in_bounded_queries(self):
+        url = reverse('question-thread', args=[self.question.id])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        answers = response.json()['answers']
+        self.assertEqual([a['content'] for a in answers], ['A0', 'A1', 'A2'])
+        self.assertEqual((answers[0]['upvotes'], answers[0]['downvotes'], answers[0]['score']), (1, 1, 0))
+        self.assertEqual(answers[1]['score'], 2)
+        self.assertEqual(answers[2]['comments'][0]['user'], self.user.email)
+
+    def test_unknown_question_is_404(self):
+        response = self.client.get(reverse('question-thread', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class VoteCounterTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        question = Question.objects.create(user=self.user, title='Q', content='...')
+        self.answer = Answer.objects.create(question=question, user=self.user, content='A')
+
+    def vote(self, vote_type):
+        return self.client.post(reverse('vote-list-create'), {'answer_id': self.answer.id, 'vote_type': vote_type})
+
+    def assertCounters(self, upvotes, downvotes):
+        self.answer.refresh_from_db()
+        self.assertEqual(
+            (self.answer.upvotes, self.answer.downvotes, self.answer.score),
+            (upvotes, downvotes, upvotes - downvotes),
+        )
+
+    def test_first_vote_is_created_and_counted(self):
+        self.assertEqual(self.vote('upvote').status_code, 201)
+        self.assertCounters(1, 0)
+
+    def test_voting_again_changes_the_vote_instead_of_duplicating_it(self):
+        self.vote('upvote')
+        self.assertEqual(self.vote('upvote').status_code, 200)
+        self.assertCounters(1, 0)
+        self.vote('downvote')
+        self.assertCounters(0, 1)
+        self.assertEqual(Vote.objects.filter(answer=self.answer).count(), 1)
+
+    def test_unknown_vote_type_is_rejected(self):
+        self.assertEqual(self.vote('sideways').status_code, 400)
+
+    def test_votes_can_expand_their_answer(self):
+        self.vote('upvote')
+        response = self.client.get(reverse('vote-list-create'), {'expand': 'answer', 'fields': 'vote_type,answer.score'})
+        self.assertEqual(response.json(), [{'vote_type': 'upvote', 'answer': {'score': 1}}])
+
+    def test_rebuild_command_repairs_counters(self):
+        other = User.objects.create_user(email='other@example.com', password='pass1234')
+        Vote.objects.create(user=self.user, answer=self.answer, vote_type='upvote')
+        Vote.objects.create(user=other, answer=self.answer, vote_type='downvote')
+        Answer.objects.filter(pk=self.answer.pk).update(upvotes=7, downvotes=7, score=7)
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.assertCounters(1, 1)
+
+
+class BatchWriteTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.question = Question.objects.create(user=self.user, title='Q', content='...')
+        self.answers = [
+            Answer.objects.create(question=self.question, user=self.user, content=f'A{i}') for i in range(12)
+        ]
+
+    def post(self, name, items):
+        return self.client.post(reverse(name), items, format='json')
+
+    def test_votes_get_per_item_results(self):
+        first, second = self.answers[:2]
+        Vote.cast(self.user, second, 'upvote')
+        response = self.post('vote-batch', [
+            {'answer_id': first.pk, 'vote_type': 'upvote'},
+            {'answer_id': second.pk, 'vote_type': 'downvote'},
+            {'answer_id': 0, 'vote_type': 'upvote'},
+            {'answer_id': first.pk, 'vote_type': 'sideways'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 200, 400, 400])
+        self.assertIn('answer_id', response.data['results'][2]['errors'])
+        self.assertIn('vote_type', response.data['results'][3]['errors'])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.upvotes, first.downvotes, first.score), (1, 0, 1))
+        self.assertEqual((second.upvotes, second.downvotes, second.score), (0, 1, -1))
+        self.assertEqual(QuestionRanking.objects.get(question=self.question).vote_score, 0)
+        self.assertEqual(
+            set(ForumChange.objects.filter(kind='answer', object_id__in=[first.pk, second.pk]).values_list('object_id', flat=True)),
+            {first.pk, second.pk},
+        )
+
+    def test_later_vote_on_the_same_answer_wins(self):
+        answer = self.answers[0]
+        response = self.post('vote-batch', [
+            {'answer_id': answer.pk, 'vote_type': 'upvote'},
+            {'answer_id': answer.pk, 'vote_type': 'downvote'},
+        ])
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 200])
+        self.assertEqual(Vote.objects.get(answer=answer).vote_type, 'downvote')
+        answer.refresh_from_db()
+        self.assertEqual((answer.upvotes, answer.downvotes), (0, 1))
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def queries(answers):
+            items = [{'answer_id': answer.pk, 'vote_type': 'upvote'} for answer in answers]
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.post('vote-batch', items).status_code, 200)
+            return len(context)
+
+        self.assertEqual(queries(self.answers[:2]), queries(self.answers[2:]))
+
+    def test_comments_are_created_and_logged(self):
+        answer = self.answers[0]
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.post('comment-batch', [
+                {'answer_id': answer.pk, 'content': 'First'},
+                {'answer_id': answer.pk, 'content': ''},
+                {'answer_id': self.answers[1].pk, 'content': 'Second'},
+            ])
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 400, 201])
+        self.assertEqual(response.data['results'][2]['data']['content'], 'Second')
+        comments = Comment.objects.filter(user=self.user)
+        self.assertEqual(comments.count(), 2)
+        self.assertEqual(ForumChange.objects.filter(kind='comment', object_id__in=comments.values('pk')).count(), 2)
+        self.assertEqual(len(callbacks), 2)
+
+    def test_malformed_batches_are_rejected(self):
+        self.assertEqual(self.post('vote-batch', {'answer_id': 1, 'vote_type': 'upvote'}).status_code, 400)
+        self.assertEqual(self.post('comment-batch', []).status_code, 400)
+        items = [{'answer_id': self.answers[0].pk, 'content': 'x'}] * (batch.MAX_ITEMS + 1)
+        self.assertEqual(self.post('comment-batch', items).status_code, 400)
+        self.assertFalse(Comment.objects.exists())
+
+
+class ForumSearchTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.graphs = Question.objects.create(user=self.user, title='Graph traversal', content='BFS or DFS?')
+        self.sorting = Question.objects.create(user=self.user, title='Sorting', content='Is quicksort stable?')
+        self.answer = Answer.objects.create(question=self.sorting, user=self.user, content='Use mergesort for stable sorting.')
+
+    def search(self, q, **params):
+        return self.client.get(reverse('forum-search'), {'q': q, **params}).json()
+
+    def test_matches_questions_and_answers(self):
+        hits = self.search('stable')['results']
+        self.assertEqual({(hit['question_id'], hit['answer_id']) for hit in hits}, {(self.sorting.id, None), (self.sorting.id, self.answer.id)})
+        self.assertTrue(all(hit['title'] == 'Sorting' for hit in hits))
+
+    def test_index_follows_edits_and_deletes(self):
+        self.graphs.title = 'Dijkstra shortest paths'
+        self.graphs.save()
+        self.assertEqual(self.search('traversal')['results'], [])
+        self.assertEqual(len(self.search('dijkstra')['results']), 1)
+        self.answer.delete()
+        self.assertEqual([hit['answer_id'] for hit in self.search('mergesort')['results']], [])
+
+    def test_results_are_paginated(self):
+        first = self.search('sort', limit=1)
+        self.assertEqual(len(first['results']), 1)
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get(reverse('forum-search')).status_code, 400)
+
+
+@override_settings(FORUM_CHANGES_SETTLE_SECONDS=0)
+class ForumChangesTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        self.question = Question.objects.create(user=self.user, title='Q', content='...')
+        self.answer = Answer.objects.create(question=self.question, user=self.user, content='A')
+        self.comment = Comment.objects.create(answer=self.answer, user=self.user, content='C')
+
+    def changes(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(reverse('forum-changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, payload, key):
+        return [row['id'] for row in payload[key]]
+
+    def test_full_sync_then_only_new_changes(self):
+        full = self.changes()
+        self.assertEqual(self.ids(full, 'questions'), [self.question.pk])
+        self.assertEqual(full['answers'][0]['question_id'], self.question.pk)
+        self.assertEqual(full['comments'][0]['answer_id'], self.answer.pk)
+        self.assertFalse(full['has_more'])
+
+        self.assertEqual(self.changes(full['token'])['questions'], [])
+        self.question.title = 'Edited'
+        self.question.save()
+        delta = self.changes(full['token'])
+        self.assertEqual([row['title'] for row in delta['questions']], ['Edited'])
+        self.assertEqual((delta['answers'], delta['comments']), ([], []))
+
+    def test_deletions_are_tombstoned(self):
+        token = self.changes()['token']
+        expected = {'questions': [self.question.pk], 'answers': [self.answer.pk], 'comments': [self.comment.pk]}
+        self.question.delete()
+        delta = self.changes(token)
+        self.assertEqual(delta['deleted'], expected)
+        self.assertEqual((delta['questions'], delta['answers']), ([], []))
+
+    def test_votes_sync_the_answer_counters(self):
+        token = self.changes()['token']
+        self.client.post(reverse('vote-list-create'), {'answer_id': self.answer.pk, 'vote_type': 'upvote'})
+        delta = self.changes(token)
+        self.assertEqual([(row['id'], row['score']) for row in delta['answers']], [(self.answer.pk, 1)])
+
+    def test_pages_follow_the_token(self):
+        for i in range(4):
+            Question.objects.create(user=self.user, title=f'More {i}', content='...')
+        seen, token, has_more = [], 0, True
+        while has_more:
+            page = self.changes(token, limit=2)
+            seen += self.ids(page, 'questions')
+            token, has_more = page['token'], page['has_more']
+        self.assertEqual(len(seen), 5)
+
+    def test_changes_load_in_fixed_queries(self):
+        for i in range(5):
+            author = User.objects.create_user(email=f'author{i}@example.com', password='pass1234')
+            Comment.objects.create(answer=self.answer, user=author, content='...')
+        # Change log, then one query per kind.
+        with self.assertNumQueries(4):
+            self.changes()
+
+    def test_unsettled_changes_are_held_back(self):
+        token = self.changes()['token']
+        with self.settings(FORUM_CHANGES_SETTLE_SECONDS=60):
+            Question.objects.create(user=self.user, title='Fresh', content='...')
+            self.assertEqual(self.changes(token)['token'], token)
+        self.assertEqual(self.changes(token)['questions'][0]['title'], 'Fresh')
+
+    def test_compaction_keeps_the_latest_change(self):
+        self.question.save()
+        self.question.save()
+        call_command('compact_forum_changes', stdout=StringIO())
+        self.assertEqual(ForumChange.objects.filter(kind='question', object_id=self.question.pk).count(), 1)
+        self.assertEqual(self.ids(self.changes(), 'questions'), [self.question.pk])
+
+    def test_invalid_token(self):
+        self.assertEqual(self.client.get(reverse('forum-changes'), {'since': 'abc'}).status_code, 400)
+
+
+class AsyncReadViewTests(ForumTestCase):
+    '''
+    The /api/async/ endpoints must return exactly what their sync counterparts do.
+    '''
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            question = Question.objects.create(user=self.user, title=f'Async question {i}', content='asyncio event loop')
+            answer = Answer.objects.create(question=question, user=self.user, content='use uvicorn workers')
+            Comment.objects.create(answer=answer, user=self.user, content='thanks')
+        self.question = question
+        self.token_client = APIClient()
+        self.token_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def assertSameAsSync(self, sync_url, async_url, params=None):
+        expected = self.client.get(sync_url, params)
+        response = self.token_client.get(async_url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+        return response.json()
+
+    def test_question_list_pages_like_the_sync_feed(self):
+        expected = self.client.get(reverse('question-list-create'), {'page_size': 2}).json()
+        first = self.token_client.get(reverse('async-question-list'), {'page_size': 2}).json()
+        self.assertEqual(first['results'], expected['results'])
+        self.assertEqual(first['next'].replace('/api/async/', '/api/'), expected['next'])
+        second = self.token_client.get(first['next']).json()
+        self.assertEqual([q['title'] for q in second['results']], ['Async question 0'])
+
+    def test_thread_in_three_queries(self):
+        with self.assertNumQueries(4):  # user lookup for the token + question, answers, comments
+            self.token_client.get(reverse('async-question-thread', args=[self.question.pk]))
+        self.assertSameAsSync(
+            reverse('question-thread', args=[self.question.pk]), reverse('async-question-thread', args=[self.question.pk]),
+        )
+        self.assertEqual(self.token_client.get(reverse('async-question-thread', args=[999])).status_code, 404)
+
+    def test_search(self):
+        data = self.assertSameAsSync(reverse('forum-search'), reverse('async-forum-search'), {'q': 'uvicorn'})
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(self.token_client.get(reverse('async-forum-search')).status_code, 400)
+
+    def test_requires_authentication(self):
+        response = APIClient().get(reverse('async-question-list'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+
+@override_settings(FORUM_EVENTS_ENABLED=True)
+class QuestionEventsTests(ForumTestCase):
+    def setUp(self):
+        super().setUp()
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+        self.question = Question.objects.create(user=self.user, title='Live', content='...')
+        self.answer = Answer.objects.create(question=self.question, user=self.user, content='first')
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def post(self, name, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse(name), data, format='json')
+
+    async def next_event(self, stream):
+        while True:
+            chunk = await asyncio.wait_for(anext(stream), timeout=5)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith('id:'):
+                fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+                return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+    async def open_stream(self, **headers):
+        response = await self.async_client.get(reverse('question-events', args=[self.question.pk]), headers={**self.auth, **headers})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response.streaming_content
+
+    async def test_answers_comments_and_votes_are_pushed(self):
+        stream = await self.open_stream()
+        post = sync_to_async(self.post)
+
+        await post('answer-list-create', {'question_id': self.question.pk, 'content': 'pushed answer'})
+        _, kind, data = await self.next_event(stream)
+        self.assertEqual((kind, data['content']), ('answer.created', 'pushed answer'))
+
+        await post('comment-list-create', {'answer_id': self.answer.pk, 'content': 'pushed comment'})
+        _, kind, data = await self.next_event(stream)
+        self.assertEqual((kind, data['content'], data['answer_id']), ('comment.created', 'pushed comment', self.answer.pk))
+
+        await post('vote-list-create', {'answer_id': self.answer.pk, 'vote_type': 'upvote'})
+        _, kind, data = await self.next_event(stream)
+        self.assertEqual((kind, data), ('vote.changed', {'id': self.answer.pk, 'upvotes': 1, 'downvotes': 0, 'score': 1}))
+        await stream.aclose()
+
+    async def test_reconnect_replays_missed_events(self):
+        stream = await self.open_stream()
+        await sync_to_async(self.post)('vote-list-create', {'answer_id': self.answer.pk, 'vote_type': 'upvote'})
+        first_id, _, _ = await self.next_event(stream)
+        await stream.aclose()
+
+        await sync_to_async(self.post)('vote-list-create', {'answer_id': self.answer.pk, 'vote_type': 'downvote'})
+        stream = await self.open_stream(**{'Last-Event-ID': str(first_id)})
+        _, kind, data = await self.next_event(stream)
+        self.assertEqual((kind, data['score']), ('vote.changed', -1))
+        await stream.aclose()
+
+    async def test_unknown_question_and_disabled_stream(self):
+        response = await self.async_client.get(reverse('question-events', args=[999]), headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+        with self.settings(FORUM_EVENTS_ENABLED=False):
+            response = await self.async_client.get(reverse('question-events', args=[self.question.pk]), headers=self.auth)
+        self.assertEqual(response.status_code, 503)
@@ -1,9 +1,21 @@
 from django.urls import path
-from .views import QuestionListCreateView, AnswerListCreateView, CommentListCreateView, VoteListCreateView
+from .async_views import AsyncQuestionListView, AsyncQuestionThreadView, AsyncForumSearchView, QuestionEventsView
+from .views import QuestionListCreateView, QuestionFeedView, QuestionThreadView, ForumSearchView, ForumChangesView, AnswerListCreateView, CommentListCreateView, CommentBatchView, VoteListCreateView, VoteBatchView
 
 urlpatterns = [
     path('questions/', QuestionListCreateView.as_view(), name='question-list-create'),
+    path('questions/feeds/<slug:feed>/', QuestionFeedView.as_view(), name='question-feed'),
+    path('questions/<int:pk>/thread/', QuestionThreadView.as_view(), name='question-thread'),
+    path('questions/<int:pk>/events/', QuestionEventsView.as_view(), name='question-events'),
     path('answers/', AnswerListCreateView.as_view(), name='answer-list-create'),
     path('comments/', CommentListCreateView.as_view(), name='comment-list-create'),
+    path('comments/batch/', CommentBatchView.as_view(), name='comment-batch'),
     path('votes/', VoteListCreateView.as_view(), name='vote-list-create'),
+    path('votes/batch/', VoteBatchView.as_view(), name='vote-batch'),
+    path('forum/search/', ForumSearchView.as_view(), name='forum-search'),
+    path('forum/changes/', ForumChangesView.as_view(), name='forum-changes'),
+    # Async versions of the read endpoints above, for ASGI deployments.
+    path('async/questions/', AsyncQuestionListView.as_view(), name='async-question-list'),
+    path('async/questions/<int:pk>/thread/', AsyncQuestionThreadView.as_view(), name='async-question-thread'),
+    path('async/forum/search/', AsyncForumSearchView.as_view(), name='async-forum-search'),
 ]
@@ -1,18 +1,139 @@
+import logging
+from datetime import timedelta
+
+from django.db.models import Prefetch
+from django.utils import timezone
 from rest_framework import generics, status
-from .models import Question, Answer, Comment, Vote
-from .serializers import QuestionSerializer, AnswerSerializer, CommentSerializer, VoteSerializer
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+from backend.instrumentation import SerializerTimingMixin, time_serializer
+from backend.sparse import SparseQuerysetMixin
+from . import batch, events, search, sync
+from .models import Question, QuestionRanking, Answer, Comment, Vote
+from .serializers import QuestionSerializer, AnswerSerializer, CommentSerializer, VoteSerializer, QuestionThreadSerializer, RankedQuestionSerializer, SearchHitSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from .pagination import HotQuestionPagination, QuestionCursorPagination, TopQuestionPagination, UnansweredQuestionPagination
+
+logger = logging.getLogger(__name__)
 
 
-class QuestionListCreateView(generics.ListCreateAPIView):
-    queryset = Question.objects.all()
+class QuestionListCreateView(SerializerTimingMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
+    queryset = Question.objects.select_related('user')
     serializer_class = QuestionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = QuestionCursorPagination
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+class QuestionFeedView(SerializerTimingMixin, SparseQuerysetMixin, generics.ListAPIView):
+    '''
+    Ranked question feeds, read from the precomputed QuestionRanking rows:
+    - hot: points weighted by recency;
+    - unanswered: newest questions without answers;
+    - top-week: most points among questions asked in the last 7 days.
+    '''
+    queryset = QuestionRanking.objects.select_related('question__user')
+    serializer_class = RankedQuestionSerializer
+    permission_classes = [IsAuthenticated]
+    feeds = {
+        'hot': HotQuestionPagination,
+        'unanswered': UnansweredQuestionPagination,
+        'top-week': TopQuestionPagination,
+    }
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.kwargs['feed'] not in self.feeds:
+            raise NotFound(f'Unknown feed; use one of {", ".join(self.feeds)}.')
+
+    @property
+    def pagination_class(self):
+        return self.feeds[self.kwargs['feed']]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.kwargs['feed'] == 'unanswered':
+            return queryset.filter(answer_count=0)
+        if self.kwargs['feed'] == 'top-week':
+            since = timezone.now() - timedelta(days=7)
+            # The week filter lets the database use ranking_week_points_idx.
+            return queryset.filter(week__in=QuestionRanking.weeks_since(since), created_at__gte=since)
+        return queryset
+
+class QuestionThreadView(SerializerTimingMixin, generics.RetrieveAPIView):
+    '''
+    A question with its answers, their comments and vote totals, in three
+    queries (question, answers, comments) whatever the thread size.
+    '''
+    serializer_class = QuestionThreadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return thread_queryset()
+
+def thread_queryset():
+    answers = Answer.objects.select_related('user').order_by('timestamp', 'id')
+    comments = Comment.objects.select_related('user').order_by('timestamp', 'id')
+    return Question.objects.select_related('user').prefetch_related(
+        Prefetch('answers', queryset=answers),
+        Prefetch('answers__comments', queryset=comments),
+    )
+
+class SearchParamsMixin:
+    '''
+    `?q=<text>&limit=&offset=` handling shared by the sync and async search views.
+    '''
+    default_limit = 20
+    max_limit = 50
+
+    def get_search_params(self, query_params):
+        text = query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        try:
+            limit = min(max(int(query_params.get('limit', self.default_limit)), 1), self.max_limit)
+            offset = max(int(query_params.get('offset', 0)), 0)
+        except ValueError:
+            raise ValidationError('limit and offset must be integers.')
+        return text, limit, offset
+
+    def get_search_next_link(self, request, has_next, limit, offset):
+        if not has_next:
+            return None
+        return replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+
+class ForumSearchView(SerializerTimingMixin, SearchParamsMixin, generics.GenericAPIView):
+    '''
+    Ranked full-text search over questions and answers: `?q=<text>&limit=&offset=`.
+    '''
+    serializer_class = SearchHitSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        text, limit, offset = self.get_search_params(request.query_params)
+        hits, has_next = search.search_page(text, limit=limit, offset=offset)
+        return Response({
+            'next': self.get_search_next_link(request, has_next, limit, offset),
+            'results': self.get_serializer(hits, many=True).data,
+        })
+
+class ForumChangesView(generics.GenericAPIView):
+    '''
+    Incremental sync: `?since=<token>&limit=`. See forum.sync for the payload.
+    '''
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = max(int(request.query_params.get('since', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', sync.DEFAULT_LIMIT)), 1), sync.MAX_LIMIT)
+        except ValueError:
+            raise ValidationError('since and limit must be integers.')
+        return Response(sync.changes_since(since, limit))
+
 # class AnswerListCreateView(generics.ListCreateAPIView):
 #     queryset = Answer.objects.all()
 #     serializer_class = AnswerSerializer
@@ -22,12 +143,12 @@ class QuestionListCreateView(generics.ListCreateAPIView):
 #         serializer.save(user=self.request.user)
 
 
-class AnswerListCreateView(generics.ListCreateAPIView):
-    queryset = Answer.objects.all()
+class AnswerListCreateView(SerializerTimingMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
+    queryset = Answer.objects.select_related('user')
     serializer_class = AnswerSerializer
 
     def create(self, request, *args, **kwargs):
-        print("Request data:", request.data)  # Debug print
+        logger.debug('Answer request data: %s', request.data)
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -41,20 +162,22 @@ class AnswerListCreateView(generics.ListCreateAPIView):
                 user=request.user,
                 content=content
             )
-            return Response(AnswerSerializer(answer).data, status=status.HTTP_201_CREATED)
+            events.publish_answer(answer)
+            return Response(time_serializer(AnswerSerializer(answer)).data, status=status.HTTP_201_CREATED)
         except Question.DoesNotExist:
             return Response({"error": "Question does not exist"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print("Error:", str(e))  # Debug print
+            logger.exception('Could not create answer')
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class CommentListCreateView(generics.ListCreateAPIView):
-    queryset = Comment.objects.all()
+class CommentListCreateView(SerializerTimingMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
+    queryset = Comment.objects.select_related('user')
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        comment = serializer.save(user=self.request.user)
+        events.publish_comment(comment)
 
 # from rest_framework import generics, status
 # from rest_framework.response import Response
@@ -101,11 +224,39 @@ class CommentListCreateView(generics.ListCreateAPIView):
 #     def perform_create(self, serializer):
 #         serializer.save(user=self.request.user)
 
-class VoteListCreateView(generics.ListCreateAPIView):
-    queryset = Vote.objects.all()
+class VoteListCreateView(SerializerTimingMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
+    queryset = Vote.objects.select_related('user')
     serializer_class = VoteSerializer
     permission_classes = [IsAuthenticated]
 
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        # 201 for a first vote, 200 when the user changed an existing one.
+        code = status.HTTP_201_CREATED if serializer.created else status.HTTP_200_OK
+        return Response(serializer.data, status=code)
+
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        vote = serializer.save(user=self.request.user)
+        events.publish_vote_counts(vote.answer_id)
+
+
+class VoteBatchView(generics.GenericAPIView):
+    '''
+    POST a list of votes, written in one transaction. See forum.batch.
+    '''
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        return Response({'results': batch.cast_votes(request.user, request.data)})
+
+
+class CommentBatchView(generics.GenericAPIView):
+    '''
+    POST a list of comments, written in one transaction. See forum.batch.
+    '''
+    permission_classes = [IsAuthenticated]
 
+    def post(self, request, *args, **kwargs):
+        return Response({'results': batch.create_comments(request.user, request.data)})
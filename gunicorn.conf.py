@@ -0,0 +1,19 @@
+"""
+gunicorn settings (read automatically from the working directory).
+
+SERVER_MODE=wsgi (default) serves backend.wsgi with gunicorn's own workers.
+SERVER_MODE=asgi serves backend.asgi on uvicorn workers: the async views
+under /api/async/ then wait on the database or slow clients without
+holding a thread each. WEB_CONCURRENCY sets the number of worker processes.
+"""
+import os
+
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "backend.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "backend.wsgi:application"
+    # More than one thread switches gunicorn to its threaded worker.
+    threads = int(os.getenv("GUNICORN_THREADS", 1))
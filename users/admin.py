@@ -17,7 +17,7 @@ admin.site.register(User, UserAdmin)
 
 class TutorAdmin(admin.ModelAdmin):
     list_display = ('user', 'first_name', 'last_name', 'year', 'courses', 'bio', 'rating', 'total_ratings')
-    readonly_fields = ('rating', 'total_ratings')
+    readonly_fields = ('rating', 'rating_sum', 'total_ratings')
     search_fields = ('user__email', 'first_name', 'last_name')
 
     def save_model(self, request, obj, form, change):
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from backend.db import configure_sqlite
+        from . import signals  # noqa: F401
+
+        connection_created.connect(configure_sqlite, dispatch_uid='configure_sqlite')
@@ -0,0 +1,59 @@
+'''
+JWT authentication classes for the API.
+'''
+from asgiref.sync import sync_to_async
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from . import revocation
+from .models import TokenClaimsUser
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    '''
+    simplejwt's JWTAuthentication plus the users.revocation denylist (logout, role changes).
+    '''
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revocation.is_revoked(validated_token):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        return validated_token
+
+    async def aauthenticate(self, request):
+        '''
+        authenticate() for async views. The token checks run inline; only
+        loading the user touches the database.
+        '''
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        return await sync_to_async(self.get_user)(validated_token)
+
+
+class StatelessJWTAuthentication(RevocableJWTAuthentication):
+    '''
+    Opt-in (JWT_STATELESS_AUTH=1): trusts the signed user claims embedded by
+    MyTokenObtainPairSerializer instead of loading the user row on every request.
+    The user is a TokenClaimsUser; tokens issued before the claims existed
+    fall back to the database lookup.
+    '''
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        if revocation.CLAIMS_ISSUED_AT not in validated_token:
+            return super().get_user(validated_token)
+        return TokenClaimsUser.from_claims(validated_token)
+
+    async def aget_user(self, validated_token):
+        if revocation.CLAIMS_ISSUED_AT in validated_token:
+            return self.get_user(validated_token)  # no database access
+        return await super().aget_user(validated_token)
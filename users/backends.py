@@ -0,0 +1,29 @@
+'''
+Authentication backends for the users app.
+'''
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    '''
+    ModelBackend that fetches the tutor profile in the same query as the user,
+    so building the login response (MyTokenObtainPairSerializer) needs no
+    second lookup.
+    '''
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            user = UserModel._default_manager.select_related('tutor').get(**{UserModel.USERNAME_FIELD: username})
+        except UserModel.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            UserModel().set_password(password)
+        else:
+            if user.check_password(password) and self.user_can_authenticate(user):
+                return user
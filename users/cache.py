@@ -0,0 +1,96 @@
+'''
+Versioned read-through cache for the tutor directory endpoints.
+
+Cached responses are keyed by a global "tutors version". Any change to a
+Tutor or TutorCourse, or to what the directory shows of a tutor's User,
+bumps it (see users/signals.py), which orphans
+every cached page at once instead of tracking which pages a change touches.
+The version also forms the ETag, so a client revalidating with
+If-None-Match gets a 304 before the cache or the database is even read.
+
+The cache alias is TUTOR_CACHE_ALIAS (default "default": local memory unless
+CACHE_BACKEND is configured). Local memory is per process, so deployments with
+several workers should point CACHE_BACKEND at a shared backend.
+'''
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'tutors:version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'TUTOR_CACHE_ALIAS', 'default')]
+
+
+def get_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate():
+    '''
+    Bump now, and again once the surrounding transaction commits, so a page
+    rendered from pre-commit data in between can't outlive the change.
+    '''
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+class CachedReadMixin:
+    '''
+    Serve GET from the tutor cache and answer If-None-Match with 304.
+    Caches the serialized data rather than rendered bytes, so every renderer
+    (and content negotiation) still works on a hit.
+    '''
+    cache_timeout = None
+
+    def get(self, request, *args, **kwargs):
+        version = get_version()
+        # Keyed by the negotiated format too: JSON and MessagePack bodies differ.
+        variant = f'{request.build_absolute_uri()} {request.accepted_media_type}'
+        url_key = hashlib.sha1(variant.encode()).hexdigest()
+        etag = f'"{version}-{url_key[:16]}"'
+        if etag in _parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            patch_vary_headers(response, ['Accept'])
+            return response
+
+        cache = get_cache()
+        cache_key = f'tutors:{version}:{url_key}'
+        data = cache.get(cache_key)
+        if data is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                timeout = self.cache_timeout or getattr(settings, 'TUTOR_CACHE_TIMEOUT', 300)
+                cache.set(cache_key, response.data, timeout)
+        else:
+            response = Response(data)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+
+def _parse_etags(header):
+    return {tag.strip() for tag in header.split(',') if tag.strip()}
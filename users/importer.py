@@ -0,0 +1,229 @@
+'''
+Bulk import of students and tutors from CSV or JSON Lines.
+
+Rows are streamed from the file and handled in chunks: each chunk is
+validated in memory, checked against existing e-mails with one query, has
+its passwords hashed (in a process pool when `workers` > 1, which only
+`manage.py import_users` uses) and is written with bulk_create in one
+transaction. Bad rows are reported with their line number and skipped;
+they never abort the rest of the import.
+
+Columns / keys: email, password, role (student|tutor), and for tutors
+first_name, last_name, year, courses (e.g. "DS,AI"), bio, calendly_link.
+'''
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from . import cache as tutor_cache
+from .models import Course, Student, Tutor, TutorCourse, User
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class CourseListField(serializers.Field):
+    '''
+    Courses as a list or a "DS,AI" / "DS;AI" string.
+    '''
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = data.replace(';', ',').split(',')
+        if not isinstance(data, list):
+            raise serializers.ValidationError('Expected a list of course codes.')
+        courses = [str(code).strip() for code in data if str(code).strip()]
+        unknown = [code for code in courses if code not in Course.values]
+        if unknown:
+            raise serializers.ValidationError(f'Unknown course(s): {", ".join(unknown)}.')
+        return list(dict.fromkeys(courses))
+
+
+class UserImportRowSerializer(serializers.Serializer):
+    '''
+    Validates one import row without touching the database.
+    '''
+    email = serializers.EmailField()
+    password = serializers.CharField(required=False, allow_blank=True, write_only=True)
+    role = serializers.ChoiceField(choices=['student', 'tutor'], default='student')
+    first_name = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    last_name = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    year = serializers.IntegerField(required=False, allow_null=True)
+    courses = CourseListField(required=False)
+    bio = serializers.CharField(required=False, allow_blank=True)
+    calendly_link = serializers.URLField(required=False, allow_blank=True)
+
+    def to_internal_value(self, data):
+        # CSV gives '' for empty cells; treat them as absent.
+        data = {key: value for key, value in data.items() if value not in ('', None)}
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if attrs['role'] == 'tutor':
+            missing = [field for field in ('first_name', 'last_name', 'year') if not attrs.get(field)]
+            if missing:
+                raise serializers.ValidationError({field: 'Required for tutors.' for field in missing})
+        attrs['email'] = User.objects.normalize_email(attrs['email'])
+        return attrs
+
+
+def iter_rows(stream, fmt):
+    '''
+    Yield (line_number, row_dict) from a text stream without reading it whole.
+    '''
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                row = exc
+            yield line_number, row
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def _init_hasher_process():
+    import django
+    django.setup()
+
+
+class UserImporter:
+    '''
+    Usage: UserImporter(workers=4).run(stream, 'csv') -> report dict.
+    '''
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+        self.chunk_size = chunk_size
+        self.workers = os.cpu_count() if workers is None else workers
+        self.seen_emails = set()
+
+    def run(self, stream, fmt):
+        report = {'created': 0, 'students': 0, 'tutors': 0, 'errors': []}
+        executor = None
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_hasher_process)
+        try:
+            rows = iter_rows(stream, fmt)
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk, report, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if report['created']:
+            # bulk_create skips post_save, so the tutor directory cache wouldn't notice.
+            tutor_cache.invalidate()
+        return report
+
+    def validate_chunk(self, chunk, report):
+        valid = []
+        for line_number, row in chunk:
+            if not isinstance(row, dict):
+                report['errors'].append({'row': line_number, 'errors': {'non_field_errors': [f'Invalid row: {row}']}})
+                continue
+            serializer = UserImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                report['errors'].append({'row': line_number, 'email': row.get('email'), 'errors': serializer.errors})
+                continue
+            email = serializer.validated_data['email']
+            if email.lower() in self.seen_emails:
+                report['errors'].append({'row': line_number, 'email': email, 'errors': {'email': ['Duplicate e-mail in this import.']}})
+                continue
+            self.seen_emails.add(email.lower())
+            valid.append((line_number, serializer.validated_data))
+
+        existing = {
+            email.lower()
+            for email in User.objects.filter(email__in=[data['email'] for _, data in valid]).values_list('email', flat=True)
+        }
+        fresh = []
+        for line_number, data in valid:
+            if data['email'].lower() in existing:
+                report['errors'].append({'row': line_number, 'email': data['email'], 'errors': {'email': ['User with this email already exists.']}})
+            else:
+                fresh.append((line_number, data))
+        return fresh
+
+    def hash_passwords(self, passwords, executor):
+        if executor is None:
+            return [make_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+    def import_chunk(self, chunk, report, executor):
+        rows = self.validate_chunk(chunk, report)
+        if not rows:
+            return
+        hashes = self.hash_passwords([data.get('password') or None for _, data in rows], executor)
+        users = [
+            User(
+                email=data['email'],
+                password=password_hash,
+                is_student=data['role'] == 'student',
+                is_tutor=data['role'] == 'tutor',
+            )
+            for (_, data), password_hash in zip(rows, hashes)
+        ]
+        try:
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                students = [Student(user=user) for user in users if user.is_student]
+                tutors = [
+                    Tutor(
+                        user=user,
+                        first_name=data['first_name'],
+                        last_name=data['last_name'],
+                        year=data['year'],
+                        courses=','.join(data.get('courses', [])),
+                        bio=data.get('bio', ''),
+                        calendly_link=data.get('calendly_link') or None,
+                    )
+                    for user, (_, data) in zip(users, rows) if user.is_tutor
+                ]
+                Student.objects.bulk_create(students)
+                tutors = Tutor.objects.bulk_create(tutors)
+                TutorCourse.objects.bulk_create(
+                    [TutorCourse(tutor=tutor, course=course) for tutor in tutors for course in tutor.get_courses()]
+                )
+        except IntegrityError as exc:
+            # Most likely an e-mail registered concurrently; report the chunk rather than abort the import.
+            for line_number, data in rows:
+                report['errors'].append({'row': line_number, 'email': data['email'], 'errors': {'non_field_errors': [f'Not imported: {exc}']}})
+            return
+        report['created'] += len(users)
+        report['students'] += len(students)
+        report['tutors'] += len(tutors)
+
+
+def import_users(fileobj, fmt=None, filename='', **options):
+    '''
+    Import from a binary file object (e.g. an upload). See UserImporter for options.
+    Raises ValidationError({'file': ...}) if the file isn't UTF-8 or isn't
+    valid CSV; chunks before the bad line have been imported by then.
+    '''
+    fmt = fmt or detect_format(filename)
+    stream = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        return UserImporter(**options).run(stream, fmt)
+    except UnicodeDecodeError:
+        raise serializers.ValidationError({'file': ['The file is not UTF-8 encoded text.']})
+    except csv.Error as exc:
+        raise serializers.ValidationError({'file': [f'Malformed CSV: {exc}']})
+    finally:
+        stream.detach()
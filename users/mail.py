@@ -0,0 +1,87 @@
+'''
+Delivery side of the e-mail outbox (users.models.OutboundEmail).
+'''
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+# How long a claimed batch stays invisible to other workers.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def claim_batch(batch_size):
+    '''
+    Pick the next due e-mails and push their next_attempt_at past the lease,
+    so concurrent workers don't send the same message twice.
+    '''
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(
+            status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now,
+        ).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(next_attempt_at=now + CLAIM_LEASE)
+    return batch
+
+
+def send_batch(batch, max_attempts=5, backoff=timedelta(minutes=1)):
+    '''
+    Send `batch` over a single backend connection. Failed messages are
+    retried after backoff * 2**(attempts - 1), and give up after max_attempts.
+    Returns (sent, failed) counts.
+    '''
+    if not batch:
+        return 0, 0
+    sent = failed = 0
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+        opened = None
+    except Exception as exc:
+        opened = exc
+
+    for email in batch:
+        now = timezone.now()
+        email.attempts += 1
+        try:
+            if opened is not None:
+                raise opened
+            message = EmailMessage(email.subject, email.body, email.from_email or None, email.to, connection=mail_connection)
+            mail_connection.send_messages([message])
+        except Exception as exc:
+            failed += 1
+            email.last_error = f'{type(exc).__name__}: {exc}'
+            if email.attempts >= max_attempts:
+                email.status = OutboundEmail.Status.FAILED
+            else:
+                email.next_attempt_at = now + backoff * 2 ** (email.attempts - 1)
+        else:
+            sent += 1
+            email.status = OutboundEmail.Status.SENT
+            email.sent_at = now
+            email.last_error = ''
+
+    if opened is None:
+        mail_connection.close()
+    OutboundEmail.objects.bulk_update(batch, ['attempts', 'status', 'sent_at', 'next_attempt_at', 'last_error'])
+    return sent, failed
+
+
+def send_queued_mail(batch_size=50, max_attempts=5, backoff=timedelta(minutes=1)):
+    '''
+    Drain every due e-mail, batch by batch. Returns (sent, failed) totals.
+    '''
+    total_sent = total_failed = 0
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            return total_sent, total_failed
+        sent, failed = send_batch(batch, max_attempts=max_attempts, backoff=backoff)
+        total_sent += sent
+        total_failed += failed
@@ -0,0 +1,117 @@
+'''
+Login benchmark for tuning the password hasher.
+
+For each configured hasher (and each --pbkdf2-iterations variant) it reports:
+- verify: check_password latency, single-threaded
+- throughput: password checks per second across --concurrency threads
+  (hashlib releases the GIL, so this scales with cores like gunicorn workers do)
+- login: end-to-end POST /api/login/ latency and queries per login, through
+  the full middleware/DRF stack, for hashers listed in PASSWORD_HASHERS
+
+Benchmark users get a unique email and are created inside a transaction
+that is rolled back.
+'''
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from benchmarks.loadtest import latency_summary
+from users.models import Tutor, User
+
+PASSWORD = 'benchmark-password-123'
+
+
+class Command(BaseCommand):
+    help = 'Measure login latency and throughput under the configured password hashers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Samples per measurement.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Threads for the throughput measurement.')
+        parser.add_argument(
+            '--pbkdf2-iterations', default='',
+            help='Comma-separated PBKDF2 iteration counts to compare, e.g. 260000,600000.',
+        )
+        parser.add_argument('--json', help='Also write the results to this file.')
+
+    def handle(self, *args, **options):
+        variants = [(path, import_string(path)()) for path in settings.PASSWORD_HASHERS]
+        for count in filter(None, options['pbkdf2_iterations'].split(',')):
+            hasher = PBKDF2PasswordHasher()
+            hasher.iterations = int(count)
+            variants.append((f'pbkdf2_sha256 x{int(count)}', hasher))
+
+        results = []
+        for name, hasher in variants:
+            result = {'hasher': name, 'iterations': getattr(hasher, 'iterations', None)}
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as exc:
+                # e.g. Argon2/bcrypt listed but their library isn't installed.
+                self.stderr.write(f'{name}: skipped ({exc})')
+                continue
+            result['verify'] = latency_summary(self.time_verify(hasher, encoded, options['iterations']))
+            result['throughput_per_s'] = self.verify_throughput(hasher, encoded, options)
+            if name in settings.PASSWORD_HASHERS:
+                result['login'] = self.time_login(name, options['iterations'])
+            results.append(result)
+            self.report(result)
+
+        if options['json']:
+            with open(options['json'], 'w') as out:
+                json.dump({'concurrency': options['concurrency'], 'results': results}, out, indent=2)
+
+    def time_verify(self, hasher, encoded, iterations):
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            hasher.verify(PASSWORD, encoded)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def verify_throughput(self, hasher, encoded, options):
+        total = options['iterations'] * options['concurrency']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(lambda _: hasher.verify(PASSWORD, encoded), range(total)))
+        return round(total / (time.perf_counter() - start), 1)
+
+    def time_login(self, hasher_path, iterations):
+        client = Client()
+        url = reverse('token_obtain_pair')
+        samples, queries = [], []
+        # Only this hasher, so check_password doesn't re-hash ("upgrade") on every login.
+        with override_settings(PASSWORD_HASHERS=[hasher_path]), transaction.atomic():
+            # Unique, so it can't clash with a real account in the configured database.
+            email = f'login-benchmark-{uuid.uuid4().hex}@example.com'
+            user = User.objects.create_user(email=email, password=PASSWORD, is_tutor=True)
+            Tutor.objects.create(user=user, first_name='Bench', last_name='Mark', year=1, courses='DS,AI')
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = client.post(url, {'email': user.email, 'password': PASSWORD})
+                    samples.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f'Login failed with {response.status_code}: {response.content[:200]!r}')
+                queries.append(len(captured))
+            transaction.set_rollback(True)
+        return {**latency_summary(samples), 'queries': max(queries)}
+
+    def report(self, result):
+        line = (
+            f"{result['hasher']}: verify p50 {result['verify']['p50_ms']}ms "
+            f"p95 {result['verify']['p95_ms']}ms, {result['throughput_per_s']} checks/s"
+        )
+        if 'login' in result:
+            login = result['login']
+            line += f"; login p50 {login['p50_ms']}ms p95 {login['p95_ms']}ms, {login['queries']} query(ies)"
+        self.stdout.write(line)
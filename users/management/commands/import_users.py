@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from users.importer import DEFAULT_CHUNK_SIZE, import_users
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create students and tutors from a CSV or JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, help='Password-hashing processes (default: CPU count).')
+        parser.add_argument('--report', help='Write the full JSON report (including every row error) to this path.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                report = import_users(
+                    fileobj,
+                    fmt=options['format'],
+                    filename=options['path'],
+                    chunk_size=options['chunk_size'],
+                    workers=options['workers'],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        except ValidationError as exc:
+            raise CommandError(' '.join(exc.detail['file']))
+
+        if options['report']:
+            with open(options['report'], 'w') as out:
+                json.dump(report, out, indent=2)
+        for error in report['errors'][:20]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        if len(report['errors']) > 20:
+            self.stderr.write(f"... and {len(report['errors']) - 20} more row error(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} user(s) ({report['students']} students, {report['tutors']} tutors); "
+            f"{len(report['errors'])} row(s) rejected."
+        ))
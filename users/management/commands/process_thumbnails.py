@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.thumbnails import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Render WebP/JPEG thumbnails for newly uploaded profile pictures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads instead of exiting when done.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            rendered, failed = process_pending(batch_size=options['batch_size'])
+            if rendered or failed:
+                self.stdout.write(f'Rendered thumbnails for {rendered} user(s), {failed} failed.')
+            if rendered + failed < options['batch_size']:
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
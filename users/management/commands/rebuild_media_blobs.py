@@ -0,0 +1,111 @@
+'''
+Housekeeping for content-addressed profile pictures (users/storage.py).
+
+1. Moves pictures still stored under their upload path
+   (profile_pictures/<id>/<name>) into the blob store, so identical
+   legacy copies collapse into one file, and deletes the old copies.
+2. Recomputes every StoredBlob count from the User table.
+3. Deletes blobs (and their thumbnails) that have had no references for
+   longer than --grace-hours, and stray files left by interrupted uploads.
+
+Safe to run repeatedly, e.g. from a daily scheduler.
+'''
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import StoredBlob, User
+from users.storage import BLOB_DIR, blob_digest
+from users.thumbnails import thumbnail_prefix
+
+
+class Command(BaseCommand):
+    help = 'Adopt legacy profile pictures into the blob store, recount references and delete unreferenced blobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=getattr(settings, 'MEDIA_BLOB_GRACE_HOURS', 24),
+            help='Keep unreferenced blobs at least this long before deleting them.',
+        )
+
+    def handle(self, *args, **options):
+        storage = User._meta.get_field('profile_picture').storage
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        adopted = self.adopt_legacy(storage)
+        referenced = StoredBlob.recount()
+        deleted = self.delete_unreferenced(storage, cutoff)
+        strays = self.delete_strays(storage, cutoff)
+        self.stdout.write(
+            f'Adopted {adopted} legacy picture(s); {referenced} blob(s) referenced; '
+            f'deleted {deleted} unreferenced blob(s) and {strays} stray file(s).'
+        )
+
+    def adopt_legacy(self, storage):
+        adopted = 0
+        legacy_names = set()
+        users = User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        for user in users.exclude(profile_picture__startswith=f'{BLOB_DIR}/').only('id', 'profile_picture'):
+            legacy_name = user.profile_picture.name
+            if not storage.exists(legacy_name):
+                self.stderr.write(f'User {user.pk}: {legacy_name} is missing, skipped.')
+                continue
+            with storage.open(legacy_name, 'rb') as legacy:
+                name = storage.save(legacy_name, legacy)
+            # update() rather than save(): the counts are rebuilt right after.
+            adopted += User.objects.filter(pk=user.pk, profile_picture=legacy_name).update(profile_picture=name)
+            legacy_names.add(legacy_name)
+
+        still_used = set(users.filter(profile_picture__in=legacy_names).values_list('profile_picture', flat=True))
+        for legacy_name in legacy_names - still_used:
+            storage.delete(legacy_name)
+        StoredBlob.objects.filter(name__in=legacy_names - still_used).delete()
+        return adopted
+
+    def delete_unreferenced(self, storage, cutoff):
+        deleted = 0
+        for name in StoredBlob.objects.filter(refcount=0, released_at__lt=cutoff).values_list('name', flat=True):
+            with transaction.atomic():
+                # Re-check under the row lock: an upload may have just re-acquired it.
+                blob = StoredBlob.objects.select_for_update().filter(name=name, refcount=0).first()
+                if blob is None:
+                    continue
+                blob.delete()
+                transaction.on_commit(lambda name=name: self.delete_files(storage, name))
+            deleted += 1
+        return deleted
+
+    def delete_files(self, storage, name):
+        storage.delete(name)
+        digest = blob_digest(name)
+        if digest is None:
+            return
+        directory, prefix = thumbnail_prefix(digest)
+        if not default_storage.exists(directory):
+            return
+        for filename in default_storage.listdir(directory)[1]:
+            if filename.startswith(prefix):
+                default_storage.delete(f'{directory}/{filename}')
+
+    def delete_strays(self, storage, cutoff):
+        '''
+        Blob files with no StoredBlob row (an upload whose transaction rolled
+        back, or a crashed staging copy) older than the grace period.
+        '''
+        root = storage.path(BLOB_DIR)
+        known = set(StoredBlob.objects.filter(name__startswith=f'{BLOB_DIR}/').values_list('name', flat=True))
+        deleted = 0
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                if name in known or os.path.getmtime(path) >= cutoff.timestamp():
+                    continue
+                os.remove(path)
+                deleted += 1
+        return deleted
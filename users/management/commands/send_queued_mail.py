@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from users.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued e-mails from the outbox, batching them over one connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff', type=int, default=60, help='Seconds before the first retry; doubles each attempt.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting once it is empty.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_mail(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                backoff=timedelta(seconds=options['backoff']),
+            )
+            if sent or failed or not options['loop']:
+                self.stdout.write(f'Sent {sent} e-mail(s), {failed} failed.')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
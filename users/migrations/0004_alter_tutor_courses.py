@@ -4,13 +4,29 @@ import django.contrib.postgres.fields
 from django.db import migrations, models
 
 
+class PostgresOnlyAlterField(migrations.AlterField):
+    """
+    ArrayField only exists on PostgreSQL, and 0005 turns the column back into
+    a CharField anyway. Other backends only track the state change so a fresh
+    SQLite database can still be migrated.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
 class Migration(migrations.Migration):
     dependencies = [
         ("users", "0003_tutor_calendly_link"),
     ]
 
     operations = [
-        migrations.AlterField(
+        PostgresOnlyAlterField(
             model_name="tutor",
             name="courses",
             field=django.contrib.postgres.fields.ArrayField(
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+def fill_rating_sum(apps, schema_editor):
+    """Recover the integer sum from the stored running average."""
+    Tutor = apps.get_model("users", "Tutor")
+    for tutor in Tutor.objects.filter(total_ratings__gt=0):
+        tutor.rating_sum = round(tutor.rating * tutor.total_ratings)
+        tutor.rating = tutor.rating_sum / tutor.total_ratings
+        tutor.save(update_fields=["rating_sum", "rating"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_alter_tutor_courses"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tutor",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_sum, migrations.RunPython.noop),
+    ]
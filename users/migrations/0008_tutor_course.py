@@ -0,0 +1,80 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+COURSE_CODES = {"AI", "DS", "WT", "MS"}
+
+
+def parse_courses(value):
+    """Tutor.courses has held both comma-joined codes and JSON-ish lists."""
+    cleaned = value.strip().strip("[]").replace('"', "").replace("'", "")
+    return [code.strip() for code in cleaned.split(",") if code.strip() in COURSE_CODES]
+
+
+def fill_tutor_courses(apps, schema_editor):
+    Tutor = apps.get_model("users", "Tutor")
+    TutorCourse = apps.get_model("users", "TutorCourse")
+    links = []
+    for tutor in Tutor.objects.all():
+        courses = list(dict.fromkeys(parse_courses(tutor.courses)))
+        tutor.courses = ",".join(courses)
+        tutor.save(update_fields=["courses"])
+        links += [TutorCourse(tutor=tutor, course=course) for course in courses]
+    TutorCourse.objects.bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_tutor_rating_sum"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TutorCourse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "course",
+                    models.CharField(
+                        choices=[
+                            ("AI", "Intro to AI"),
+                            ("DS", "Data Structure and Algorithms"),
+                            ("WT", "Web Technologies"),
+                            ("MS", "Modelling and Simulations"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="tutor",
+            index=models.Index(fields=["-rating"], name="tutor_rating_idx"),
+        ),
+        migrations.AddField(
+            model_name="tutorcourse",
+            name="tutor",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="course_links",
+                to="users.tutor",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tutorcourse",
+            constraint=models.UniqueConstraint(
+                fields=("course", "tutor"), name="unique_course_tutor"
+            ),
+        ),
+        migrations.RunPython(fill_tutor_courses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0009_outbound_email"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenClaimsUser",
+            fields=[],
+            options={
+                "proxy": True,
+                "indexes": [],
+                "constraints": [],
+            },
+            bases=("users.user",),
+        ),
+    ]
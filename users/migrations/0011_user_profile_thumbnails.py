@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0010_token_claims_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="profile_thumbnails",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="thumbnails_source",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:08
+
+import users.models
+import users.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_pictures(apps, schema_editor):
+    """Start the counts from the pictures users already reference."""
+    User = apps.get_model("users", "User")
+    StoredBlob = apps.get_model("users", "StoredBlob")
+    counts = (
+        User.objects.exclude(profile_picture="")
+        .exclude(profile_picture__isnull=True)
+        .values_list("profile_picture")
+        .annotate(Count("id"))
+        .order_by()
+    )
+    StoredBlob.objects.bulk_create(
+        [StoredBlob(name=name, refcount=refcount) for name, refcount in counts]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0011_user_profile_thumbnails"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("refcount", models.PositiveIntegerField(default=0)),
+                ("released_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="profile_picture",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=users.storage.profile_picture_storage,
+                upload_to=users.models.profile_picture_upload_path,
+            ),
+        ),
+        migrations.RunPython(count_existing_pictures, migrations.RunPython.noop),
+    ]
@@ -3,10 +3,17 @@ This is the models.py file for the users app.
 It contains the models for the User, Student, Tutor, and PasswordReset classes.
 '''
 
+import uuid
+
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, Group, Permission
 from django.db import models
+from django.db.models import ExpressionWrapper, F
+from django.db.models.functions import Cast
 from django.utils import timezone
 
+from . import cache as tutor_cache
+from .storage import profile_picture_storage
+
 class UserManager(BaseUserManager):
     '''
     Custom user manager for the User model.
@@ -34,7 +41,9 @@ class UserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 def profile_picture_upload_path(instance, filename):
-    return f'profile_pictures/{instance.id}/{filename}'
+    # New users have no id yet when the upload is stored; don't file them all under None/.
+    folder = instance.id or uuid.uuid4().hex
+    return f'profile_pictures/{folder}/{filename}'
 
 class User(AbstractBaseUser, PermissionsMixin):
     '''
@@ -50,7 +59,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     reset_password_token = models.UUIDField(default=None, null=True, blank=True)
     reset_password_token_expires = models.DateTimeField(default=None, null=True, blank=True)
-    profile_picture = models.ImageField(upload_to=profile_picture_upload_path, blank=True, null=True)
+    # Stored by content hash (users/storage.py); upload_to only supplies the extension.
+    profile_picture = models.ImageField(upload_to=profile_picture_upload_path, storage=profile_picture_storage, blank=True, null=True)
+    # Filled in by `manage.py process_thumbnails` (users/thumbnails.py):
+    # {"<size>": {"<format>": "<storage name>"}} rendered from `thumbnails_source`.
+    profile_thumbnails = models.JSONField(default=dict, blank=True)
+    thumbnails_source = models.CharField(max_length=255, blank=True, default='')
 
 
 
@@ -74,6 +88,35 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = UserManager()
 
+class TokenClaimsUser(User):
+    '''
+    User rebuilt from verified JWT claims by StatelessJWTAuthentication,
+    without a database read. Only the id, email and role flags are set, so
+    it refuses to be saved or deleted rather than overwrite the real row.
+    '''
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, claims):
+        from rest_framework_simplejwt.settings import api_settings
+
+        user = cls(
+            id=claims[api_settings.USER_ID_CLAIM],
+            email=claims['email'],
+            is_student=claims.get('is_student', False),
+            is_tutor=claims.get('is_tutor', False),
+            is_staff=claims.get('is_staff', False),
+        )
+        user._state.adding = False
+        return user
+
+    def save(self, *args, **kwargs):
+        raise TypeError('TokenClaimsUser is read-only; load the User row to modify it.')
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('TokenClaimsUser is read-only; load the User row to modify it.')
+
 class Student(models.Model):
     '''
     Model for student users.
@@ -99,18 +142,64 @@ class Tutor(models.Model):
     year = models.IntegerField()
     courses = models.CharField(max_length=255, default='')
     bio = models.TextField(blank=True)
+    # rating is derived from rating_sum / total_ratings; only add_rating() writes these.
     rating = models.FloatField(default=0.0)
+    rating_sum = models.PositiveIntegerField(default=0)
     total_ratings = models.IntegerField(default=0)
     calendly_link = models.URLField(blank=True, null=True)
 
-    # def set_courses(self, courses):
-    #     if courses:
-    #         self.courses = json.dumps(courses)
-    #     else:
-    #         self.courses = ''
+    def add_rating(self, value):
+        '''
+        Record one rating in a single UPDATE. The sum and count are bumped with
+        F() expressions and the average is recomputed from them in the same
+        statement, so concurrent raters can't lose updates or drift the average.
+        '''
+        new_sum = F('rating_sum') + value
+        new_total = F('total_ratings') + 1
+        Tutor.objects.filter(pk=self.pk).update(
+            rating_sum=new_sum,
+            total_ratings=new_total,
+            rating=ExpressionWrapper(Cast(new_sum, models.FloatField()) / new_total, output_field=models.FloatField()),
+        )
+        # update() skips post_save, so invalidate the directory cache here.
+        tutor_cache.invalidate()
+        self.refresh_from_db(fields=['rating', 'rating_sum', 'total_ratings'])
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating'], name='tutor_rating_idx'),
+        ]
+
+    def set_courses(self, courses):
+        '''
+        Replace the tutor's courses. Syncs the indexed TutorCourse rows right
+        away; the comma-joined `courses` display copy is written on the next save().
+        '''
+        courses = list(dict.fromkeys(courses))
+        self.courses = ','.join(courses)
+        existing = set(self.course_links.values_list('course', flat=True))
+        self.course_links.filter(course__in=existing - set(courses)).delete()
+        TutorCourse.objects.bulk_create(
+            [TutorCourse(tutor=self, course=course) for course in courses if course not in existing]
+        )
+
+    def get_courses(self):
+        return self.courses.split(',') if self.courses else []
+
+
+class TutorCourse(models.Model):
+    '''
+    One row per course a tutor teaches, so the tutor directory can filter by
+    course through an index instead of parsing Tutor.courses on every row.
+    '''
+    tutor = models.ForeignKey(Tutor, related_name='course_links', on_delete=models.CASCADE)
+    course = models.CharField(max_length=2, choices=Course.choices)
 
-    # def get_courses(self):
-    #     return json.loads(self.courses)
+    class Meta:
+        constraints = [
+            # Leading `course` column doubles as the course -> tutors lookup index.
+            models.UniqueConstraint(fields=['course', 'tutor'], name='unique_course_tutor'),
+        ]
     
 
 class PasswordReset(models.Model):
@@ -124,4 +213,84 @@ class PasswordReset(models.Model):
     @classmethod
     def delete_expired_tokens(cls): #delete from db after token expires
         cls.objects.filter(token_expires__lte=timezone.now()).delete()
-        
\ No newline at end of file
+        
+
+class OutboundEmail(models.Model):
+    '''
+    Outbox row for an e-mail waiting to be delivered.
+    Requests only enqueue (OutboundEmail.enqueue); `manage.py send_queued_mail`
+    delivers them in batches with retry and exponential backoff.
+    '''
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    @classmethod
+    def enqueue(cls, subject, body, from_email, recipient_list):
+        return cls.objects.create(subject=subject, body=body, from_email=from_email or '', to=list(recipient_list))
+
+
+class StoredBlob(models.Model):
+    '''
+    Reference count for a content-addressed media file (users.storage).
+    Kept up to date by the User signal handlers; a blob whose count dropped
+    to zero is deleted by `manage.py rebuild_media_blobs` once `released_at`
+    is older than its grace period.
+    '''
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
+
+    @classmethod
+    def acquire(cls, name):
+        blob, created = cls.objects.get_or_create(name=name, defaults={'refcount': 1})
+        if not created:
+            cls.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1, released_at=None)
+
+    @classmethod
+    def release(cls, name):
+        cls.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+        cls.objects.filter(name=name, refcount=0, released_at__isnull=True).update(released_at=timezone.now())
+
+    @classmethod
+    def recount(cls):
+        '''
+        Reset every count from the User table. Returns the number of blobs
+        that are referenced.
+        '''
+        counts = dict(
+            User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            .values_list('profile_picture').annotate(models.Count('id')).order_by()
+        )
+        now = timezone.now()
+        existing = {blob.name: blob for blob in cls.objects.all()}
+        for name in counts.keys() - existing.keys():
+            existing[name] = cls.objects.create(name=name)
+        for name, blob in existing.items():
+            blob.refcount = counts.get(name, 0)
+            if blob.refcount:
+                blob.released_at = None
+            elif blob.released_at is None:
+                blob.released_at = now
+        cls.objects.bulk_update(existing.values(), ['refcount', 'released_at'])
+        return len(counts)
@@ -0,0 +1,53 @@
+'''
+Cache-backed JWT denylist.
+
+- revoke_token(): deny one token (logout) until it would have expired anyway.
+- revoke_user(): deny every token whose user claims were issued before now,
+  e.g. after a role change, so stale is_tutor/is_staff claims stop working.
+
+Checked by users.authentication and MyTokenRefreshSerializer. The cache alias
+is JWT_REVOCATION_CACHE_ALIAS; it must be shared between workers (not local
+memory) for revocations to reach every process.
+'''
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.settings import api_settings
+
+# Claim carrying the time the user claims were embedded (MyTokenObtainPairSerializer.get_token).
+# It is copied to access tokens minted from a refresh token, unlike `iat`.
+CLAIMS_ISSUED_AT = 'claims_iat'
+
+
+def get_cache():
+    return caches[getattr(settings, 'JWT_REVOCATION_CACHE_ALIAS', 'default')]
+
+
+def _token_key(jti):
+    return f'jwt:deny:{jti}'
+
+
+def _user_key(user_id):
+    return f'jwt:user:{user_id}'
+
+
+def revoke_token(token):
+    ttl = int(token['exp'] - time.time())
+    if ttl > 0:
+        get_cache().set(_token_key(token[api_settings.JTI_CLAIM]), True, ttl)
+
+
+def revoke_user(user_id):
+    lifetime = api_settings.ACCESS_TOKEN_LIFETIME + api_settings.REFRESH_TOKEN_LIFETIME
+    get_cache().set(_user_key(user_id), time.time(), int(lifetime.total_seconds()))
+
+
+def is_revoked(token):
+    token_key = _token_key(token.get(api_settings.JTI_CLAIM))
+    user_key = _user_key(token.get(api_settings.USER_ID_CLAIM))
+    found = get_cache().get_many([token_key, user_key])
+    if token_key in found:
+        return True
+    revoked_at = found.get(user_key)
+    return revoked_at is not None and token.get(CLAIMS_ISSUED_AT, 0) <= revoked_at
@@ -4,35 +4,48 @@ It also contains the MyTokenObtainPairSerializer, which is used to customize the
 '''
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 from django.conf import settings
 from datetime import timedelta
+import time
 from django.utils import timezone
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import User, Student, Tutor, PasswordReset
 
 from django.core.validators import MinValueValidator, MaxValueValidator
 
-from .models import Student, Tutor, PasswordReset, User, Course
+from .models import Student, Tutor, PasswordReset, User, Course, OutboundEmail
+from . import revocation
+from .thumbnails import thumbnail_urls
+from backend.sparse import SparseFieldsMixin
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     '''
     Serializer for the User model.
     - id: Integer field to store the user id.
     - email: Email field to store the user email.
     - is_student: Boolean field to indicate if the user is a student.
     - is_tutor: Boolean field to indicate if the user is a tutor.
+    - profile_thumbnails: URLs of the resized profile picture, by size and format.
     '''
+    profile_thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ['id', 'email', 'is_student', 'is_tutor','profile_picture']
+        fields = ['id', 'email', 'is_student', 'is_tutor','profile_picture', 'profile_thumbnails']
+        # Columns thumbnail_urls() reads, for ?fields= column pruning (backend.sparse).
+        field_columns = {'profile_thumbnails': ['profile_picture', 'profile_thumbnails', 'thumbnails_source']}
+
+    def get_profile_thumbnails(self, obj):
+        return thumbnail_urls(obj, self.context.get('request'))
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     '''
@@ -82,22 +95,6 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import Tutor
 
-class TutorUpdateSerializer(serializers.ModelSerializer):
-    email = serializers.EmailField(read_only=True)
-    courses = serializers.ListField(child=serializers.ChoiceField(choices=Course.choices))
-
-    class Meta:
-        model = Tutor
-        fields = ['profile_picture', 'first_name', 'last_name', 'year', 'email', 'courses', 'bio', 'calendly_link']
-
-    def update(self, instance, validated_data):
-        courses = validated_data.pop('courses', None)
-        instance = super().update(instance, validated_data)
-        if courses is not None:
-            instance.set_courses(courses)
-            instance.save()
-        return instance
-
 class TutorCreateSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(write_only=True)
     courses = serializers.ListField(child=serializers.ChoiceField(choices=Course.choices))
@@ -115,7 +112,7 @@ class TutorCreateSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     '''
     Provides a way to serialize and deserialize the Student model.
     '''
@@ -128,7 +125,7 @@ class StudentSerializer(serializers.ModelSerializer):
         model = Student
         fields = ['id', 'user_id', 'email', 'is_student', 'is_tutor']
 
-class TutorSerializer(serializers.ModelSerializer):
+class TutorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer()
     profile_picture = serializers.ImageField(required=False)
     courses = serializers.ListField(child=serializers.ChoiceField(choices=Course.choices))
@@ -136,17 +133,19 @@ class TutorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tutor
         fields = ['id', 'user', 'profile_picture', 'first_name', 'last_name', 'year', 'courses', 'bio', 'rating', 'calendly_link']
+        # Tutors have no picture column; the field is only ever written.
+        field_columns = {'profile_picture': []}
 
     def to_representation(self, instance):
         ret = super().to_representation(instance)
-        # Instead of calling get_courses(), we directly use the courses field
-        ret['courses'] = instance.courses.split(',') if instance.courses else []
+        if 'courses' in ret:
+            ret['courses'] = instance.get_courses()
         return ret
 
     def create(self, validated_data):
         courses = validated_data.pop('courses', [])
         instance = super().create(validated_data)
-        instance.courses = ','.join(courses)
+        instance.set_courses(courses)
         instance.save()
         return instance
 
@@ -154,7 +153,7 @@ class TutorSerializer(serializers.ModelSerializer):
         courses = validated_data.pop('courses', None)
         instance = super().update(instance, validated_data)
         if courses is not None:
-            instance.courses = ','.join(courses)
+            instance.set_courses(courses)
             instance.save()
         return instance
 
@@ -181,14 +180,13 @@ class PasswordResetSerializer(serializers.Serializer):
         # Save token
         PasswordReset.objects.create(email=user.email, token=token, token_expires=timezone.now() + timedelta(minutes=30))
 
-        # Send email
+        # Queue the email; `manage.py send_queued_mail` delivers it outside the request
         reset_link = f"{request.scheme}://{request.get_host()}/reset-password/{token}/"
-        send_mail(
+        OutboundEmail.enqueue(
             'Password Reset Request',
             f'Click the link below to reset your password:\n{reset_link}',
             settings.EMAIL_HOST_USER,
             [email],
-            fail_silently=False,
         )
 
 
@@ -210,7 +208,9 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
         return attrs
 
 class TutorUpdateSerializer(serializers.ModelSerializer):
-    email = serializers.EmailField(read_only=True)
+    email = serializers.EmailField(source='user.email', read_only=True)
+    # Tutors have no picture of their own; it is stored on (and served from) their User.
+    profile_picture = serializers.ImageField(source='user.profile_picture', required=False, allow_null=True)
     courses = serializers.ListField(child=serializers.ChoiceField(choices=Course.choices))
 
     class Meta:
@@ -218,7 +218,11 @@ class TutorUpdateSerializer(serializers.ModelSerializer):
         fields = ['profile_picture', 'first_name', 'last_name', 'year', 'email', 'courses', 'bio', 'calendly_link']
 
     def update(self, instance, validated_data):
+        user_data = validated_data.pop('user', {})
         courses = validated_data.pop('courses', None)
+        if 'profile_picture' in user_data:
+            instance.user.profile_picture = user_data['profile_picture']
+            instance.user.save()
         instance = super().update(instance, validated_data)
         if courses is not None:
             instance.set_courses(courses)
@@ -257,8 +261,29 @@ class TutorCreateSerializer(serializers.ModelSerializer):
         except User.DoesNotExist:
             raise serializers.ValidationError("User with this email does not exist.")
         return value
+
+    def create(self, validated_data):
+        courses = validated_data.pop('courses', [])
+        instance = super().create(validated_data)
+        instance.set_courses(sorted(courses))
+        instance.save()
+        return instance
     
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        '''
+        Embed the user claims StatelessJWTAuthentication builds request.user from.
+        They are copied into every access token minted from this refresh token.
+        '''
+        token = super().get_token(user)
+        token['email'] = user.email
+        token['is_student'] = user.is_student
+        token['is_tutor'] = user.is_tutor
+        token['is_staff'] = user.is_staff
+        token[revocation.CLAIMS_ISSUED_AT] = time.time()
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         
@@ -270,20 +295,38 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
             'is_tutor': user.is_tutor,
         }
         
-        if user.is_tutor:
-            try:
-                tutor = Tutor.objects.get(user=user)
-                data['user']['tutor'] = {
-                    'first_name': tutor.first_name,
-                    'last_name': tutor.last_name,
-                    'year': tutor.year,
-                    'courses': tutor.get_courses(),
-                    'bio': tutor.bio,
-                    'rating': tutor.rating,
-                    'calendly_link': tutor.calendly_link
-                }
-            except Tutor.DoesNotExist:
-                pass
+        # EmailBackend loaded the tutor profile with the user; no extra query here.
+        tutor = getattr(user, 'tutor', None) if user.is_tutor else None
+        if tutor is not None:
+            data['user']['tutor'] = {
+                'first_name': tutor.first_name,
+                'last_name': tutor.last_name,
+                'year': tutor.year,
+                'courses': tutor.get_courses(),
+                'bio': tutor.bio,
+                'rating': tutor.rating,
+                'calendly_link': tutor.calendly_link
+            }
         
         return data
-    
\ No newline at end of file
+
+
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    '''
+    Refuses refresh tokens that were logged out or predate a role change.
+    '''
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revocation.is_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=False)
+
+    def validate_refresh(self, value):
+        try:
+            return RefreshToken(value)
+        except TokenError as exc:
+            raise serializers.ValidationError(str(exc))
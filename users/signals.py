@@ -0,0 +1,86 @@
+'''
+Model signal handlers for the users app. Connected in UsersConfig.ready().
+'''
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, revocation
+from .models import StoredBlob, Tutor, TutorCourse, User
+
+
+@receiver(post_save, sender=Tutor)
+@receiver(post_delete, sender=Tutor)
+@receiver(post_save, sender=TutorCourse)
+@receiver(post_delete, sender=TutorCourse)
+def invalidate_tutor_cache(sender, **kwargs):
+    cache.invalidate()
+
+
+# User columns the tutor directory shows (TutorSerializer's nested user).
+TUTOR_DIRECTORY_USER_FIELDS = ('email', 'is_student', 'is_tutor', 'profile_picture', 'profile_thumbnails', 'thumbnails_source')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_tutor_cache_for_user(sender, instance, update_fields=None, **kwargs):
+    '''
+    Only tutors (or users who just stopped being one) are in the directory,
+    and saves like the last_login / password re-hash on every login don't
+    touch what it shows; those leave the cache alone.
+    '''
+    was_tutor = getattr(instance, '_previous_values', {}).get('is_tutor', False)
+    if not (instance.is_tutor or was_tutor):
+        return
+    if update_fields is not None and not set(update_fields) & set(TUTOR_DIRECTORY_USER_FIELDS):
+        return
+    cache.invalidate()
+
+
+# Changing any of these makes the claims in the user's existing tokens stale.
+TOKEN_CLAIM_FIELDS = ('email', 'is_student', 'is_tutor', 'is_staff')
+TRACKED_FIELDS = TOKEN_CLAIM_FIELDS + ('profile_picture',)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_values(sender, instance, update_fields=None, **kwargs):
+    '''
+    Load the stored values of TRACKED_FIELDS being saved (one query) for the
+    handlers below.
+    '''
+    instance._previous_values = {}
+    fields = [field for field in TRACKED_FIELDS if update_fields is None or field in update_fields]
+    if instance.pk is not None and fields:
+        # e.g. the password re-hash on login saves none of them and skips the query.
+        instance._previous_values = User.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+@receiver(pre_save, sender=User)
+def revoke_tokens_on_role_change(sender, instance, **kwargs):
+    previous = instance._previous_values
+    if any(field in previous and previous[field] != getattr(instance, field) for field in TOKEN_CLAIM_FIELDS):
+        revocation.revoke_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def count_profile_picture_references(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    previous = getattr(instance, '_previous_values', {}).get('profile_picture') or ''
+    current = instance.profile_picture.name or ''
+    if previous == current:
+        return
+    if current:
+        StoredBlob.acquire(current)
+    if previous:
+        StoredBlob.release(previous)
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    revocation.revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def release_profile_picture(sender, instance, **kwargs):
+    if instance.profile_picture:
+        StoredBlob.release(instance.profile_picture.name)
@@ -0,0 +1,97 @@
+'''
+Content-addressed file storage for profile pictures.
+
+A file is stored under the SHA-256 of its bytes, so uploading the same
+picture twice (or two users uploading the same one) keeps a single copy:
+
+    blobs/3f/a1/3fa1...e9.jpg
+
+The requested name only contributes its extension. Since a name can never
+point at different content, blobs (and the thumbnails derived from them)
+can be served with far-future immutable cache headers.
+
+Blobs are shared, so they are never deleted when one user drops theirs;
+users.models.StoredBlob counts references and `manage.py rebuild_media_blobs`
+removes blobs nobody has referenced for a while.
+'''
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files import locks
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIR = 'blobs'
+# Names under these prefixes are derived from the content's hash.
+IMMUTABLE_PREFIXES = (f'{BLOB_DIR}/', 'profile_pictures/thumbs/')
+
+_BLOB_NAME = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})(\.\w+)?$')
+
+
+def blob_name(digest, extension=''):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def blob_digest(name):
+    '''
+    The SHA-256 hex digest a blob name was derived from, or None for other names.
+    '''
+    match = _BLOB_NAME.match(name or '')
+    return match.group('digest') if match else None
+
+
+def is_immutable(name):
+    return name.startswith(IMMUTABLE_PREFIXES)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''
+    FileSystemStorage that names every saved file after its SHA-256.
+
+    The upload is copied to a temporary file next to the blob directory while
+    it is hashed, one chunk at a time, then renamed into place; if the blob
+    already exists the copy is simply discarded.
+    '''
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen from the content in _save(); it can't collide.
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1]
+        digest = getattr(content, 'sha256', None)
+        if digest is not None and self.exists(blob_name(digest, extension)):
+            # Hashed while it was uploaded (users.uploadhandlers) and already stored.
+            return blob_name(digest, extension)
+
+        staging_dir = self.path(os.path.join(BLOB_DIR, 'tmp'))
+        os.makedirs(staging_dir, exist_ok=True)
+        fd, staging_path = tempfile.mkstemp(dir=staging_dir)
+        try:
+            hasher = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as staging:
+                locks.lock(staging, locks.LOCK_EX)
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    staging.write(chunk)
+            name = blob_name(hasher.hexdigest(), extension)
+            if self.exists(name):
+                os.remove(staging_path)
+                return name
+            os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(staging_path, self.file_permissions_mode)
+            file_move_safe(staging_path, self.path(name), allow_overwrite=True)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+        return name
+
+
+def profile_picture_storage():
+    return ContentAddressedStorage()
@@ -1,3 +1,644 @@
-from django.test import TestCase
+from io import BytesIO, StringIO
+import json
+import os
+import tempfile
+import threading
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.contrib.auth.hashers import check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from backend import renderers
+from backend.querylog import inspect_queries
+
+import msgpack
+import orjson
+from PIL import Image
+
+from .authentication import StatelessJWTAuthentication
+from .mail import send_queued_mail
+from .models import OutboundEmail, StoredBlob, Student, TokenClaimsUser, Tutor, TutorCourse, User
+from .serializers import UserSerializer
+from .storage import blob_digest
+from .thumbnails import pending_users, process_pending
+from .uploadhandlers import BoundedImageUploadHandler, UploadTooLarge
+from .views import serve_media
+
+
+class TutorRatingTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email='tutor@example.com', password='pass1234', is_tutor=True)
+        self.tutor = Tutor.objects.create(user=user, first_name='Ada', last_name='Lovelace', year=3)
+        self.client = APIClient()
+
+    def rate(self, value):
+        return self.client.put(reverse('tutor-rate', args=[self.tutor.id]), {'rating': value})
+
+    def test_average_is_derived_from_integer_sum_and_count(self):
+        for value in (5, 4, 4):
+            response = self.rate(value)
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.json()['rating'], 13 / 3)
+        self.tutor.refresh_from_db()
+        self.assertEqual((self.tutor.rating_sum, self.tutor.total_ratings), (13, 3))
+
+    def test_out_of_range_rating_is_rejected(self):
+        self.assertEqual(self.rate(6).status_code, 400)
+
+
+class TutorDirectoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for i, (courses, rating) in enumerate([(['DS', 'AI'], 4.5), (['DS'], 3.0), (['WT'], 5.0), (['DS'], 4.8)]):
+            user = User.objects.create_user(email=f'tutor{i}@example.com', password='pass1234', is_tutor=True)
+            tutor = Tutor.objects.create(user=user, first_name=f'T{i}', last_name='X', year=3, rating=rating)
+            tutor.set_courses(courses)
+            tutor.save()
+
+    def list_tutors(self, **params):
+        response = self.client.get(reverse('tutor-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_filter_by_course_and_rating_ordered_in_sql(self):
+        tutors = self.list_tutors(course='DS', min_rating=4, ordering='-rating')
+        self.assertEqual([t['first_name'] for t in tutors], ['T3', 'T0'])
+        self.assertEqual(tutors[1]['courses'], ['DS', 'AI'])
+
+    def test_set_courses_syncs_the_course_index(self):
+        tutor = Tutor.objects.get(first_name='T0')
+        tutor.set_courses(['AI', 'MS'])
+        tutor.save()
+        self.assertEqual(set(TutorCourse.objects.filter(tutor=tutor).values_list('course', flat=True)), {'AI', 'MS'})
+        self.assertEqual([t['first_name'] for t in self.list_tutors(course='MS')], ['T0'])
+
+    def test_unknown_course_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('tutor-list'), {'course': 'XX'}).status_code, 400)
+
+    def test_min_rating_must_be_a_finite_rating(self):
+        for value in ('nan', 'inf', '-inf', 'abc', '-1', '5.5'):
+            response = self.client.get(reverse('tutor-list'), {'min_rating': value})
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn('min_rating', response.json())
+        self.assertEqual(len(self.list_tutors(min_rating='0')), 4)
+
+
+class ListQueryShapeTests(TestCase):
+    '''
+    The user list endpoints must not repeat a query per row (N+1).
+    '''
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for i in range(4):
+            student = User.objects.create_user(email=f'student{i}@example.com', password='pass1234', is_student=True)
+            Student.objects.create(user=student)
+            tutor = User.objects.create_user(email=f'tutor{i}@example.com', password='pass1234', is_tutor=True)
+            Tutor.objects.create(user=tutor, first_name=f'T{i}', last_name='X', year=2, courses='DS')
+
+    def test_no_repeated_queries(self):
+        for name in ('user-list', 'student-list', 'tutor-list'):
+            with self.subTest(name), inspect_queries() as inspector:
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+            self.assertEqual(inspector.report()['repeated'], [])
+
+
+class TutorCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create_user(email='tutor@example.com', password='pass1234', is_tutor=True)
+        self.tutor = Tutor.objects.create(user=user, first_name='Ada', last_name='Lovelace', year=3)
+        self.detail_url = reverse('tutor-detail', args=[self.tutor.id])
+
+    def test_repeat_reads_are_served_from_cache(self):
+        self.client.get(reverse('tutor-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('tutor-list'))
+        self.assertEqual(response.json()[0]['first_name'], 'Ada')
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_student_saves_and_logins_keep_the_etag(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        student = User.objects.create_user(email='student@example.com', password='pass1234', is_student=True)
+        student.email = 'renamed@example.com'
+        student.save()
+        for email in ('renamed@example.com', 'tutor@example.com'):
+            response = self.client.post(reverse('token_obtain_pair'), {'email': email, 'password': 'pass1234'})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.tutor.user.email = 'ada@example.com'
+        self.tutor.user.save()
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_saves_and_ratings_invalidate(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.tutor.bio = 'Loves graphs'
+        self.tutor.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['bio'], 'Loves graphs')
+
+        self.tutor.add_rating(5)
+        self.assertEqual(self.client.get(self.detail_url).json()['rating'], 5.0)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create_user(email='tutor@example.com', password='pass1234', is_tutor=True)
+        self.tutor = Tutor.objects.create(user=user, first_name='Ada', last_name='Lovelace', year=3, bio='A long bio')
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        return response, ' '.join(query['sql'] for query in queries)
+
+    def test_fields_prune_output_and_columns(self):
+        response, sql = self.get(reverse('tutor-list'), fields='id,rating,user.email')
+        self.assertEqual(response.json(), [{'id': self.tutor.id, 'user': {'email': 'tutor@example.com'}, 'rating': 0.0}])
+        self.assertNotIn('"bio"', sql)
+        self.assertNotIn('"password"', sql)
+
+    def test_relations_not_asked_for_are_not_joined(self):
+        response, sql = self.get(reverse('tutor-detail', args=[self.tutor.id]), fields='first_name,courses')
+        self.assertEqual(response.json(), {'first_name': 'Ada', 'courses': []})
+        self.assertNotIn('users_user', sql)
+
+    def test_unknown_fields_are_rejected(self):
+        response, _ = self.get(reverse('tutor-list'), fields='id,user.salary')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field user.salary.']})
+
+    def test_method_fields_keep_their_columns(self):
+        response, _ = self.get(reverse('user-list'), fields='email,profile_thumbnails')
+        self.assertEqual(response.json(), [{'email': 'tutor@example.com', 'profile_thumbnails': {}}])
+
+    def test_writes_ignore_fields(self):
+        response = self.client.post(
+            reverse('user-list') + '?fields=id', {'email': 'new@example.com', 'password': 'pass1234', 'is_student': True},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('email', response.json())
+
+
+class ResponseEncodingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create_user(email='tutor@example.com', password='pass1234', is_tutor=True)
+        Tutor.objects.create(user=user, first_name='Ada', last_name='Lovelace', year=3)
+
+    def test_json_stays_on_drf_renderer(self):
+        response = self.client.get(reverse('tutor-list'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_orjson_is_negotiated(self):
+        response = self.client.get(reverse('tutor-list'), HTTP_ACCEPT=renderers.ORJSONRenderer.media_type)
+        self.assertEqual(response['Content-Type'], 'application/vnd.orjson+json')
+        self.assertEqual(response.content, orjson.dumps(response.data))
+        response = self.client.get(reverse('tutor-list'), {'fields': 'nope'}, HTTP_ACCEPT='application/vnd.orjson+json')
+        self.assertEqual(orjson.loads(response.content), {'fields': ['Unknown field nope.']})
+
+    def test_msgpack_is_negotiated(self):
+        response = self.client.get(reverse('tutor-list'), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)[0]['first_name'], 'Ada')
+
+    def test_cached_reads_vary_by_format(self):
+        json_etag = self.client.get(reverse('tutor-list'))['ETag']
+        response = self.client.get(reverse('tutor-list'), HTTP_ACCEPT='application/json; indent=4')
+        self.assertNotEqual(response['ETag'], json_etag)
+        self.assertIn('Accept', response['Vary'])
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP server unavailable')
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(email='student@example.com', password='pass1234', is_student=True)
+
+    def test_password_reset_only_enqueues(self):
+        response = APIClient().post(reverse('password-reset'), {'email': 'student@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to, ['student@example.com'])
+
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/reset-password/', mail.outbox[0].body)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.Status.SENT)
+
+    def test_batch_is_sent_over_one_connection(self):
+        for i in range(3):
+            OutboundEmail.enqueue('Hi', 'Body', 'noreply@example.com', [f'user{i}@example.com'])
+        self.assertEqual(send_queued_mail(batch_size=10), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(EMAIL_BACKEND='users.tests.FailingEmailBackend')
+    def test_failures_back_off_then_give_up(self):
+        email = OutboundEmail.enqueue('Hi', 'Body', '', ['user@example.com'])
+        self.assertEqual(send_queued_mail(max_attempts=2), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn('SMTP server unavailable', email.last_error)
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        send_queued_mail(max_attempts=2)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.FAILED, 2))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    csv_rows = (
+        'email,password,role,first_name,last_name,year,courses\n'
+        'a@example.com,pw-a,student,,,,\n'
+        'b@example.com,pw-b,tutor,Grace,Hopper,4,"DS,AI"\n'
+        'not-an-email,pw,student,,,,\n'
+        'c@example.com,pw-c,tutor,,,,\n'
+        'a@example.com,pw,student,,,,\n'
+        'taken@example.com,pw,student,,,,\n'
+    )
+
+    def setUp(self):
+        User.objects.create_user(email='taken@example.com', password='pass1234')
+
+    def assertImported(self, report):
+        self.assertEqual((report['created'], report['students'], report['tutors']), (2, 1, 1))
+        self.assertEqual([error['row'] for error in report['errors']], [4, 5, 6, 7])
+        self.assertTrue(check_password('pw-a', User.objects.get(email='a@example.com').password))
+        self.assertTrue(Student.objects.filter(user__email='a@example.com').exists())
+        tutor = Tutor.objects.get(user__email='b@example.com')
+        self.assertEqual(tutor.get_courses(), ['DS', 'AI'])
+        self.assertEqual(set(tutor.course_links.values_list('course', flat=True)), {'DS', 'AI'})
+
+    def test_command_imports_in_chunks_with_a_hashing_pool(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write(self.csv_rows)
+        self.addCleanup(os.remove, source.name)
+        report_path = source.name + '.report.json'
+        self.addCleanup(lambda: os.path.exists(report_path) and os.remove(report_path))
+        call_command('import_users', source.name, chunk_size=2, workers=2, report=report_path, stdout=StringIO(), stderr=StringIO())
+        with open(report_path) as report:
+            self.assertImported(json.load(report))
+
+    def test_admin_endpoint_accepts_jsonl(self):
+        admin = User.objects.create_user(email='admin@example.com', password='pass1234', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        lines = [dict(zip(['email', 'password', 'role', 'first_name', 'last_name', 'year', 'courses'], line.split(',', 6)))
+                 for line in self.csv_rows.replace('"', '').splitlines()[1:]]
+        payload = '\n'.join(json.dumps({k: v for k, v in row.items() if v}) for row in lines)
+        upload = SimpleUploadedFile('cohort.jsonl', payload.encode())
+        response = client.post(reverse('user-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        # JSON Lines rows are numbered by line, without a header row.
+        self.assertEqual([error['row'] for error in response.json()['errors']], [3, 4, 5, 6])
+
+    def test_unreadable_files_are_rejected_with_400(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(email='admin@example.com', password='pass1234', is_staff=True))
+        latin1 = 'email,password,role\nrené@example.com,,student\n'.encode('latin-1')
+        oversized_field = b'email,bio\na@example.com,"' + b'x' * 200_000 + b'"\n'
+        for content in (latin1, oversized_field):
+            upload = SimpleUploadedFile('cohort.csv', content, content_type='text/csv')
+            response = client.post(reverse('user-import'), {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('file', response.json())
+
+    def test_endpoint_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(email='taken@example.com'))
+        self.assertEqual(client.post(reverse('user-import'), {}).status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email='tutor@example.com', password='pass1234', is_tutor=True)
+        tutor = Tutor.objects.create(user=user, first_name='Ada', last_name='Lovelace', year=3)
+        tutor.set_courses(['DS', 'AI'])
+        tutor.save()
+
+    def test_tutor_login_is_one_joined_query(self):
+        with self.assertNumQueries(1):
+            response = APIClient().post(reverse('token_obtain_pair'), {'email': 'tutor@example.com', 'password': 'pass1234'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['tutor']['courses'], ['DS', 'AI'])
+
+    def test_wrong_password_is_rejected(self):
+        response = APIClient().post(reverse('token_obtain_pair'), {'email': 'tutor@example.com', 'password': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='tutor@example.com', password='pass1234', is_tutor=True)
+        self.tokens = APIClient().post(reverse('token_obtain_pair'), {'email': self.user.email, 'password': 'pass1234'}).json()
+
+    def authenticate(self, access=None):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {access or self.tokens['access']}")
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_user_is_built_from_claims_without_a_query(self):
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertIsInstance(user, TokenClaimsUser)
+        self.assertEqual((user.pk, user.email, user.is_tutor, user.is_staff), (self.user.pk, self.user.email, True, False))
+        with self.assertRaisesMessage(TypeError, 'read-only'):
+            user.save()
+        with self.assertRaisesMessage(TypeError, 'read-only'):
+            user.delete()
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        self.assertEqual(client.post(reverse('logout'), {'refresh': self.tokens['refresh']}).status_code, 205)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        response = APIClient().post(reverse('token_refresh'), {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_role_change_revokes_existing_tokens(self):
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        fresh = APIClient().post(reverse('token_obtain_pair'), {'email': self.user.email, 'password': 'pass1234'}).json()
+        user, _ = self.authenticate(fresh['access'])
+        self.assertTrue(user.is_staff)
+
+
+class ProfileThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.user = User.objects.create_user(email='student@example.com', password='pass1234', is_student=True)
+
+    def upload(self, color='red', exif=True):
+        image = Image.new('RGB', (400, 300), color)
+        buffer = BytesIO()
+        metadata = Image.Exif()
+        metadata[0x010F] = 'CameraMaker'
+        image.save(buffer, 'JPEG', exif=metadata if exif else b'')
+        self.user.profile_picture = SimpleUploadedFile('me.jpg', buffer.getvalue(), content_type='image/jpeg')
+        self.user.save()
+
+    def test_worker_renders_square_thumbnails_without_exif(self):
+        self.upload()
+        self.assertEqual(UserSerializer(self.user).data['profile_thumbnails'], {})
+
+        self.assertEqual(process_pending(), (1, 0))
+        self.assertFalse(pending_users().exists())
+        self.user.refresh_from_db()
+        storage = self.user.profile_picture.storage
+        for size in ('64', '256'):
+            for name in self.user.profile_thumbnails[size].values():
+                with storage.open(name) as thumb, Image.open(thumb) as image:
+                    self.assertEqual(image.size, (int(size), int(size)))
+                    self.assertEqual(len(image.getexif()), 0)
+        urls = UserSerializer(self.user).data['profile_thumbnails']
+        self.assertTrue(urls['64']['webp'].endswith('-64.webp'))
+
+    def test_new_upload_hides_stale_thumbnails_until_rerendered(self):
+        self.upload('red')
+        process_pending()
+        self.user.refresh_from_db()
+        old = self.user.profile_thumbnails
+        self.upload('blue')
+        self.assertEqual(UserSerializer(self.user).data['profile_thumbnails'], {})
+        process_pending()
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.profile_thumbnails, old)
+
+    def test_corrupt_upload_is_not_retried_forever(self):
+        self.user.profile_picture = SimpleUploadedFile('me.jpg', b'not an image', content_type='image/jpeg')
+        self.user.save()
+        self.assertEqual(process_pending(), (0, 1))
+        self.assertFalse(pending_users().exists())
+
+
+class MediaBlobTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.media_root = media.name
+        self.alice = User.objects.create_user(email='alice@example.com', password='pass1234')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pass1234')
+
+    def set_picture(self, user, content, filename='IMG_2012.JPG'):
+        user.profile_picture = SimpleUploadedFile(filename, content, content_type='image/jpeg')
+        user.save()
+        return user.profile_picture.name
+
+    def blob_files(self):
+        return [name for _, _, names in os.walk(os.path.join(self.media_root, 'blobs')) for name in names]
+
+    def test_identical_uploads_share_one_counted_blob(self):
+        first = self.set_picture(self.alice, b'same bytes')
+        second = self.set_picture(self.bob, b'same bytes', filename='copy.jpg')
+        self.assertEqual(first, second)
+        self.assertIsNotNone(blob_digest(first))
+        self.assertEqual(len(self.blob_files()), 1)
+        self.assertEqual(StoredBlob.objects.get(name=first).refcount, 2)
+
+        self.set_picture(self.alice, b'other bytes')
+        self.bob.delete()
+        blob = StoredBlob.objects.get(name=first)
+        self.assertEqual(blob.refcount, 0)
+        self.assertIsNotNone(blob.released_at)
+
+        call_command('rebuild_media_blobs', stdout=StringIO())
+        self.assertTrue(StoredBlob.objects.filter(name=first).exists())  # still within the grace period
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_media_blobs', grace_hours=-1, stdout=StringIO())
+        self.assertFalse(StoredBlob.objects.filter(name=first).exists())
+        self.assertEqual(len(self.blob_files()), 1)
+
+    def test_legacy_pictures_are_adopted_and_deduplicated(self):
+        for user, suffix in ((self.alice, ''), (self.bob, '_6FPyDsp')):
+            legacy = f'profile_pictures/None/IMG_2012{suffix}.JPG'
+            os.makedirs(os.path.join(self.media_root, 'profile_pictures/None'), exist_ok=True)
+            with open(os.path.join(self.media_root, legacy), 'wb') as out:
+                out.write(b'legacy bytes')
+            User.objects.filter(pk=user.pk).update(profile_picture=legacy)
+
+        call_command('rebuild_media_blobs', stdout=StringIO())
+        names = set(User.objects.values_list('profile_picture', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(StoredBlob.objects.get(name=names.pop()).refcount, 2)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'profile_pictures/None')), [])
+
+    def test_blobs_are_served_as_immutable(self):
+        name = self.set_picture(self.alice, b'cache me')
+        response = serve_media(RequestFactory().get(f'/media/{name}'), name)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BoundedUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def png(self, size=(32, 32), noise=False):
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)) if noise else Image.new('RGB', size, 'red')
+        buffer = BytesIO()
+        image.save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def register(self, content, filename='me.png'):
+        return APIClient().post(reverse('user-list'), {
+            'email': 'new@example.com', 'password': 'pass1234', 'is_student': True,
+            'profile_picture': SimpleUploadedFile(filename, content, content_type='image/png'),
+        }, format='multipart')
+
+    def test_small_image_is_accepted_and_stored_by_hash(self):
+        response = self.register(self.png())
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIsNotNone(blob_digest(User.objects.get(email='new@example.com').profile_picture.name))
+
+    @override_settings(PROFILE_UPLOAD_SPOOL_BYTES=1024)
+    def test_image_past_the_spool_threshold_goes_to_disk(self):
+        handler = BoundedImageUploadHandler()
+        content = self.png((64, 64), noise=True)
+        handler.new_file('profile_picture', 'me.png', 'image/png', len(content))
+        for start in range(0, len(content), 512):
+            handler.receive_data_chunk(content[start:start + 512], start)
+        upload = handler.file_complete(len(content))
+        self.assertTrue(os.path.exists(upload.temporary_file_path()))
+        self.assertEqual((upload.image_format, upload.image_size), ('PNG', (64, 64)))
+        self.assertEqual(upload.read(), content)
+
+        self.assertEqual(self.register(content).status_code, 201)
+
+    @override_settings(PROFILE_UPLOAD_MAX_BYTES=4096, DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_oversized_upload_is_rejected_with_413(self):
+        content = self.png((128, 128), noise=True)
+        response = self.register(content)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(User.objects.filter(email='new@example.com').exists())
+
+        # Without a trustworthy Content-Length the limit still applies while streaming.
+        handler = BoundedImageUploadHandler()
+        handler.new_file('profile_picture', 'me.png', 'image/png', None)
+        with self.assertRaises(UploadTooLarge):
+            for start in range(0, len(content), 1024):
+                handler.receive_data_chunk(content[start:start + 1024], start)
+
+    def test_header_past_the_first_bytes_is_read_on(self):
+        # A big ICC profile comes before the JPEG's dimensions.
+        buffer = BytesIO()
+        Image.new('RGB', (32, 32), 'red').save(buffer, 'JPEG', icc_profile=os.urandom(200 * 1024))
+        content = buffer.getvalue()
+        handler = BoundedImageUploadHandler()
+        handler.new_file('profile_picture', 'me.jpg', 'image/jpeg', len(content))
+        for start in range(0, len(content), 16 * 1024):
+            handler.receive_data_chunk(content[start:start + 16 * 1024], start)
+        self.assertIsNone(handler.image_info)
+        upload = handler.file_complete(len(content))
+        self.assertEqual((upload.image_format, upload.image_size), ('JPEG', (32, 32)))
+
+        self.assertEqual(self.register(content, filename='me.jpg').status_code, 201)
+
+    def test_non_image_is_rejected_from_its_header(self):
+        response = self.register(b'%PDF-1.4 not an image' * 10, filename='me.png')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('profile_picture', response.json())
+
+    @override_settings(PROFILE_UPLOAD_MAX_PIXELS=100)
+    def test_huge_dimensions_are_rejected_before_decoding(self):
+        response = self.register(self.png((20, 20)))
+        self.assertEqual(response.status_code, 400)
+
+    def test_tutor_update_stores_the_picture_on_the_user(self):
+        user = User.objects.create_user(email='tutor@example.com', password='pass1234', is_tutor=True)
+        tutor = Tutor.objects.create(user=user, first_name='Ada', last_name='Lovelace', year=3)
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.patch(reverse('tutor-update'), {
+            'bio': 'Updated bio', 'profile_picture': SimpleUploadedFile('me.png', self.png(), content_type='image/png'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['email'], 'tutor@example.com')
+        tutor.refresh_from_db()
+        user.refresh_from_db()
+        self.assertEqual(tutor.bio, 'Updated bio')
+        self.assertIsNotNone(blob_digest(user.profile_picture.name))
+
+
+class ConcurrentTutorRatingBenchmark(TransactionTestCase):
+    '''
+    Fires rating requests from several threads at once (each with its own
+    database connection, like separate gunicorn workers) and checks that no
+    update is lost.
+    '''
+    threads = 8
+    ratings_per_thread = 10
+
+    def setUp(self):
+        user = User.objects.create_user(email='tutor@example.com', password='pass1234', is_tutor=True)
+        self.tutor = Tutor.objects.create(user=user, first_name='Ada', last_name='Lovelace', year=3)
+
+    def test_concurrent_ratings_keep_an_exact_count(self):
+        url = reverse('tutor-rate', args=[self.tutor.id])
+        start = threading.Barrier(self.threads)
+        failures = []
+
+        def rate(value):
+            client = APIClient()
+            start.wait()
+            try:
+                for _ in range(self.ratings_per_thread):
+                    response = client.put(url, {'rating': value})
+                    if response.status_code != 200:
+                        failures.append(response.status_code)
+            except Exception as exc:
+                failures.append(repr(exc))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=rate, args=(i % 5 + 1,)) for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        total = self.threads * self.ratings_per_thread
+        expected_sum = sum((i % 5 + 1) * self.ratings_per_thread for i in range(self.threads))
+        self.tutor.refresh_from_db()
+        self.assertEqual(failures, [])
+        self.assertEqual(self.tutor.total_ratings, total)
+        self.assertEqual(self.tutor.rating_sum, expected_sum)
+        self.assertAlmostEqual(self.tutor.rating, expected_sum / total)
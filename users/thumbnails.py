@@ -0,0 +1,128 @@
+'''
+Profile picture thumbnails.
+
+Uploads are stored as-is by the request; `manage.py process_thumbnails`
+renders them into small square WebP and JPEG variants outside the request.
+Re-encoding drops EXIF (camera data, GPS) after applying its orientation.
+Variants are named after the SHA-256 of the source bytes, so they can be
+cached forever and a re-uploaded identical photo reuses them.
+'''
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Q
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import cache as tutor_cache
+from .models import User
+from .storage import blob_digest
+
+logger = logging.getLogger(__name__)
+
+SIZES = (64, 256)
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+THUMBNAIL_DIR = 'profile_pictures/thumbs'
+
+
+def pending_users():
+    '''
+    Users whose current profile picture has no thumbnails yet.
+    '''
+    return (
+        User.objects.exclude(Q(profile_picture='') | Q(profile_picture__isnull=True))
+        .exclude(thumbnails_source=F('profile_picture'))
+        .order_by('id')
+    )
+
+
+def thumbnail_name(digest, size, fmt):
+    return f'{THUMBNAIL_DIR}/{digest[:2]}/{digest}-{size}.{"jpg" if fmt == "jpeg" else fmt}'
+
+
+def thumbnail_prefix(digest):
+    '''
+    Directory and file-name prefix shared by every variant of `digest`.
+    '''
+    return f'{THUMBNAIL_DIR}/{digest[:2]}', f'{digest}-'
+
+
+def render_thumbnails(field_file, storage=default_storage):
+    '''
+    Render every size/format of `field_file` into `storage` and return the
+    {"<size>": {"<format>": name}} map. Existing variants are not re-rendered.
+    '''
+    with field_file.open('rb') as source:
+        # Content-addressed pictures are already named by their hash.
+        digest = blob_digest(field_file.name)
+        if digest is None:
+            hasher = hashlib.sha256()
+            for chunk in source.chunks():
+                hasher.update(chunk)
+            digest = hasher.hexdigest()
+        names = {str(size): {fmt: thumbnail_name(digest, size, fmt) for fmt in FORMATS} for size in SIZES}
+        if all(storage.exists(name) for variants in names.values() for name in variants.values()):
+            return names
+
+        source.seek(0)
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            for size in SIZES:
+                thumb = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+                for fmt, (pil_format, options) in FORMATS.items():
+                    name = names[str(size)][fmt]
+                    if storage.exists(name):
+                        continue
+                    buffer = BytesIO()
+                    # No exif= argument: the variant carries no metadata.
+                    thumb.save(buffer, pil_format, **options)
+                    storage.save(name, ContentFile(buffer.getvalue()))
+    return names
+
+
+def process_user(user):
+    source = user.profile_picture.name
+    try:
+        thumbnails = render_thumbnails(user.profile_picture)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        logger.warning('Could not render thumbnails for user %s (%s): %s', user.pk, source, exc)
+        thumbnails = {}
+    # Only record them if the picture wasn't replaced while we were rendering.
+    updated = User.objects.filter(pk=user.pk, profile_picture=source).update(
+        profile_thumbnails=thumbnails, thumbnails_source=source,
+    )
+    if updated:
+        # update() skips post_save; tutor profiles embed these URLs.
+        tutor_cache.invalidate()
+    return bool(thumbnails)
+
+
+def process_pending(batch_size=20):
+    '''
+    Render thumbnails for up to `batch_size` users. Returns (rendered, failed).
+    '''
+    rendered = failed = 0
+    for user in pending_users()[:batch_size]:
+        if process_user(user):
+            rendered += 1
+        else:
+            failed += 1
+    return rendered, failed
+
+
+def thumbnail_urls(user, request=None):
+    '''
+    {"<size>": {"<format>": url}} for the user's current picture, or {} while
+    the worker hasn't caught up with the latest upload.
+    '''
+    if not user.profile_picture or user.thumbnails_source != user.profile_picture.name:
+        return {}
+    urls = {}
+    for size, variants in user.profile_thumbnails.items():
+        urls[size] = {}
+        for fmt, name in variants.items():
+            url = default_storage.url(name)
+            urls[size][fmt] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,154 @@
+'''
+Bounded, streaming handling of multipart image uploads.
+
+Django's default handlers keep files up to FILE_UPLOAD_MAX_MEMORY_SIZE in
+memory and have no upper limit at all; ImageField validation then copies
+in-memory files once more. BoundedImageUploadHandler instead:
+
+- rejects a request whose Content-Length is already too big (413) before
+  reading the body, and stops reading as soon as a file passes
+  PROFILE_UPLOAD_MAX_BYTES;
+- keeps small files in memory and spools anything past
+  PROFILE_UPLOAD_SPOOL_BYTES to a temporary file;
+- opens the first PROFILE_UPLOAD_HEADER_BYTES with Pillow (which only parses
+  headers) and rejects non-images, unsupported formats and oversized pixel
+  dimensions before the rest of the body is read. Headers that run past that
+  (a JPEG's EXIF/ICC segments come before its dimensions) are retried with
+  twice as many bytes, up to the whole file;
+- hashes the file while streaming, so ContentAddressedStorage doesn't have to
+  read it again to find out whether it is already stored.
+
+Views opt in with BoundedUploadMixin.
+'''
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, UnidentifiedImageError
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_SPOOL_BYTES = 256 * 1024
+DEFAULT_HEADER_BYTES = 64 * 1024
+DEFAULT_MAX_PIXELS = 40_000_000
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+PREFIX_BYTES = 16  # What Pillow's format checks look at.
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload is too large.'
+    default_code = 'upload_too_large'
+
+
+class BoundedImageUploadHandler(FileUploadHandler):
+    '''
+    Upload handler for endpoints that only accept images. Errors are raised
+    as DRF exceptions, so they reach the client as 413/400 responses.
+    '''
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = getattr(settings, 'PROFILE_UPLOAD_MAX_BYTES', DEFAULT_MAX_BYTES)
+        self.spool_bytes = getattr(settings, 'PROFILE_UPLOAD_SPOOL_BYTES', DEFAULT_SPOOL_BYTES)
+        self.header_bytes = getattr(settings, 'PROFILE_UPLOAD_HEADER_BYTES', DEFAULT_HEADER_BYTES)
+        self.max_pixels = getattr(settings, 'PROFILE_UPLOAD_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Allow the regular form fields on top of one maximal file.
+        if content_length > self.max_bytes + settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+            raise UploadTooLarge(f'Uploads are limited to {self.max_bytes} bytes.')
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.buffer = BytesIO()
+        self.spooled = None
+        self.received = 0
+        self.hasher = hashlib.sha256()
+        self.prefix = b''
+        self.image_info = None
+        self.inspect_at = self.header_bytes
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            raise UploadTooLarge(f'{self.file_name} is larger than {self.max_bytes} bytes.')
+        self.hasher.update(raw_data)
+        if len(self.prefix) < PREFIX_BYTES:
+            self.prefix += raw_data[:PREFIX_BYTES - len(self.prefix)]
+        if self.spooled is not None:
+            self.spooled.write(raw_data)
+        else:
+            self.buffer.write(raw_data)
+            if self.received > self.spool_bytes:
+                self.spooled = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+                self.spooled.write(self.buffer.getvalue())
+                self.buffer = None
+        if self.image_info is None and self.received >= self.inspect_at:
+            self.image_info = self.inspect_header(final=False)
+        return None
+
+    def file_complete(self, file_size):
+        if self.image_info is None:
+            self.image_info = self.inspect_header()
+        if self.spooled is not None:
+            upload = self.spooled
+            upload.file.flush()
+            upload.seek(0)
+            upload.size = file_size
+        else:
+            self.buffer.seek(0)
+            upload = InMemoryUploadedFile(
+                self.buffer, self.field_name, self.file_name, self.content_type,
+                file_size, self.charset, self.content_type_extra,
+            )
+        upload.sha256 = self.hasher.hexdigest()
+        upload.image_format, upload.image_size = self.image_info
+        return upload
+
+    def received_data(self):
+        if self.spooled is None:
+            return BytesIO(self.buffer.getvalue())
+        self.spooled.flush()
+        return self.spooled.temporary_file_path()
+
+    def inspect_header(self, final=True):
+        '''
+        Identify the image from the bytes received so far. Image.open only
+        parses the header, so a truncated body is fine here. Before the end of
+        the file, a header that doesn't parse yet but starts like an allowed
+        format returns None and is tried again at twice the bytes.
+        '''
+        try:
+            with Image.open(self.received_data()) as image:
+                image_format, size = image.format, image.size
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+            # Pillow reports a header cut short as unidentified or "Truncated File Read".
+            if not final and isinstance(exc, OSError) and _could_be_allowed(self.prefix):
+                self.inspect_at = self.received * 2
+                return None
+            raise ValidationError({self.field_name: ['Upload a valid image. The file is not an image or is corrupted.']})
+        if image_format not in ALLOWED_FORMATS:
+            raise ValidationError({self.field_name: [f'Unsupported image format {image_format}; use {", ".join(ALLOWED_FORMATS)}.']})
+        if size[0] * size[1] > self.max_pixels:
+            raise ValidationError({self.field_name: [f'Image is too large ({size[0]}x{size[1]} pixels).']})
+        return image_format, size
+
+
+def _could_be_allowed(prefix):
+    Image.init()
+    return any(Image.OPEN[name][1](prefix) is True for name in ALLOWED_FORMATS)
+
+
+class BoundedUploadMixin:
+    '''
+    Parse multipart bodies of this view with BoundedImageUploadHandler.
+    '''
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be set on the Django request, before DRF reads the body.
+        request.upload_handlers = [BoundedImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
@@ -1,3 +1,5 @@
+import math
+
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -5,15 +7,27 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
-from .models import Student, Tutor
-from .serializers import UserSerializer, UserRegistrationSerializer, StudentSerializer, TutorSerializer, MyTokenObtainPairSerializer, PasswordResetSerializer, PasswordResetConfirmSerializer, TutorRatingSerializer
-from rest_framework_simplejwt.views import TokenObtainPairView
+from .models import Student, Tutor, Course
+from .serializers import UserSerializer, UserRegistrationSerializer, StudentSerializer, TutorSerializer, MyTokenObtainPairSerializer, PasswordResetSerializer, PasswordResetConfirmSerializer, TutorRatingSerializer, MyTokenRefreshSerializer, LogoutSerializer
+from . import revocation
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.filters import OrderingFilter
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from .cache import CachedReadMixin
+from .importer import import_users
+from .storage import is_immutable
+from .uploadhandlers import BoundedUploadMixin
+from django.views.static import serve
+
+from backend.instrumentation import SerializerTimingMixin
+from backend.sparse import SparseQuerysetMixin
 
 
 User = get_user_model()
 
-class UserViewSet(generics.ListCreateAPIView):
+class UserViewSet(SerializerTimingMixin, BoundedUploadMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     '''
     View for listing and creating users.
     '''
@@ -24,7 +38,7 @@ class UserViewSet(generics.ListCreateAPIView):
         if self.request.method == 'POST':
             return UserRegistrationSerializer
         return UserSerializer
-class AdminUserCreateView(generics.CreateAPIView):
+class AdminUserCreateView(SerializerTimingMixin, BoundedUploadMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
 
@@ -40,33 +54,82 @@ class MyTokenObtainPairView(TokenObtainPairView):
     '''
     serializer_class = MyTokenObtainPairSerializer
     
-class UserDetailViewSet(generics.RetrieveUpdateDestroyAPIView):
+class MyTokenRefreshView(TokenRefreshView):
+    '''
+    View for refreshing an access token; rejects revoked refresh tokens.
+    '''
+    serializer_class = MyTokenRefreshSerializer
+
+class LogoutView(generics.GenericAPIView):
+    '''
+    Revoke the access token used for this request and, if given, the refresh token.
+    '''
+    serializer_class = LogoutSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if request.auth is not None:
+            revocation.revoke_token(request.auth)
+        if serializer.validated_data.get('refresh'):
+            revocation.revoke_token(serializer.validated_data['refresh'])
+        return Response(status=status.HTTP_205_RESET_CONTENT)
+    
+class UserDetailViewSet(SerializerTimingMixin, BoundedUploadMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     '''
     View for retrieving, updating, and deleting users.
     '''
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
-class StudentViewSet(generics.ListCreateAPIView):
+class StudentViewSet(SerializerTimingMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     '''
     View for listing and creating students.
     '''
-    queryset = Student.objects.all()
+    queryset = Student.objects.select_related('user')
     serializer_class = StudentSerializer
     
     
 
-class StudentDetailViewSet(generics.RetrieveUpdateDestroyAPIView):
+class StudentDetailViewSet(SerializerTimingMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     '''
     View for retrieving, updating, and deleting students.
     '''
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
 
-class TutorViewSet(generics.ListCreateAPIView):
-    queryset = Tutor.objects.all()
+class TutorViewSet(SerializerTimingMixin, BoundedUploadMixin, CachedReadMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
+    '''
+    View for listing and creating tutors.
+    List filters: ?course=DS&min_rating=4&ordering=-rating (all applied in SQL).
+    '''
+    queryset = Tutor.objects.select_related('user')
     serializer_class = TutorSerializer
     parser_classes = (MultiPartParser, FormParser)
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['rating', 'total_ratings', 'year', 'first_name', 'last_name']
+    ordering = ['id']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        course = params.get('course')
+        if course:
+            if course not in Course.values:
+                raise ValidationError({'course': f'Must be one of {", ".join(Course.values)}.'})
+            queryset = queryset.filter(course_links__course=course)
+        min_rating = params.get('min_rating')
+        if min_rating:
+            try:
+                value = float(min_rating)
+            except ValueError:
+                value = math.nan
+            # float() also takes "nan" and "inf"; a NaN bound would silently match nothing.
+            if not math.isfinite(value) or not 0 <= value <= 5:
+                raise ValidationError({'min_rating': 'Must be a number from 0 to 5.'})
+            queryset = queryset.filter(rating__gte=value)
+        return queryset
 
     def perform_create(self, serializer):
         if self.request.user.is_staff:
@@ -83,11 +146,11 @@ class TutorViewSet(generics.ListCreateAPIView):
             return TutorSerializer
         return TutorSerializer
 
-class TutorDetailViewSet(generics.RetrieveUpdateDestroyAPIView):
+class TutorDetailViewSet(SerializerTimingMixin, BoundedUploadMixin, CachedReadMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     '''
     View for retrieving, updating, and deleting tutors.
     '''
-    queryset = Tutor.objects.all()
+    queryset = Tutor.objects.select_related('user')
     serializer_class = TutorSerializer
 
 class TutorRatingView(generics.UpdateAPIView):
@@ -99,10 +162,7 @@ class TutorRatingView(generics.UpdateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        new_rating = serializer.validated_data['rating']
-        tutor.total_ratings += 1
-        tutor.rating = ((tutor.rating * (tutor.total_ratings - 1)) + new_rating) / tutor.total_ratings
-        tutor.save()
+        tutor.add_rating(serializer.validated_data['rating'])
 
         return Response({'rating': tutor.rating}, status=status.HTTP_200_OK)
     
@@ -115,6 +175,27 @@ class TutorAverageRatingView(generics.RetrieveAPIView):
         tutor = self.get_object()
         return Response({'average_rating': tutor.rating}, status=status.HTTP_200_OK)
 
+class UserImportView(APIView):
+    '''
+    Admin-only bulk import of students and tutors.
+    POST multipart `file` (CSV or JSON Lines, optional `format`); returns
+    the counts created and the per-row errors.
+    '''
+    permission_classes = [IsAdminUser]
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'No file was submitted.'})
+        fmt = request.data.get('format') or None
+        if fmt not in (None, 'csv', 'jsonl'):
+            raise ValidationError({'format': 'Must be csv or jsonl.'})
+        # Hash in this process: a pool would fork the server worker mid-request.
+        # Big imports belong in `manage.py import_users`, which uses one.
+        report = import_users(upload.file, fmt=fmt, filename=upload.name, workers=1)
+        return Response(report, status=status.HTTP_200_OK)
+
 class PasswordResetView(generics.GenericAPIView):
     '''
     View for sending the password reset e-mail.
@@ -143,7 +224,7 @@ from .serializers import TutorUpdateSerializer
 from .models import Tutor
 from rest_framework.permissions import IsAuthenticated
 
-class TutorUpdateView(UpdateAPIView):
+class TutorUpdateView(SerializerTimingMixin, BoundedUploadMixin, UpdateAPIView):
     queryset = Tutor.objects.all()
     serializer_class = TutorUpdateSerializer
     permission_classes = [IsAuthenticated]
@@ -164,7 +245,7 @@ from .models import Tutor
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.exceptions import ValidationError
-class TutorCreateView(CreateAPIView):
+class TutorCreateView(SerializerTimingMixin, BoundedUploadMixin, CreateAPIView):
     queryset = Tutor.objects.all()
     serializer_class = TutorCreateSerializer
     permission_classes = [IsAdminUser]
@@ -180,4 +261,18 @@ class TutorCreateView(CreateAPIView):
         user.is_tutor = True
         user.save()
         
-        serializer.save(user=user)
\ No newline at end of file
+        serializer.save(user=user)
+
+
+def serve_media(request, path):
+    '''
+    Serve an uploaded file from MEDIA_ROOT (when SERVE_MEDIA is on).
+    Content-addressed files never change under the same name, so browsers
+    and CDNs may keep them for a year without revalidating.
+    '''
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_immutable(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'no-cache'
+    return response